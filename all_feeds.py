@@ -1,27 +1,33 @@
-from feeds.gauss import gauss
-from feeds.crypto_indices import mcap1000, dogcoins
-from feeds.stablecoins import stablecoins as s 
-from feeds import test_feed
-from feeds.twitter import twitter
+import constants as c
+import feed_config
+from feeds.registry import FeedRegistry, FeedSpec
 
-Test = test_feed.Test
-Gauss = gauss.Gauss
-MCAP1000, DogCoins = mcap1000.MCAP1000, dogcoins.DogCoins
-USDC, BUSD, Tether, Dai = s.USDC, s.BUSD, s.Tether, s.Dai
-Twitter = twitter.Twitter
+#NOTE: every feed SIWA knows how to run, keyed by feed name;
+#     modules are only imported when a feed is started or queried,
+#     so e.g. `siwa.py --datafeeds usdc` never loads web3, nltk or tweepy
+available_feeds = FeedRegistry({
+    'test': FeedSpec(0, 'feeds.test_feed', 'Test'),
+    'gauss': FeedSpec(1, 'feeds.gauss.gauss', 'Gauss'),
+    'mcap1000': FeedSpec(2, 'feeds.crypto_indices.mcap1000', 'MCAP1000'),
+    'usdc': FeedSpec(3, 'feeds.stablecoins.stablecoins', 'USDC'),
+    'busd': FeedSpec(4, 'feeds.stablecoins.stablecoins', 'BUSD'),
+    'tether': FeedSpec(5, 'feeds.stablecoins.stablecoins', 'Tether'),
+    'dai': FeedSpec(6, 'feeds.stablecoins.stablecoins', 'Dai'),
+    'twitter': FeedSpec(7, 'feeds.twitter.twitter', 'Twitter'),
+    'dogcoins': FeedSpec(13, 'feeds.crypto_indices.dogcoins', 'DogCoins'),
+    'btc_usd': FeedSpec(14, 'feeds.exchange.exchange_feed', 'BTCUSD'),
+    'eth_usd': FeedSpec(9, 'feeds.exchange.exchange_feed', 'ETHUSD'),
+    'rolling': FeedSpec(10, 'feeds.rolling', 'RollingFeed'),
+    'stablecoin_depeg': FeedSpec(11, 'feeds.composite', 'StablecoinDepeg'),
+    'mcap_dog_ratio': FeedSpec(12, 'feeds.composite', 'McapDogRatio'),
+    })
 
-#NOTE: this is a dict of all feed classes that SIWA can run, keyed by feed name
+#NOTE: this is the registry of all feeds that SIWA runs, keyed by feed (instance) name
 #     this is used in endpoint.py to route requests to the correct feed
 #
-#TO ENABLE OR DISABLE A FEED, ADD OR REMOVE IT FROM THIS DICT  
-all_feeds = {
-    # Gauss.NAME: Gauss, 
-    Test.NAME: Test,
-    MCAP1000.NAME: MCAP1000,
-    DogCoins.NAME: DogCoins,
-    USDC.NAME: USDC, 
-    BUSD.NAME: BUSD,
-    Tether.NAME: Tether,
-    Dai.NAME: Dai,
-    Twitter.NAME: Twitter,
-    }
+#TO ENABLE OR DISABLE A FEED, OR CHANGE ITS PARAMETERS, EDIT feeds.toml
+#     (siwa.py picks up changes while running, see feed_config.py)
+#     (feed params aren't checked here: that imports the feeds; they are checked when a feed is
+#     started, or its config changes)
+all_feeds = available_feeds.subset([])
+feed_config.apply(feed_config.load(c.FEEDS_CONFIG_PATH, available_feeds), all_feeds, check=False)
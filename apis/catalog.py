@@ -0,0 +1,255 @@
+"""
+On-disk cache of provider coin catalogs.
+
+Coin lists (CoinPaprika's /v1/coins, CoinGecko's /coins/list) change rarely
+but are large. A CatalogCache keeps one on disk, serves it from memory, and
+revalidates it in the background every CATALOG_REFRESH_INTERVAL seconds
+with a conditional request (If-None-Match / If-Modified-Since), so an
+unchanged list costs a 304 and no download. Only the first use on a fresh
+install waits for the network; after that feeds only request quotes.
+"""
+import os
+import gzip
+import json
+import time
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import requests
+
+import constants as c
+from apis import utils
+from apis.crypto_api import CryptoAPI
+
+CATALOG_VERSION = 1
+
+
+class CatalogCache:
+    """
+    A provider's coin list, cached on disk and revalidated in the background.
+
+    Parameters:
+        name (str): Cache name, also the file name under CATALOG_PATH.
+        url (str): URL of the coin list (a json array of coins).
+        fields (Iterable[str], optional): Fields kept for each coin.
+            Defaults to all.
+        path (Path, optional): Cache file. Defaults to CATALOG_PATH/<name>.json.gz;
+            None keeps the catalog in memory only.
+        refresh_interval (float, optional): Seconds between revalidations.
+        stream (bool, optional): Decode the list while it downloads
+            (see utils.iter_json_array). Defaults to True.
+    """
+
+    DEFAULT_PATH = object()
+
+    def __init__(self, name: str, url: str, fields: Optional[Iterable[str]] = None,
+                 path: Optional[Path] = DEFAULT_PATH,
+                 refresh_interval: float = c.CATALOG_REFRESH_INTERVAL,
+                 stream: bool = True) -> None:
+        self.name = name
+        self.url = url
+        self.fields = tuple(fields) if fields is not None else None
+        if path is CatalogCache.DEFAULT_PATH:
+            path = c.CATALOG_PATH / f'{name}.json.gz'
+        self.path = Path(path) if path is not None else None
+        self.refresh_interval = refresh_interval
+        self.stream = stream
+        self.rows = None            # the coin list
+        self.etag = None
+        self.last_modified = None
+        self.fetched_at = 0.        # unix time the list was last (re)validated, the file's mtime
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._refresher = None
+        self._values = {}           # field -> (rows it was computed from, set of values)
+
+    def get(self) -> List[Dict[str, Any]]:
+        """
+        The coin list: from memory, else from disk, else downloaded now.
+        Starts the background revalidation on first use.
+
+        Returns:
+            List[Dict[str, Any]]: The coins.
+
+        Raises:
+            requests.exceptions.RequestException:
+                If there is no cached list and the download fails.
+        """
+        if self.rows is None:
+            with self._lock:
+                if self.rows is None and not self.load():
+                    self._refresh()
+        if self._refresher is None and self.refresh_interval:
+            self.start()
+        return self.rows
+
+    def values(self, field: str) -> set:
+        """
+        All values of a field in the coin list (e.g. every id), for fast
+        membership checks; recomputed only when the list changes.
+
+        Parameters:
+            field (str): Field name, e.g. 'id'.
+
+        Returns:
+            set: The values.
+        """
+        rows = self.get()
+        cached = self._values.get(field)
+        if cached is None or cached[0] is not rows:
+            cached = self._values[field] = (rows, {row[field] for row in rows if field in row})
+        return cached[1]
+
+    def refresh(self) -> bool:
+        """
+        Revalidate the list now.
+
+        Returns:
+            bool: Whether the list changed (False on 304 Not Modified).
+        """
+        with self._lock:
+            return self._refresh()
+
+    def _refresh(self) -> bool:
+        headers = {}
+        if self.rows is not None:
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+            if self.last_modified:
+                headers['If-Modified-Since'] = self.last_modified
+        response = CryptoAPI.transport.get(self.url, headers=headers, stream=self.stream)
+        try:
+            if response.status_code == 304:
+                self.fetched_at = time.time()
+                self.touch()
+                return False
+            if response.status_code != 200:
+                raise requests.exceptions.RequestException(
+                    f"Received status code {response.status_code} "
+                    f"for URL: {self.url}"
+                )
+            if self.stream:
+                rows = utils.iter_json_array(response.iter_content(utils.STREAM_CHUNK_SIZE))
+            else:
+                rows = utils.decode_json(response)
+            try:
+                if self.fields is not None:
+                    rows = [{field: row[field] for field in self.fields if field in row} for row in rows]
+                rows = list(rows)
+            except ValueError as e:     # the stream was not a json array, e.g. an html error page
+                raise requests.exceptions.InvalidJSONError(f"{e} for URL: {self.url}") from e
+            self.rows = rows
+            self.etag = response.headers.get('ETag')
+            self.last_modified = response.headers.get('Last-Modified')
+            self.fetched_at = time.time()
+            self.save()
+            return True
+        finally:
+            response.close()
+
+    def load(self) -> bool:
+        """
+        Load the list saved on disk, if there is one for this url.
+
+        Returns:
+            bool: Whether a list was loaded.
+        """
+        if self.path is None:
+            return False
+        try:
+            with gzip.open(self.path, 'rb') as f:
+                data = utils.json_loads(f.read())
+        except (FileNotFoundError, OSError, ValueError):
+            return False
+        if data.get('version') != CATALOG_VERSION or data.get('url') != self.url \
+                or data.get('fields') != (list(self.fields) if self.fields is not None else None):
+            return False
+        self.rows = data['rows']
+        self.etag = data['etag']
+        self.last_modified = data['last_modified']
+        self.fetched_at = os.stat(self.path).st_mtime
+        return True
+
+    def save(self) -> None:
+        """
+        Write the list to disk (atomically).
+        """
+        if self.path is None:
+            return
+        os.makedirs(self.path.parent, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, suffix='.tmp')
+        try:
+            os.chmod(tmp, 0o644)
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+                f.write(json.dumps({
+                    'version': CATALOG_VERSION,
+                    'url': self.url,
+                    'fields': list(self.fields) if self.fields is not None else None,
+                    'etag': self.etag,
+                    'last_modified': self.last_modified,
+                    'rows': self.rows,
+                }).encode())
+            os.utime(tmp, (self.fetched_at, self.fetched_at))
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    def touch(self) -> None:
+        """
+        Record on disk that the list was revalidated unchanged: only the
+        file's mtime (the fetched_at it is loaded with) is updated.
+        """
+        if self.path is None:
+            return
+        try:
+            os.utime(self.path, (self.fetched_at, self.fetched_at))
+        except FileNotFoundError:
+            self.save()
+
+    def start(self) -> None:
+        """
+        Revalidate every refresh_interval seconds from a daemon thread.
+        """
+        with self._lock:
+            if self._refresher is None:
+                self._stop.clear()
+                self._refresher = threading.Thread(target=self._refresh_loop, daemon=True,
+                                                   name=f'catalog-{self.name}')
+                self._refresher.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        refresher, self._refresher = self._refresher, None
+        if refresher is not None and refresher is not threading.current_thread():
+            refresher.join()
+
+    def _refresh_loop(self) -> None:
+        retry_at = None
+        while True:
+            due = retry_at or self.fetched_at + self.refresh_interval
+            if self._stop.wait(max(0., due - time.time())):
+                return
+            try:
+                self.refresh()
+                retry_at = None
+            except Exception as e:
+                print(f"Warning: could not revalidate the {self.name} catalog, "
+                      f"keeping the cached one: {e}")
+                retry_at = time.time() + c.CATALOG_RETRY_INTERVAL
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(name: str, url: str, fields: Optional[Iterable[str]] = None) -> CatalogCache:
+    """
+    The shared CatalogCache of a name, created on first use.
+    """
+    with _catalogs_lock:
+        if name not in _catalogs:
+            _catalogs[name] = CatalogCache(name, url, fields)
+        return _catalogs[name]
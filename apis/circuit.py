@@ -0,0 +1,152 @@
+"""
+Per-provider circuit breakers.
+
+Every request made through `utils.handle_request_errors` goes through the
+breaker of its api source. After CIRCUIT_FAILURE_THRESHOLD consecutive
+failures the circuit opens: requests to that provider are refused at once
+(no latency, no quota) until CIRCUIT_RESET_TIMEOUT has passed. Then the
+circuit is half-open and a single trial request is let through; if it
+succeeds the circuit closes, if it fails the circuit opens again for twice
+as long, up to CIRCUIT_MAX_RESET_TIMEOUT.
+"""
+import time
+import threading
+from typing import Callable, Dict, Optional
+
+import constants as c
+import metrics
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitBreaker:
+    """
+    Tracks the failures of one provider and decides whether to call it.
+
+    Parameters:
+        name (str): Provider (api source) name.
+        failure_threshold (int, optional): Consecutive failures that open the circuit.
+            Defaults to CIRCUIT_FAILURE_THRESHOLD.
+        reset_timeout (float, optional): Seconds the circuit first stays open.
+            Defaults to CIRCUIT_RESET_TIMEOUT.
+        max_reset_timeout (float, optional): Cap of the (doubling) open time.
+            Defaults to CIRCUIT_MAX_RESET_TIMEOUT.
+        clock (Callable[[], float], optional): Monotonic clock, in seconds.
+    """
+
+    def __init__(self, name: str, failure_threshold: Optional[int] = None,
+                 reset_timeout: Optional[float] = None,
+                 max_reset_timeout: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold or c.CIRCUIT_FAILURE_THRESHOLD
+        self.base_reset_timeout = reset_timeout or c.CIRCUIT_RESET_TIMEOUT
+        self.max_reset_timeout = max_reset_timeout or c.CIRCUIT_MAX_RESET_TIMEOUT
+        self.clock = clock
+        self.failures = 0               # consecutive failures
+        self.reset_timeout = self.base_reset_timeout
+        self.opened_at = None           # clock() when the circuit last opened
+        self._trial = False             # a half-open trial request is in flight
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return CLOSED
+        if self.clock() - self.opened_at < self.reset_timeout:
+            return OPEN
+        return HALF_OPEN
+
+    def available(self) -> bool:
+        """
+        Whether the provider is worth calling now: closed, or half-open and
+        waiting for its trial request.
+        """
+        state = self.state
+        return state == CLOSED or (state == HALF_OPEN and not self._trial)
+
+    def allow(self) -> bool:
+        """
+        Whether to make a request now; in the half-open state only the first
+        caller is allowed, as the trial.
+        """
+        with self._lock:
+            state = self.state
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.opened_at is not None:
+                print(f"Circuit for {self.name} closed: requests succeed again")
+            self.failures = 0
+            self.opened_at = None
+            self.reset_timeout = self.base_reset_timeout
+            self._trial = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._trial:
+                # the trial failed: stay open, for twice as long
+                self.reset_timeout = min(self.reset_timeout * 2, self.max_reset_timeout)
+            elif self.opened_at is not None or self.failures < self.failure_threshold:
+                return
+            self._trial = False
+            self.opened_at = self.clock()
+            print(f"Warning: circuit for {self.name} open after {self.failures} failed requests; "
+                  f"next trial request in {self.reset_timeout:g}s")
+
+    def record_aborted(self) -> None:
+        """
+        The request failed on our side, not the provider's (e.g. a bug or a
+        missing api key): it counts neither way, but a half-open trial it
+        was is over, so the next request can be the trial.
+        """
+        with self._lock:
+            self._trial = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker(name: str) -> CircuitBreaker:
+    """
+    The shared CircuitBreaker of a provider, created on first use.
+    """
+    try:
+        return _breakers[name]
+    except KeyError:
+        with _breakers_lock:
+            return _breakers.setdefault(name, CircuitBreaker(name))
+
+
+def available(name: str) -> bool:
+    """
+    Whether a provider's circuit lets requests through (see CircuitBreaker.available).
+    """
+    return breaker(name).available()
+
+
+def reset() -> None:
+    """
+    Forget all breakers (closing every circuit).
+    """
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def _states():
+    return {(name, state): float(b.state == state)
+            for name, b in list(_breakers.items()) for state in (CLOSED, OPEN, HALF_OPEN)}
+
+metrics.gauge('siwa_circuit_state',
+              '1 for the current circuit breaker state of each upstream provider', ['source', 'state'],
+              callback=_states)
@@ -1,5 +1,6 @@
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 from apis.crypto_api import CryptoAPI
+from apis.catalog import CatalogCache, get_catalog
 import requests
 from apis import utils
 
@@ -14,6 +15,8 @@ class CoinGeckoAPI(CryptoAPI):
     Methods:
         get_data(N: int) -> Dict[str, Any]:
             Gets data from CoinGecko API.
+        get_quotes(ids: List[str]) -> Dict[str, Dict[str, Any]]:
+            Gets current market data of the given coins only.
         extract_market_cap(data: Dict[str, Any]) -> Dict[float, Dict[str, str]]:
             Extracts market cap data from API response.
     """
@@ -25,15 +28,23 @@ class CoinGeckoAPI(CryptoAPI):
     NAME_KEY = "name"
     LAST_UPDATED_KEY = "last_updated"
     MARKET_CAP_KEY = "market_cap"
+    ID_KEY = "id"
 
-    def __init__(self) -> None:
+    COINS_LIST_URL = "https://api.coingecko.com/api/v3/coins/list"
+
+    def __init__(self, catalog: Optional[CatalogCache] = None) -> None:
         """
         Constructs all the necessary attributes for the CoinGeckoAPI object.
+
+        Parameters:
+            catalog (CatalogCache, optional): Coin list cache used to check ids.
+                Defaults to the shared coingecko catalog.
         """
         super().__init__(
             url="https://api.coingecko.com/api/v3/coins/markets",
             source='coingecko'
         )
+        self.catalog = catalog or get_catalog(self.source, self.COINS_LIST_URL, (self.ID_KEY,))
 
     @utils.handle_request_errors
     def get_data(self, N: int) -> Dict[str, Any]:
@@ -53,10 +64,62 @@ class CoinGeckoAPI(CryptoAPI):
             "page": self.PAGE,
             "sparkline": self.SPARKLINE,
         }
-        response = requests.get(self.url, params=parameters)
-        data = response.json()
+        response = self.transport.get(self.url, params=parameters)
+        data = utils.decode_json(response)
         return data
 
+    def known_ids(self, ids: List[str]) -> List[str]:
+        """
+        The ids that are in CoinGecko's (cached) coin list, so renamed or
+        delisted coins don't fail the quotes request; all ids if the coin
+        list is unavailable.
+
+        Parameters:
+            ids (List[str]): CoinGecko coin ids, e.g. constants.DOGE.
+
+        Returns:
+            List[str]: The known ids.
+        """
+        try:
+            known = self.catalog.values(self.ID_KEY)
+        except requests.exceptions.RequestException as e:
+            print(f"Warning: CoinGecko coin list unavailable, not checking ids: {e}")
+            return list(ids)
+        unknown = [coin_id for coin_id in ids if coin_id not in known]
+        if unknown:
+            print(f"Warning: unknown CoinGecko ids {unknown}")
+        return [coin_id for coin_id in ids if coin_id in known]
+
+    @utils.handle_request_errors
+    def get_quotes(self, ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Gets current market data (price, market cap, ...) of the given coins
+        only, in one request.
+
+        Parameters:
+            ids (List[str]): CoinGecko coin ids, e.g. constants.DOGE.
+
+        Returns:
+            Dict[str, Dict[str, Any]]: Market data keyed by coin id.
+        """
+        ids = self.known_ids(ids)
+        if not ids:
+            return {}
+        parameters = {
+            "vs_currency": self.VS_CURRENCY,
+            "ids": ",".join(ids),
+            "per_page": len(ids),
+            "page": self.PAGE,
+            "sparkline": self.SPARKLINE,
+        }
+        response = self.transport.get(self.url, params=parameters)
+        if response.status_code != 200:
+            raise requests.exceptions.RequestException(
+                f"Received status code {response.status_code} "
+                f"for URL: {self.url}"
+            )
+        return {coin[self.ID_KEY]: coin for coin in utils.decode_json(response)}
+
     def extract_market_cap(self, data: Dict[str, Any]) -> Dict[float, Dict[str, str]]:
         """
         Extracts market cap data from API response.
@@ -78,3 +141,18 @@ class CoinGeckoAPI(CryptoAPI):
                 "last_updated": last_updated,
             }
         return market_data
+
+
+def fetch_data_from_web(ids: List[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """
+    Gets current market data of the given CoinGecko coins (see
+    CoinGeckoAPI.get_quotes).
+
+    Parameters:
+        ids (List[str]): CoinGecko coin ids, e.g. constants.DOGE.
+
+    Returns:
+        Optional[Dict[str, Dict[str, Any]]]:
+            Market data keyed by coin id, None if the request failed.
+    """
+    return CoinGeckoAPI().get_quotes(ids)
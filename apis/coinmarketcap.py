@@ -54,10 +54,10 @@ class CoinMarketCapAPI(CryptoAPI):
         parameters = {
             self.LIMIT: N
         }
-        response = requests.get(
+        response = self.transport.get(
             self.url, headers=self.headers, params=parameters
         )
-        data = response.json()
+        data = utils.decode_json(response)
         return data
 
     def extract_market_cap(self, data: Dict[str, Any]) -> Dict[float, Dict[str, str]]:
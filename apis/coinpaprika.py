@@ -1,5 +1,6 @@
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from apis.crypto_api import CryptoAPI
+from apis.catalog import CatalogCache, get_catalog
 import requests
 from apis import utils
 
@@ -13,6 +14,9 @@ class CoinPaprikaAPI(CryptoAPI):
 
     Attributes:
         ohlc_url (str): OHLC (Open/High/Low/Close) data URL format of the API.
+        catalog (CatalogCache): The (very large) coin list, cached on disk
+            and revalidated in the background (see apis/catalog.py).
+        COIN_FIELDS (tuple): Fields kept for each coin of the list.
 
     Methods:
         get_data(N: int) -> List[Dict[str, Any]]:
@@ -21,20 +25,27 @@ class CoinPaprikaAPI(CryptoAPI):
             Extracts market cap data from API response.
     """
 
-    def __init__(self) -> None:
+    COIN_FIELDS = ("id", "name", "symbol", "rank")
+
+    def __init__(self, catalog: Optional[CatalogCache] = None) -> None:
         """
         Constructs all the necessary attributes for the CoinPaprikaAPI object.
+
+        Parameters:
+            catalog (CatalogCache, optional): Coin list cache to use.
+                Defaults to the shared coinpaprika catalog.
         """
         self.ohlc_url = "https://api.coinpaprika.com/v1/coins/{coin_id}/ohlcv/latest"  # noqa E501
         super().__init__(
             url="https://api.coinpaprika.com/v1/coins",
             source='coinpaprika'
         )
+        self.catalog = catalog or get_catalog(self.source, self.url, self.COIN_FIELDS)
 
     @utils.handle_request_errors
     def get_data(self, N: int) -> List[Dict[str, Any]]:
         """
-        Gets data from CoinPaprika API.
+        Gets the top N coins from the (cached) CoinPaprika coin list.
 
         Parameters:
             N (int): Number of cryptocurrencies to fetch.
@@ -43,20 +54,10 @@ class CoinPaprikaAPI(CryptoAPI):
             List[Dict[str, Any]]:
                 A list of dictionaries with data fetched from API.
         """
-        response = requests.get(self.url)
-        # HTTP 200 status code means the request was successful
-        if response.status_code == 200:
-            data = response.json()
-        else:
-            raise requests.exceptions.RequestException(
-                f"Received status code {response.status_code} "
-                f"for URL: {self.url}"
-            )
-        # Sorting the coins by market cap
+        # Keeping the top N coins by market cap (rank)
         # Also filtering out coins with rank 0 (junk values in API response)
-        filtered_data = [coin for coin in data if coin['rank'] != 0]
-        sorted_data = sorted(filtered_data, key=lambda coin: coin['rank'])[:N]
-        return sorted_data
+        ranked_data = (coin for coin in self.catalog.get() if coin['rank'] != 0)
+        return utils.top_n(ranked_data, N, key=lambda coin: coin['rank'])
 
     @utils.handle_request_errors
     def extract_market_cap(self, data: List[Dict[str, Any]]) -> Dict[float, Dict[str, Any]]:
@@ -75,10 +76,10 @@ class CoinPaprikaAPI(CryptoAPI):
         for coin in data:
             coin_id = coin["id"]
             coin_info_url = self.ohlc_url.format(coin_id=coin_id)
-            coin_info_response = requests.get(coin_info_url)
+            coin_info_response = self.transport.get(coin_info_url)
             # HTTP 200 status code means the request was successful
             if coin_info_response.status_code == 200:
-                coin_info = coin_info_response.json()
+                coin_info = utils.decode_json(coin_info_response)
             else:
                 raise requests.exceptions.RequestException(
                     f"Received status code {coin_info_response.status_code} "
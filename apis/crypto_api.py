@@ -2,6 +2,7 @@ from typing import Any
 from apis import utils
 import os
 import json
+import requests
 
 
 class CryptoAPI:
@@ -11,6 +12,8 @@ class CryptoAPI:
     Attributes:
         url (str): URL of the API.
         source (str): Source of the data.
+        transport: What requests are made through; the requests module,
+            or e.g. a recording / replaying transport (see apis/replay.py).
 
     Methods:
         fetch_data_by_mcap(N: int) -> dict:
@@ -22,6 +25,7 @@ class CryptoAPI:
     """
 
     API_KEYS_FILE = 'api_keys.json'
+    transport = requests
 
     def __init__(self, url: str, source: str) -> None:
         """
@@ -59,9 +59,9 @@ class CryptoCompareAPI(CryptoAPI):
             self.LIMIT: N + buffer,
             self.TSYM: self.USD,
         }
-        response = requests.get(self.url, params=parameters)
+        response = self.transport.get(self.url, params=parameters)
         if response.status_code == 200:
-            data = response.json()
+            data = utils.decode_json(response)
         else:
             raise requests.exceptions.RequestException(
                 f"Received status code {response.status_code} "
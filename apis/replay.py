@@ -0,0 +1,286 @@
+"""
+Record / replay transport for the CryptoAPI classes.
+
+Every CryptoAPI makes its requests through `self.transport.get(...)`, which
+is the `requests` module unless another transport is installed. A
+RecordingTransport passes requests through and stores the responses in a
+gzip-compressed cassette; a ReplayTransport serves them back from the
+cassette, optionally with latency and injected errors, so tests and
+benchmarks run offline with realistic payloads.
+
+Record a cassette (needs network, and an api key where the provider needs one):
+    python -m apis.replay record coinpaprika test/fixtures/coinpaprika.json.gz --n 50
+"""
+import os
+import gzip
+import json
+import time
+import random
+import functools
+import argparse
+import tempfile
+import contextlib
+import threading
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import requests
+
+from apis.crypto_api import CryptoAPI
+
+CASSETTE_VERSION = 1
+
+
+class CassetteMissError(Exception):
+    """Raised when a replayed request has no recorded response"""
+    pass
+
+
+def request_key(url: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """
+    The exact url a GET request goes to, used to match recorded responses.
+    Headers are not part of the key (nor recorded), so api keys never end up
+    in a cassette.
+
+    Parameters:
+        url (str): Request url.
+        params (Dict[str, Any], optional): Query parameters.
+
+    Returns:
+        str: The url with encoded query parameters.
+    """
+    try:
+        return _prepared_url(url, tuple(params.items()) if params else ())
+    except TypeError:   # unhashable parameter values, e.g. lists
+        return requests.Request('GET', url, params=params).prepare().url
+
+
+@functools.lru_cache(maxsize=4096)
+def _prepared_url(url: str, params: tuple) -> str:
+    # preparing a request is slow next to a replayed response; feeds repeat the same few urls
+    return requests.Request('GET', url, params=dict(params)).prepare().url
+
+
+class Cassette:
+    """
+    Recorded responses, keyed by request_key, in recording order.
+
+    Attributes:
+        interactions (Dict[str, List[dict]]):
+            request key -> recorded responses ({status_code, headers, body, elapsed}).
+    """
+
+    def __init__(self, interactions: Optional[Dict[str, List[dict]]] = None) -> None:
+        self.interactions = interactions or {}
+
+    def add(self, url: str, params: Optional[Dict[str, Any]] = None, body: Union[str, Any] = '',
+            status_code: int = 200, headers: Optional[Dict[str, str]] = None,
+            elapsed: float = 0.) -> None:
+        """
+        Add a response; a body that is not a str is stored as json.
+        """
+        if not isinstance(body, str):
+            body = json.dumps(body)
+        self.interactions.setdefault(request_key(url, params), []).append({
+            'status_code': status_code,
+            'headers': headers or {'Content-Type': 'application/json'},
+            'body': body,
+            'elapsed': elapsed,
+        })
+
+    def save(self, path: str) -> None:
+        """
+        Write the cassette as gzip-compressed json (atomically).
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            os.chmod(tmp, 0o644)
+            with os.fdopen(fd, 'wb') as raw, gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as f:
+                f.write(json.dumps({
+                    'version': CASSETTE_VERSION,
+                    'interactions': self.interactions,
+                }, sort_keys=True).encode())
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> 'Cassette':
+        with gzip.open(path, 'rb') as f:
+            data = json.loads(f.read())
+        if data.get('version') != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version {data.get('version')} in {path}")
+        return cls(data['interactions'])
+
+
+class RecordingTransport:
+    """
+    Passes requests through to `inner` (the requests module by default)
+    and records every response; save() or leaving the `with` block writes
+    the cassette.
+    """
+
+    def __init__(self, path: str, inner: Any = requests) -> None:
+        self.path = path
+        self.inner = inner
+        self.cassette = Cassette()
+        self._lock = threading.Lock()
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+        start = time.perf_counter()
+        response = self.inner.get(url, params=params, **kwargs)
+        elapsed = time.perf_counter() - start
+        content_type = response.headers.get('Content-Type', 'application/json')
+        with self._lock:
+            self.cassette.add(url, params, response.text, response.status_code,
+                              {'Content-Type': content_type}, elapsed)
+        return response
+
+    def save(self) -> None:
+        with self._lock:
+            self.cassette.save(self.path)
+
+    def __enter__(self) -> 'RecordingTransport':
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.save()
+
+
+class ReplayTransport:
+    """
+    Serves recorded responses as real requests.Response objects, so the
+    api classes parse them exactly as they would a live response.
+    A request recorded several times gets the recordings in order, then
+    the last one again.
+
+    Parameters:
+        cassette (Union[str, Cassette]): Cassette or path to one.
+        latency (Union[None, float, str, Callable[[dict], float]], optional):
+            Seconds to wait before each response: None (default) for none,
+            a number, 'recorded' for the latency seen when recording, or a
+            function of the recorded interaction.
+        error_rate (float, optional): Probability of raising `error` instead
+            of responding. Defaults to 0.
+        error (type, optional): Exception raised by injected errors.
+            Defaults to requests.exceptions.ConnectionError.
+        seed (int, optional): Seed for the error injection.
+    """
+
+    def __init__(self, cassette: Union[str, Cassette],
+                 latency: Union[None, float, str, Callable[[dict], float]] = None,
+                 error_rate: float = 0., error: type = requests.exceptions.ConnectionError,
+                 seed: Optional[int] = None) -> None:
+        self.cassette = Cassette.load(cassette) if isinstance(cassette, (str, os.PathLike)) else cassette
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error = error
+        self.random = random.Random(seed)
+        self.calls = []         # request keys, in order served
+        self._played = {}       # request key -> number of times served
+        self._lock = threading.Lock()
+
+    def _delay(self, interaction: dict) -> float:
+        if self.latency is None:
+            return 0.
+        if self.latency == 'recorded':
+            return interaction['elapsed']
+        if callable(self.latency):
+            return self.latency(interaction)
+        return self.latency
+
+    def get(self, url: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+        key = request_key(url, params)
+        recorded = self.cassette.interactions.get(key)
+        if not recorded:
+            raise CassetteMissError(f"No recorded response for GET {key}")
+        with self._lock:
+            played = self._played.get(key, 0)
+            self._played[key] = played + 1
+            self.calls.append(key)
+            fail = self.error_rate and self.random.random() < self.error_rate
+        interaction = recorded[min(played, len(recorded) - 1)]
+
+        delay = self._delay(interaction)
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise self.error(f"Injected error for GET {key}")
+
+        response = requests.Response()
+        response.status_code = interaction['status_code']
+        response.headers.update(interaction['headers'])
+        response._content = interaction['body'].encode()
+        response.encoding = 'utf-8'
+        response._content_consumed = True   # so iter_content() serves _content
+        response.url = key
+        return response
+
+
+@contextlib.contextmanager
+def installed(transport: Any):
+    """
+    Make every CryptoAPI (and subclass) use transport within the block.
+
+    Parameters:
+        transport (Any): Object with a requests-compatible get().
+    """
+    previous = CryptoAPI.transport
+    CryptoAPI.transport = transport
+    try:
+        yield transport
+    finally:
+        CryptoAPI.transport = previous
+
+
+def _providers() -> Dict[str, type]:
+    from apis.coingecko import CoinGeckoAPI
+    from apis.coinmarketcap import CoinMarketCapAPI
+    from apis.coinpaprika import CoinPaprikaAPI
+    from apis.cryptocompare import CryptoCompareAPI
+    return {
+        'coingecko': CoinGeckoAPI,
+        'coinmarketcap': CoinMarketCapAPI,
+        'coinpaprika': CoinPaprikaAPI,
+        'cryptocompare': CryptoCompareAPI,
+    }
+
+
+def record(source: str, path: str, N: int, inner: Any = requests) -> Dict[float, Dict[str, Any]]:
+    """
+    Record the requests of one get_data + extract_market_cap round trip.
+
+    Parameters:
+        source (str): Provider name, e.g. 'coinpaprika'.
+        path (str): Where to write the cassette.
+        N (int): Number of cryptocurrencies to fetch.
+        inner (Any, optional): Transport to record. Defaults to requests.
+
+    Returns:
+        Dict[float, Dict[str, Any]]: The extracted market data.
+    """
+    api = _providers()[source]()
+    if hasattr(api, 'catalog'):
+        # a fresh in-memory coin list, so its download is recorded too
+        from apis.catalog import CatalogCache
+        api.catalog = CatalogCache(api.catalog.name, api.catalog.url, api.catalog.fields,
+                                   path=None, refresh_interval=0)
+    with RecordingTransport(path, inner) as recorder, installed(recorder):
+        data = api.get_data(N)
+        if data is None:
+            raise RuntimeError(f"Request to {source} failed, nothing recorded")
+        return api.extract_market_cap(data)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='record api responses for offline replay')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    record_parser = subparsers.add_parser('record')
+    record_parser.add_argument('source', help='e.g. coingecko, coinmarketcap, coinpaprika, cryptocompare')
+    record_parser.add_argument('path', help='cassette to write, e.g. test/fixtures/coingecko.json.gz')
+    record_parser.add_argument('--n', type=int, default=50)
+    args = parser.parse_args()
+    market_data = record(args.source, args.path, args.n)
+    print(f"Recorded {args.source} ({len(market_data)} coins) to {args.path}")
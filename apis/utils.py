@@ -1,11 +1,42 @@
 import os
+import re
 import json
+import codecs
+import heapq
 import sqlite3
 import time
-from typing import Any, Dict, Callable, Optional
+from typing import Any, Dict, Callable, Iterable, Iterator, List, Optional
+import requests
 from requests.exceptions import RequestException
 from functools import wraps
 import datetime
+import metrics
+from apis import circuit
+from siwa_logging import SQLITE_WRITE_LATENCY
+
+# Fastest available json decoder: orjson, then ujson, then the standard library
+try:
+    import orjson
+    json_loads = orjson.loads
+    JSON_DECODER = 'orjson'
+except ImportError:
+    try:
+        import ujson
+        json_loads = ujson.loads
+        JSON_DECODER = 'ujson'
+    except ImportError:
+        json_loads = json.loads
+        JSON_DECODER = 'json'
+
+STREAM_CHUNK_SIZE = 1 << 16
+JSON_TOKENS = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"|[{}\[\]"]')    # strings and brackets, see iter_json_array
+
+UPSTREAM_LATENCY = metrics.histogram(
+    'siwa_upstream_request_seconds',
+    'latency of requests to upstream data apis', ['source'])
+UPSTREAM_ERRORS = metrics.counter(
+    'siwa_upstream_errors_total',
+    'failed requests to upstream data apis', ['source', 'error'])
 
 
 class MissingDataException(Exception):
@@ -24,6 +55,167 @@ def convert_timestamp_to_unixtime(timestamp):
     return unix_datetime.timestamp()
 
 
+def to_unixtime(timestamp: Any) -> Optional[float]:
+    """
+    Normalises the last updated times the apis return to unix time.
+
+    Parameters:
+        timestamp (Any): Unix time in seconds or milliseconds, or an
+            ISO 8601 string e.g. '2022-08-11T09:10:12.364Z'.
+
+    Returns:
+        Optional[float]: Unix time, None if unknown (missing, 0 or unparseable).
+    """
+    if not timestamp:
+        return None
+    if isinstance(timestamp, str):
+        try:
+            return datetime.datetime.fromisoformat(timestamp.replace('Z', '+00:00')).timestamp()
+        except ValueError:
+            return None
+    timestamp = float(timestamp)
+    return timestamp / 1000 if timestamp > 1e11 else timestamp  # milliseconds
+
+
+def latest_update(market_data: Dict[Any, Dict[str, Any]]) -> Optional[float]:
+    """
+    The most recent last_updated time (see to_unixtime) in market data,
+    i.e. how fresh the data is at its source.
+
+    Parameters:
+        market_data (Dict[Any, Dict[str, Any]]): Coin details keyed by
+            market cap or id, each with a 'last_updated' time.
+
+    Returns:
+        Optional[float]: Unix time, None if no coin has a known time.
+    """
+    times = [to_unixtime(coin.get('last_updated')) for coin in market_data.values()]
+    return max((t for t in times if t is not None), default=None)
+
+
+def decode_json(response: Any) -> Any:
+    """
+    Decodes a json response body with the fastest available decoder
+    (see JSON_DECODER).
+
+    Parameters:
+        response (Any): A requests.Response, or anything else with a .json()
+            method (e.g. a test double).
+
+    Returns:
+        Any: The decoded json.
+
+    Raises:
+        requests.exceptions.JSONDecodeError: If the body is not json (e.g.
+            an html error page), like response.json().
+    """
+    if isinstance(response, requests.Response):
+        try:
+            return json_loads(response.content)
+        except ValueError as e:
+            raise requests.exceptions.JSONDecodeError(
+                str(e), getattr(e, 'doc', ''), getattr(e, 'pos', 0), response=response) from e
+    return response.json()
+
+
+def iter_json_array(chunks: Iterable[bytes], loads: Callable[[str], Any] = None) -> Iterator[Any]:
+    """
+    Incrementally decodes a json array from chunks of utf-8 bytes (e.g.
+    response.iter_content()), yielding its elements as they arrive, so the
+    whole array is never held in memory at once. All complete elements in
+    the buffer are decoded in one call of the fast decoder; an array of
+    objects (like every provider's coin list) is buffered at most one
+    chunk plus one element at a time.
+
+    Parameters:
+        chunks (Iterable[bytes]): The raw json, in pieces of any size.
+        loads (Callable[[str], Any], optional): Decoder. Defaults to json_loads.
+
+    Yields:
+        Any: The elements of the array, in order.
+
+    Raises:
+        ValueError: If the json is not an array or is malformed.
+    """
+    loads = loads or json_loads
+    text = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    started = False
+    # Where the last '}' does not close an element (nested objects), the
+    # nesting depth is tracked instead, from where the last chunk left off,
+    # so no character is scanned twice; a string is one token, one cut off
+    # at the end of the buffer is scanned again with the next chunk.
+    depth, scanned = 0, 0
+    for chunk in chunks:
+        buffer += text.decode(chunk)
+        if not started:
+            buffer = buffer.lstrip()
+            if not buffer:
+                continue
+            if buffer[0] != '[':
+                raise ValueError("Expected a json array")
+            buffer, started = buffer[1:], True
+        elements = None
+        if not scanned:
+            buffer = buffer.lstrip(' \t\r\n,')
+            # Usually the last '}' closes an element, and everything up to it
+            # decodes; one closing a nested object or inside a string never
+            # leaves a valid array.
+            end = buffer.rfind('}')
+            if end >= 0:
+                try:
+                    elements = loads('[' + buffer[:end + 1] + ']')
+                except ValueError:
+                    pass
+        if elements is None:
+            end = -1
+            scanned_to = len(buffer)
+            for match in JSON_TOKENS.finditer(buffer, scanned):
+                token = match.group()
+                if token == '"':
+                    scanned_to = match.start()
+                    break
+                if token in ('{', '['):
+                    depth += 1
+                elif token in ('}', ']'):
+                    depth -= 1
+                    if depth == 0:
+                        end = match.start()
+            scanned = scanned_to
+            if end < 0:
+                continue
+            elements = loads('[' + buffer[:end + 1] + ']')
+            depth, scanned = 0, 0
+        buffer = buffer[end + 1:]
+        yield from elements
+    buffer += text.decode(b'', final=True)
+    if not started:
+        raise ValueError("Expected a json array")
+    yield from loads('[' + buffer.lstrip(' \t\r\n,'))
+
+
+def top_n(rows: Iterable[Dict[str, Any]], N: int, key: Callable[[Dict[str, Any]], Any],
+          fields: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+    """
+    The N rows with the smallest key, in order, keeping only the given
+    fields of each; memory is bounded by N, not by the number of rows.
+
+    Parameters:
+        rows (Iterable[Dict[str, Any]]): Rows, e.g. from iter_json_array.
+        N (int): Number of rows to keep.
+        key (Callable[[Dict[str, Any]], Any]): Sort key, e.g. the rank.
+        fields (Iterable[str], optional): Fields to keep. Defaults to all.
+
+    Returns:
+        List[Dict[str, Any]]: The top N rows.
+    """
+    top = heapq.nsmallest(N, rows, key=key)
+    if fields is not None:
+        fields = tuple(fields)
+        top = [{field: row[field] for field in fields if field in row} for row in top]
+    return top
+
+
 def create_market_cap_database(db_path: str = 'data.db') -> None:
     """
     Creates a SQLite database (if not exists) to store market cap data.
@@ -56,6 +248,7 @@ def store_market_cap_data(
         source (str): Source of the market cap data.
         db_path (str, optional): Path to the SQLite database. Defaults to 'data.db'.
     """
+    start = time.perf_counter()
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     for market_cap, md in market_data.items():
@@ -65,13 +258,20 @@ def store_market_cap_data(
             (md['name'], market_cap, md['last_updated'], int(time.time()), source))
     conn.commit()
     conn.close()
+    SQLITE_WRITE_LATENCY.labels('market_cap_data').observe(time.perf_counter() - start)
 
 
 def handle_request_errors(
         func: Callable[..., Any]
 ) -> Callable[..., Optional[Any]]:
     """
-    Decorator function to handle request errors.
+    Decorator function to handle request errors, and record the latency
+    and errors of the request per api source (see metrics.py).
+    Requests go through the circuit breaker of their source (see
+    circuit.py): while it is open they are not made and None is returned.
+    Only request errors (which include non-200 responses) and missing data
+    count as failures of the provider; other exceptions are raised without
+    counting either way.
 
     Parameters:
         func (Callable[..., Any]): The function to be decorated.
@@ -81,10 +281,24 @@ def handle_request_errors(
     """
     @wraps(func)
     def wrapper(*args, **kwargs):
+        source = getattr(args[0], 'source', func.__qualname__) if args else func.__qualname__
+        breaker = circuit.breaker(source)
+        if not breaker.allow():
+            return None
+        start = time.perf_counter()
         try:
-            return func(*args, **kwargs)
-        except RequestException as e:
+            result = func(*args, **kwargs)
+        except (RequestException, MissingDataException) as e:
+            breaker.record_failure()
+            UPSTREAM_ERRORS.labels(source, type(e).__name__).inc()
             print("Error occurred while making the API request:", str(e))
             print("Warning: Continuing with the rest of the execution.")
             return None
+        except Exception:
+            breaker.record_aborted()
+            raise
+        finally:
+            UPSTREAM_LATENCY.labels(source).observe(time.perf_counter() - start)
+        breaker.record_success()
+        return result
     return wrapper
@@ -0,0 +1,195 @@
+''' module documentation:
+the http/json endpoint as an ASGI app, for an evented server (uvicorn)
+
+serves the same routes and json as endpoint.py (/, /datafeed/<feedname>,
+/logs, /metrics, /attestation) from one event loop instead of waitress'
+thread pool: a feed's latest data point is read from memory without
+blocking, and the one slow route, /logs, runs its sqlite query in a thread, so no client waits
+behind another one. idle keep-alive connections stay open HTTP_KEEP_ALIVE
+seconds.
+
+    python siwa.py --server asgi
+    python siwa.py --server asgi --http-workers 4
+
+with more than one http worker the endpoint runs as uvicorn worker processes
+next to siwa, serving the data points siwa keeps on the shared-memory board
+(see shm_board.py; --board is then implied). needs `pip install uvicorn`
+'''
+
+#stdlib
+import os
+import sys
+import json
+import time
+import atexit
+import asyncio
+import subprocess
+from collections.abc import Mapping
+from urllib.parse import parse_qs
+
+#third party
+from werkzeug.exceptions import HTTPException, NotFound, MethodNotAllowed
+
+#our stuff
+import constants as c
+import endpoint
+import metrics
+from feeds.data_feed import DataFeed
+from shm_board import BoardReader, BoardError
+
+DATAFEED_ROUTE = '/datafeed/<feedname>'
+DATAFEED_PREFIX = '/datafeed/'
+PROOF_ROUTE = '/attestation/proof/<feedname>'
+PROOF_PREFIX = '/attestation/proof/'
+BOARD_PATH_ENV = 'SIWA_BOARD_PATH'      #board the http worker processes read, see board_app
+JSON = [(b'content-type', b'application/json')]
+TEXT = [(b'content-type', b'text/html; charset=utf-8')]
+PROMETHEUS = [(b'content-type', b'text/plain; version=0.0.4')]
+
+REQUEST_LATENCY = endpoint.REQUEST_LATENCY     #one histogram, whichever server serves
+
+
+def dumps(data):
+    return json.dumps(data, separators=(',', ':')).encode()
+
+
+class App:
+    ''' the endpoint as an ASGI app; feeds maps feed names to feeds
+    (e.g. all_feeds.all_feeds, or a BoardFeeds) '''
+
+    def __init__(self, feeds):
+        self.feeds = feeds
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+        start = time.perf_counter()
+        route = 'unmatched'
+        try:
+            route, headers, body = await self.handle(scope)
+            status = 200
+        except HTTPException as error:
+            status, headers, body = error.code, JSON, dumps(endpoint.error_dict(error))
+        await send({'type': 'http.response.start', 'status': status,
+                    'headers': headers + [(b'content-length', str(len(body)).encode())]})
+        await send({'type': 'http.response.body', 'body': body if scope['method'] != 'HEAD' else b''})
+        REQUEST_LATENCY.labels(route, status).observe(time.perf_counter() - start)
+
+    async def handle(self, scope):
+        ''' (route, headers, body) of the response to a request; raises the http error to answer with instead '''
+        path = scope['path']
+        if path.startswith(DATAFEED_PREFIX) and '/' not in path[len(DATAFEED_PREFIX):]:
+            route = DATAFEED_ROUTE
+        elif path.startswith(PROOF_PREFIX) and '/' not in path[len(PROOF_PREFIX):]:
+            route = PROOF_ROUTE
+        elif path in ('/', '/logs', '/metrics', '/attestation'):
+            route = path
+        else:
+            raise NotFound()
+        if scope['method'] not in ('GET', 'HEAD'):
+            raise MethodNotAllowed()
+
+        query = parse_qs(scope['query_string'].decode())
+        if route == DATAFEED_ROUTE:
+            max_age = query.get(c.MAX_AGE, [None])[0]
+            data_point = endpoint.latest_data_point(self.feeds, path[len(DATAFEED_PREFIX):], max_age)
+            return route, JSON, dumps(data_point)
+        if route == '/logs':
+            #sqlite blocks: keep it off the event loop
+            return route, JSON, dumps(await asyncio.to_thread(endpoint.read_logs))
+        if route == '/attestation':
+            return route, JSON, dumps(endpoint.attestation_batch(query.get('round', [None])[0]).to_dict())
+        if route == PROOF_ROUTE:
+            proof = endpoint.attestation_proof(path[len(PROOF_PREFIX):], query.get('round', [None])[0])
+            return route, JSON, dumps(proof)
+        if route == '/metrics':
+            return route, PROMETHEUS, metrics.render().encode()
+        return route, TEXT, b'this is a siwa endpoint'
+
+
+class BoardFeed:
+    ''' a feed as found on the shared-memory board '''
+
+    def __init__(self, reader, name):
+        self.reader = reader
+        self.NAME = name
+
+    def get_most_recently_stored_data_point(self):
+        record = self.reader.read(self.NAME)
+        return dict(zip(DataFeed.DATA_KEYS, (self.NAME, record.timestamp, record.value, record.source_time,
+                                             time.time() - record.source_time, record.degraded)))
+
+
+class BoardFeeds(Mapping):
+    ''' the feeds on the shared-memory board, read-only; the board is (re)opened
+    when it appears or siwa replaced it, checking at most every BOARD_POLL_INTERVAL seconds '''
+
+    def __init__(self, path=c.BOARD_PATH):
+        self.path = path
+        self.reader = None
+        self._checked = None
+
+    def _reader(self):
+        now = time.monotonic()
+        if self._checked is None or now - self._checked > c.BOARD_POLL_INTERVAL:
+            self._checked = now
+            if self.reader is None or self.reader.stale():
+                try:
+                    reader = BoardReader(self.path)
+                except BoardError:
+                    reader = None
+                if reader is not None:
+                    if self.reader is not None:
+                        self.reader.close()
+                    self.reader = reader
+        return self.reader
+
+    def __getitem__(self, name):
+        reader = self._reader()
+        if reader is None:
+            raise KeyError(name)
+        reader.read(name)
+        return BoardFeed(reader, name)
+
+    def __contains__(self, name):
+        try:
+            self[name]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        reader = self._reader()
+        return iter(reader.names() if reader is not None else [])
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+
+def board_app():
+    ''' the app of the http worker processes (uvicorn asgi:board_app --factory) '''
+    return App(BoardFeeds(os.environ.get(BOARD_PATH_ENV, c.BOARD_PATH)))
+
+
+def run(all_feeds, port=c.ENDPOINT_PORT, workers=1, board_path=c.BOARD_PATH):
+    ''' run the webserver: in this thread with one worker, else as worker processes reading the board '''
+    if workers > 1:
+        process = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'asgi:board_app', '--factory',
+                                    '--host', '0.0.0.0', '--port', str(port), '--workers', str(workers),
+                                    '--timeout-keep-alive', str(c.HTTP_KEEP_ALIVE), '--no-access-log'],
+                                   cwd=c.PROJECT_PATH, env={**os.environ, BOARD_PATH_ENV: str(board_path)})
+        atexit.register(process.terminate)      #the workers go when siwa does
+        process.wait()
+        return
+    import uvicorn
+    config = uvicorn.Config(App(all_feeds), host='0.0.0.0', port=port, lifespan='off',
+                            timeout_keep_alive=c.HTTP_KEEP_ALIVE, access_log=False, log_level='warning')
+    uvicorn.Server(config).run()
@@ -0,0 +1,311 @@
+''' module documentation:
+signed batches of data points, for submitting a round of updates on chain in one transaction
+
+with `python siwa.py --attest`, every ATTESTATION_INTERVAL seconds siwa packs the
+latest data point of each feed that published since the last round into one
+ABI-encoded payload and signs it with the key in the SIWA_SIGNING_KEY
+environment variable, for the contract at the address in SIWA_ATTESTATION_CONTRACT
+on ATTESTATION_CHAIN. a collector fetches the latest batch from /attestation
+and submits payload and signature in one transaction, instead of one per feed.
+
+the payload is abi.encode(uint256 chainId, address verifyingContract, uint64 round,
+uint64 timestamp, bytes32 merkleRoot, Entry[] entries) with Entry = (uint256 feedId,
+int256 value, uint64 timestamp, uint64 sourceTime, bool degraded): values are
+integers of value * 10**ATTESTATION_DECIMALS, times are unix seconds, entries are
+ordered by feed id, and feed ids are unique (a round of feeds sharing an id fails).
+chainId and verifyingContract are the domain: a contract rejects a batch unless
+they are block.chainid and address(this), so a batch can't be replayed to another
+contract or chain. rounds count from 1 again when siwa restarts, so a contract
+should only accept a batch newer (by timestamp) than the last. the signature is an
+EIP-191 personal signature of keccak256(payload), i.e. a contract checks it with
+    ECDSA.recover(MessageHashUtils.toEthSignedMessageHash(keccak256(payload)), signature)
+
+the merkle root (zero if ATTESTATION_MERKLE is off) is over the entries, a leaf
+being keccak256(keccak256(abi.encode(entry))) and pairs hashed in sorted order, as
+OpenZeppelin's MerkleProof expects: /attestation/proof/<feedname> proves a single
+feed's entry against a root submitted before, e.g. to a consumer contract that
+needs only that feed.
+
+feed threads only note their latest data point (a dict assignment); encoding,
+hashing and signing happen in the attestation thread
+'''
+
+#stdlib
+import os
+import math
+import time
+import threading
+from decimal import Decimal
+from dataclasses import dataclass, field
+from collections import deque
+
+#our stuff
+import constants as c
+import metrics
+
+ENTRY_TYPES = ['uint256', 'int256', 'uint64', 'uint64', 'bool']
+PAYLOAD_TYPES = ['uint256', 'address', 'uint64', 'uint64', 'bytes32', f'({",".join(ENTRY_TYPES)})[]']
+EMPTY_ROOT = bytes(32)
+
+BATCHES = metrics.counter(
+    'siwa_attestation_batches_total',
+    'signed batches of data points (rounds) produced')
+SIGN_LATENCY = metrics.histogram(
+    'siwa_attestation_sign_seconds',
+    'time to encode, hash and sign a round')
+
+
+class AttestationError(Exception):
+    """Raised when there is no signing key or contract, feeds share an id, or a feed or round was not attested"""
+    pass
+
+
+#web3's packages are heavy: imported on first use only
+def abi_encode(types, values):
+    try:
+        from eth_abi import encode
+    except ImportError:     #eth-abi < 4
+        from eth_abi import encode_abi as encode
+    return encode(types, values)
+
+def keccak(data):
+    from eth_utils import keccak
+    return keccak(data)
+
+def signable(payload):
+    from eth_account.messages import encode_defunct
+    return encode_defunct(primitive=keccak(payload))
+
+
+def to_integer(value, decimals=c.ATTESTATION_DECIMALS):
+    ''' a value as the integer attested for it; None if it is not a finite number '''
+    try:
+        if not math.isfinite(value):
+            return None
+    except TypeError:
+        return None
+    return int(Decimal(str(value)).scaleb(decimals).to_integral_value())
+
+def to_entry(feed_id, dp):
+    ''' the abi entry of a data point; None if its value can't be attested '''
+    value = to_integer(dp.value)
+    if value is None:
+        return None
+    return (feed_id, value, int(dp.timestamp), int(dp.source_time), bool(dp.degraded))
+
+def check_ids(feeds):
+    ''' raise AttestationError if any of the (name, feed id) pairs share an id:
+    a contract couldn't tell their entries apart '''
+    names = {}
+    for name, feed_id in feeds:
+        if feed_id in names:
+            raise AttestationError(f'feeds {names[feed_id]} and {name} share id {feed_id}: give one another id in feeds.toml')
+        names[feed_id] = name
+
+def leaf(entry):
+    return keccak(keccak(abi_encode(ENTRY_TYPES, entry)))
+
+def hash_pair(a, b):
+    return keccak(min(a, b) + max(a, b))
+
+def merkle_levels(leaves):
+    ''' the levels of a merkle tree, leaves first; an odd node out moves up a level as is '''
+    levels = [list(leaves)]
+    while len(levels[-1]) > 1:
+        level = levels[-1]
+        levels.append([hash_pair(*level[i:i + 2]) if i + 1 < len(level) else level[i]
+                       for i in range(0, len(level), 2)])
+    return levels
+
+def merkle_proof(levels, index):
+    ''' the sibling hashes proving the leaf at index '''
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(level[sibling])
+        index //= 2
+    return proof
+
+def verify(proof, root, leaf_hash):
+    ''' whether a proof (see merkle_proof) proves a leaf against a root, as MerkleProof.verify does '''
+    for sibling in proof:
+        leaf_hash = hash_pair(leaf_hash, sibling)
+    return leaf_hash == root
+
+
+@dataclass
+class Batch:
+    ''' one signed round '''
+    chain_id: int
+    contract: str
+    round: int
+    timestamp: int
+    names: list                 #feed names, in the order of entries
+    entries: list
+    payload: bytes
+    root: bytes
+    signature: bytes
+    signer: str
+    levels: list = field(default=None, repr=False)     #the merkle tree, for proofs
+
+    def to_dict(self):
+        return {
+            'chain_id': self.chain_id,
+            'contract': self.contract,
+            'round': self.round,
+            'timestamp': self.timestamp,
+            'signer': self.signer,
+            'payload': '0x' + self.payload.hex(),
+            'signature': '0x' + self.signature.hex(),
+            'merkle_root': '0x' + self.root.hex(),
+            'decimals': c.ATTESTATION_DECIMALS,
+            'feeds': {name: dict(zip(('feed_id', 'value', 'timestamp', 'source_time', 'degraded'), entry))
+                      for name, entry in zip(self.names, self.entries)},
+        }
+
+    def proof(self, name):
+        ''' the merkle proof of a feed's entry '''
+        if self.levels is None:
+            raise AttestationError(f'round {self.round} has no merkle root')
+        if name not in self.names:
+            raise AttestationError(f'{name} is not in round {self.round}')
+        index = self.names.index(name)
+        return {
+            'round': self.round,
+            'feed': name,
+            'entry': list(self.entries[index]),
+            'leaf': '0x' + self.levels[0][index].hex(),
+            'merkle_root': '0x' + self.root.hex(),
+            'proof': ['0x' + sibling.hex() for sibling in merkle_proof(self.levels, index)],
+        }
+
+
+class Attester:
+    ''' signs a batch of the data points published by the feeds of a registry (e.g.
+    all_feeds.all_feeds) every ATTESTATION_INTERVAL seconds, keeping the last ATTESTATION_HISTORY;
+    the batches are for the contract at address `contract` on the chain with id `chain_id` '''
+
+    def __init__(self, feeds, key=None, contract=None, chain_id=c.CHAIN_IDS[c.ATTESTATION_CHAIN],
+                 merkle=c.ATTESTATION_MERKLE):
+        key = key or os.environ.get(c.ATTESTATION_KEY_ENV)
+        if not key:
+            raise AttestationError(f'no signing key: set {c.ATTESTATION_KEY_ENV} to a private key (hex)')
+        contract = contract or os.environ.get(c.ATTESTATION_CONTRACT_ENV)
+        from eth_utils import is_address, to_checksum_address
+        if not contract or not is_address(contract):
+            raise AttestationError(f'no contract: set {c.ATTESTATION_CONTRACT_ENV} to the address batches are for')
+        from eth_account import Account
+        self.account = Account.from_key(key)
+        self.contract = to_checksum_address(contract)
+        self.chain_id = chain_id
+        self.feeds = feeds
+        self.merkle = merkle
+        self.round = 0
+        self.batches = deque(maxlen=c.ATTESTATION_HISTORY)
+        self._pending = {}          #feed name -> (feed id, latest data point) since the last round
+        self._lock = threading.Lock()
+        self._subscriptions = {}    #feed name -> (feed, callback)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.poll()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='attestation')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for feed, callback in self._subscriptions.values():
+            feed.unsubscribe(callback)
+        self._subscriptions = {}
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+
+    def poll(self):
+        ''' subscribe to the feeds loaded since the last call;
+        raises AttestationError if loaded feeds share an id '''
+        loaded = self.feeds.loaded()
+        check_ids((name, feed.ID) for name, feed in loaded.items())
+        for name, feed in loaded.items():
+            subscribed = self._subscriptions.get(name)
+            if subscribed is not None and subscribed[0] is feed:
+                continue
+            if subscribed is not None:
+                subscribed[0].unsubscribe(subscribed[1])
+            callback = lambda dp, feed=feed: self.note(feed.NAME, feed.ID, dp)
+            feed.subscribe(callback)
+            self._subscriptions[name] = (feed, callback)
+
+    def note(self, name, feed_id, dp):
+        ''' called from feed threads: remember the data point for the next round, nothing more '''
+        with self._lock:
+            self._pending[name] = (feed_id, dp)
+
+    def _run(self):
+        while not self._stop.wait(c.ATTESTATION_INTERVAL):
+            try:
+                self.poll()
+                self.sign_round()
+            except Exception as e:
+                print(f'{c.WARNING}attestation round {self.round + 1} failed: {e}{c.ENDC}')
+
+    def sign_round(self, now=None):
+        ''' sign the data points noted since the last round; returns the Batch, None if there were none.
+        raises AttestationError (and the round's data points are dropped) if feeds in it share an id '''
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        start = time.perf_counter()
+        check_ids((name, feed_id) for name, (feed_id, _) in pending.items())
+        entries = sorted((entry, name) for name, entry in
+                         ((name, to_entry(feed_id, dp)) for name, (feed_id, dp) in pending.items())
+                         if entry is not None)
+        if not entries:
+            return None
+        names = [name for _, name in entries]
+        entries = [entry for entry, _ in entries]
+        levels = merkle_levels(map(leaf, entries)) if self.merkle else None
+        root = levels[-1][0] if levels else EMPTY_ROOT
+        self.round += 1
+        timestamp = int(time.time() if now is None else now)
+        payload = abi_encode(PAYLOAD_TYPES, [self.chain_id, self.contract, self.round, timestamp, root, entries])
+        signature = self.account.sign_message(signable(payload)).signature
+        batch = Batch(self.chain_id, self.contract, self.round, timestamp, names, entries, payload, root,
+                      bytes(signature), self.account.address, levels)
+        self.batches.append(batch)
+        BATCHES.inc()
+        SIGN_LATENCY.observe(time.perf_counter() - start)
+        return batch
+
+    def batch(self, round=None):
+        ''' the batch of a round, default the latest '''
+        if round is None:
+            if not self.batches:
+                raise AttestationError('no round signed yet')
+            return self.batches[-1]
+        for batch in self.batches:
+            if batch.round == round:
+                return batch
+        raise AttestationError(f'round {round} is not kept (the last {c.ATTESTATION_HISTORY} are)')
+
+
+def recover(payload, signature):
+    ''' the address that signed a payload '''
+    from eth_account import Account
+    return Account.recover_message(signable(payload), signature=signature)
+
+
+_running = {}       #'attester' -> the running Attester, see attest
+
+
+def attest(feeds, key=None, contract=None):
+    ''' start signing rounds of the feeds' data points (see siwa.py --attest);
+    raises AttestationError if there is no key or contract, or loaded feeds share an id '''
+    _running['attester'] = Attester(feeds, key, contract).start()
+    return _running['attester']
+
+def attester():
+    ''' the running Attester, None unless this siwa attests '''
+    return _running.get('attester')
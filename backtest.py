@@ -0,0 +1,181 @@
+''' module documentation:
+deterministic backtest / replay harness for datafeeds
+
+drives a DataFeed from recorded source data on a virtual clock:
+instead of sleeping HEARTBEAT seconds between data points, the clock
+jumps straight to the next heartbeat, so a month of heartbeats runs
+in seconds; the feed's source hooks are swapped out for the replay:
+    get_latest_source_data  -> as-of value of a recorded series
+    CryptoAPI.get_data      -> as-of recorded raw payload per api source
+and the generated series is written to disk as a columnar dataset
+
+run from the command line like this:
+    python backtest.py gauss data/ETH-USD_2022-01-01-00-00_2022-03-01-00-00_300secs --out data/backtest_gauss
+'''
+
+#stdlib
+import argparse
+import contextlib
+from collections import deque
+
+#third party
+import numpy as np
+import pandas as pd
+
+#our stuff
+import constants as c
+import dataset
+from all_feeds import available_feeds
+from apis import utils
+from apis.crypto_api import CryptoAPI
+
+TIME = 'time'
+
+
+class ReplaySeries:
+    ''' recorded source data: values (numbers or raw api payloads)
+    at increasing unix times, looked up "as of" a virtual time '''
+
+    def __init__(self, times, values):
+        self.times = np.asarray(times, dtype=float)
+        self.values = values
+        if len(self.times) != len(values):
+            raise ValueError('times and values must have the same length')
+
+    @classmethod
+    def from_dataset(cls, path, time_column=TIME, value_column='close'):
+        ''' load a recorded series, e.g. the ETH-USD sample, via dataset.load '''
+        data = dataset.load(path)
+        times = data[time_column]
+        if times.dtype.kind == 'M':
+            times = times.astype('datetime64[ns]').astype(np.int64) / 1e9
+        return cls(times, np.asarray(data[value_column]))
+
+    @property
+    def start(self):
+        return self.times[0]
+
+    @property
+    def end(self):
+        return self.times[-1]
+
+    def at(self, t):
+        ''' latest value recorded at or before t (None before the first record) '''
+        i = np.searchsorted(self.times, t, side='right') - 1
+        return None if i < 0 else self.values[i]
+
+
+def _subclasses(cls):
+    for sub in cls.__subclasses__():
+        yield sub
+        yield from _subclasses(sub)
+
+
+@contextlib.contextmanager
+def _swapped(obj, name, value):
+    ''' temporarily replace an attribute set directly on obj (not inherited) '''
+    missing = object()
+    old = obj.__dict__.get(name, missing)
+    setattr(obj, name, value)
+    try:
+        yield
+    finally:
+        if old is missing:
+            delattr(obj, name)
+        else:
+            setattr(obj, name, old)
+
+
+class Backtest:
+    ''' replay a feed over recorded data
+
+    Parameters:
+        feed: DataFeed instance to drive (a DataFeed subclass gets a fresh instance)
+        source (ReplaySeries, optional): served by get_latest_source_data
+        api_sources (dict, optional): CryptoAPI source name (e.g. 'coingecko')
+            -> ReplaySeries of raw get_data payloads; sources not listed
+            return None, i.e. behave like a failed request
+        start, end (float, optional): unix time range, defaults to the recorded range
+        heartbeat (float, optional): virtual seconds between ticks, defaults to feed.HEARTBEAT
+        seed (int): numpy seed, so stochastic feeds (e.g. gauss) replay identically
+    '''
+
+    def __init__(self, feed, source=None, api_sources=None,
+                 start=None, end=None, heartbeat=None, seed=0):
+        self.feed = feed() if isinstance(feed, type) else feed
+        self.source = source
+        self.api_sources = api_sources or {}
+        recorded = [s for s in [source, *self.api_sources.values()] if s is not None]
+        self.start = start if start is not None else min(s.start for s in recorded)
+        self.end = end if end is not None else max(s.end for s in recorded)
+        self.heartbeat = heartbeat or self.feed.HEARTBEAT
+        self.seed = seed
+        self.now = self.start
+
+    def _hooks(self):
+        ''' swap the feed's sources (and anything touching disk / network) for the replay '''
+        feed = self.feed
+
+        def get_latest_source_data(*args, **kwargs):
+            return self.source.at(self.now)
+
+        def get_data(api, N, *args, **kwargs):
+            recorded = self.api_sources.get(api.source)
+            return None if recorded is None else recorded.at(self.now)
+
+        stack = contextlib.ExitStack()
+        stack.enter_context(_swapped(feed, 'DATAPOINT_DEQUE', deque([], maxlen=feed.DATAPOINT_DEQUE.maxlen)))
+        stack.enter_context(_swapped(feed, 'COUNT', 0))
+        if self.source is not None:
+            stack.enter_context(_swapped(feed, 'get_latest_source_data', get_latest_source_data))
+        for api in [CryptoAPI, *_subclasses(CryptoAPI)]:
+            stack.enter_context(_swapped(api, 'get_data', get_data))
+            #no request is ever made, so no real key is needed
+            stack.enter_context(_swapped(api, 'get_api_key', lambda api, name: 'backtest'))
+        stack.enter_context(_swapped(utils, 'create_market_cap_database', lambda *a, **k: None))
+        stack.enter_context(_swapped(utils, 'store_market_cap_data', lambda *a, **k: None))
+        return stack
+
+    def run(self, output=None):
+        ''' replay every heartbeat from start to end;
+        returns the data points as a series indexed by (virtual) time,
+        and also saves them as a columnar dataset if output is given '''
+        np.random.seed(self.seed)
+        ticks = np.arange(self.start, self.end + self.heartbeat / 2, self.heartbeat)
+        points = []
+        with self._hooks():
+            for t in ticks.tolist():
+                self.now = t
+                dp = self.feed.create_new_data_point()
+                self.feed.publish(dp, t)
+                points.append(dp)
+
+        index = pd.to_datetime(ticks, unit='s').rename(TIME)
+        series = pd.Series(points, index=index, name=c.DATA_POINT)
+        if output is not None:
+            dataset.save(output, {TIME: index.to_numpy(), c.DATA_POINT: series.to_numpy()}, meta={
+                'index': TIME,
+                'feed': self.feed.NAME,
+                'heartbeat': self.heartbeat,
+                'seed': self.seed,
+            })
+        return series
+
+
+def get_params():
+    parser = argparse.ArgumentParser(description='replay recorded data through a datafeed')
+    parser.add_argument('feed', help='name of the feed, e.g. gauss')
+    parser.add_argument('source', help='recorded source data (csv or columnar dataset)')
+    parser.add_argument('--value-column', default='close')
+    parser.add_argument('--heartbeat', type=float, default=None, help='virtual seconds between data points')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default=None, help='where to write the replayed series')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_params()
+    feed = available_feeds[args.feed]
+    source = ReplaySeries.from_dataset(args.source, value_column=args.value_column)
+    series = Backtest(feed, source, heartbeat=args.heartbeat, seed=args.seed).run(output=args.out)
+    print(series.describe())
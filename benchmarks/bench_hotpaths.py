@@ -0,0 +1,283 @@
+''' offline benchmarks of siwa's hot paths: provider parsing, feed ticks,
+sqlite writes, the http endpoint, the shared-memory board, signing attestations,
+the gauss generators and batched chain reads
+
+providers are mocked with canned responses (see payloads.py) or replayed
+from the synthetic test/fixtures cassettes (see apis/replay.py), and chain
+reads go to a local json-rpc stub, so this needs no network and no api keys
+
+run from the project root:
+    python -m benchmarks.bench_hotpaths             #compare with benchmarks/baselines.json
+    python -m benchmarks.bench_hotpaths --save      #store the results as the new baselines
+    python -m benchmarks.bench_hotpaths -k gauss    #only benchmarks matching a pattern
+exits non-zero if any benchmark regressed past the tolerance
+'''
+
+#stdlib
+import os
+import sys
+import logging
+import argparse
+import tempfile
+import contextlib
+from pathlib import Path
+from unittest import mock
+
+#our stuff
+import constants as c
+from apis import replay
+from benchmarks import payloads
+from benchmarks.harness import benchmark, run, confirm, load_baselines, save_baselines, report, REPEAT, TOLERANCE
+
+SIZES = [50, 1000]
+FIXTURES = c.TEST_PATH / 'fixtures'
+
+
+def _tempdir(stack):
+    return Path(stack.enter_context(tempfile.TemporaryDirectory()))
+
+
+@contextlib.contextmanager
+def _chdir(path):
+    ''' contextlib.chdir, which needs python 3.11 '''
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield path
+    finally:
+        os.chdir(cwd)
+
+
+def _no_api_keys(stack):
+    from apis.crypto_api import CryptoAPI
+    stack.enter_context(mock.patch.object(CryptoAPI, 'get_api_key', lambda self, name: 'benchmark'))
+
+
+def _paprika_catalog(stream=True):
+    ''' an in-memory coin list, so benchmarks neither read nor write data/catalogs '''
+    from apis.catalog import CatalogCache
+    from apis.coinpaprika import CoinPaprikaAPI
+    return CatalogCache('coinpaprika', 'https://api.coinpaprika.com/v1/coins', CoinPaprikaAPI.COIN_FIELDS,
+                        path=None, refresh_interval=0, stream=stream)
+
+
+def _extract_market_cap(api_name, n):
+    def setup(stack):
+        _no_api_keys(stack)
+        from apis.coingecko import CoinGeckoAPI
+        from apis.coinmarketcap import CoinMarketCapAPI
+        from apis.cryptocompare import CryptoCompareAPI
+        from apis.coinpaprika import CoinPaprikaAPI
+        api = {
+            'coingecko': CoinGeckoAPI,
+            'coinmarketcap': CoinMarketCapAPI,
+            'cryptocompare': CryptoCompareAPI,
+            'coinpaprika': lambda: CoinPaprikaAPI(_paprika_catalog()),
+        }[api_name]()
+        if api_name == 'coinpaprika':
+            #one (replayed) ohlcv request per coin
+            cassette = replay.Cassette()
+            for coin in payloads.coinpaprika(n):
+                cassette.add(api.ohlc_url.format(coin_id=coin['id']), body=payloads.coinpaprika_ohlcv(coin['id']))
+            stack.enter_context(replay.installed(replay.ReplayTransport(cassette)))
+        data = getattr(payloads, api_name)(n)
+        return lambda: api.extract_market_cap(data)
+    return setup
+
+for _api in ['coingecko', 'coinmarketcap', 'cryptocompare', 'coinpaprika']:
+    for _n in SIZES:
+        benchmark(f'extract_market_cap[{_api}-{_n}]')(_extract_market_cap(_api, _n))
+
+
+@benchmark('coinpaprika.get_data[replay]')
+def _(stack):
+    ''' filter and rank the cached coin list (the download only happens on a cache miss) '''
+    from apis.coinpaprika import CoinPaprikaAPI
+    stack.enter_context(replay.installed(replay.ReplayTransport(FIXTURES / 'coinpaprika.synthetic.json.gz')))
+    api = CoinPaprikaAPI(_paprika_catalog())
+    api.get_data(50)
+    return lambda: api.get_data(50)
+
+
+@benchmark('catalog.download[coinpaprika]')
+def _(stack):
+    ''' stream-decode and project the full (synthetic) /v1/coins list, as on a cache miss or a changed list '''
+    stack.enter_context(replay.installed(replay.ReplayTransport(FIXTURES / 'coinpaprika.synthetic.json.gz')))
+    catalog = _paprika_catalog()
+    return catalog.refresh
+
+
+def _mcap1000_tick(n):
+    def setup(stack):
+        ''' one heartbeat: three (mocked) providers, parsing and the sqlite writes '''
+        _no_api_keys(stack)
+        from apis.coingecko import CoinGeckoAPI
+        from apis.coinmarketcap import CoinMarketCapAPI
+        from apis.cryptocompare import CryptoCompareAPI
+        from feeds.crypto_indices.mcap1000 import MCAP1000
+        for api, payload in [(CoinGeckoAPI, payloads.coingecko(n)),
+                             (CoinMarketCapAPI, payloads.coinmarketcap(n)),
+                             (CryptoCompareAPI, payloads.cryptocompare(n))]:
+            stack.enter_context(mock.patch.object(api, 'get_data', lambda self, N, payload=payload: payload))
+        #fetch_data_by_mcap writes data.db to the working directory
+        stack.enter_context(_chdir(_tempdir(stack)))
+        feed = MCAP1000(N=n)
+        return feed.create_new_data_point
+    return setup
+
+for _n in SIZES:
+    benchmark(f'mcap1000.tick[{_n}]')(_mcap1000_tick(_n))
+
+
+@benchmark('sqlite_handler.emit')
+def _(stack):
+    import siwa_logging
+    stack.enter_context(mock.patch.object(c, 'LOGGING_PATH', _tempdir(stack) / c.LOGGING_FILE))
+    handler = siwa_logging.SQLite_Handler()
+    record = logging.LogRecord('SQLLogger', logging.INFO, __file__, 0, 'Next data point for test: 0.5', None, None)
+    return lambda: handler.emit(record)
+
+
+@benchmark('store_market_cap_data[50]')
+def _(stack):
+    from apis import utils
+    from apis.coingecko import CoinGeckoAPI
+    db_path = str(_tempdir(stack) / 'data.db')
+    utils.create_market_cap_database(db_path)
+    market_data = CoinGeckoAPI().extract_market_cap(payloads.coingecko(50))
+    return lambda: utils.store_market_cap_data(market_data, 'coingecko', db_path)
+
+
+@benchmark('endpoint./datafeed/<feedname>')
+def _(stack):
+    import endpoint
+    from feeds.registry import FeedRegistry, FeedSpec
+    feeds = FeedRegistry({'test': FeedSpec(0, 'feeds.test_feed', 'Test')})
+    feeds['test'].publish(.5)
+    stack.enter_context(mock.patch.object(endpoint.app, 'all_feeds', feeds, create=True))
+    client = endpoint.app.test_client()
+    return lambda: client.get('/datafeed/test')
+
+
+@benchmark('shm_board.write')
+def _(stack):
+    import shm_board
+    from feeds.data_feed import DataPoint
+    board = shm_board.Board(_tempdir(stack) / 'board')
+    stack.callback(board.close)
+    dp = DataPoint(.5, 1000.)
+    return lambda: board.write('test', 0, dp)
+
+
+@benchmark('shm_board.read')
+def _(stack):
+    import shm_board
+    from feeds.data_feed import DataPoint
+    path = _tempdir(stack) / 'board'
+    board = shm_board.Board(path)
+    stack.callback(board.close)
+    for i in range(100):
+        board.write(f'feed{i}', i, DataPoint(.5, 1000.))
+    reader = shm_board.BoardReader(path)
+    stack.callback(reader.close)
+    return lambda: reader.read('feed99')
+
+
+def _attester(stack, feeds):
+    import attestation
+    from feeds.registry import FeedRegistry
+    from feeds.data_feed import DataPoint
+    attester = attestation.Attester(FeedRegistry({}), key='0x' + '11' * 32, contract='0x' + '22' * 20)
+    return attester, [(f'feed{i}', i, DataPoint(1000. + i / 7, 1000., 990.)) for i in range(feeds)]
+
+
+@benchmark('attestation.note')
+def _(stack):
+    ''' what a feed thread pays per data point while attesting '''
+    attester, points = _attester(stack, 1)
+    return lambda: attester.note(*points[0])
+
+
+@benchmark('attestation.sign_round[50]')
+def _(stack):
+    ''' a round of 50 feeds: abi encoding, merkle tree and signature, in the attestation thread '''
+    attester, points = _attester(stack, 50)
+
+    def sign_round():
+        for point in points:
+            attester.note(*point)
+        return attester.sign_round()
+    return sign_round
+
+
+def _rolling_update(statistic):
+    def setup(stack):
+        ''' one update of a rolling statistic holding an hour of one-second data points '''
+        from feeds.rolling import STATISTICS
+        stat = STATISTICS[statistic](3600)
+        clock = iter(range(10**9))
+        for _ in range(3600):
+            stat.update(100. + next(clock) % 7, float(next(clock)))
+
+        def update():
+            t = next(clock)
+            stat.update(100. + t % 7, float(t))
+            return stat.value
+        return update
+    return setup
+
+for _statistic in ['twa', 'variance', 'max']:
+    benchmark(f'rolling.update[{_statistic}]')(_rolling_update(_statistic))
+
+
+@benchmark('gauss.generate_data_points[1e5]')
+def _(stack):
+    from feeds.gauss.gauss import TestClass
+    feed = TestClass()
+    return lambda: feed._generate_data_points(100_000, 1000.)
+
+
+@benchmark('gauss.generate_prepped_data[1e5]')
+def _(stack):
+    from feeds.gauss.gauss import TestClass
+    feed = TestClass()
+    return lambda: feed._generate_prepped_data(100_000, 1000.)
+
+
+@benchmark('chain.batch_read[10]')
+def _(stack):
+    ''' ten latestAnswer reads sent as one json-rpc batch to a local stub '''
+    from blockchain import ChainProvider
+    from test.rpc_stub import RPCStub
+    addresses = [f'0x{i:040x}' for i in range(10)]
+    stub = stack.enter_context(RPCStub({a: i for i, a in enumerate(addresses)}))
+    reader = ChainProvider(c.ARBITRUM_GOERLI, [stub.url], window=None).reader
+
+    def batch_read():
+        futures = [reader.submit('eth_call', [{'to': a, 'data': c.LATEST_ANSWER_SELECTOR}, 'latest']) for a in addresses]
+        reader.flush()
+        return [f.result() for f in futures]
+    return batch_read
+
+
+def get_params():
+    parser = argparse.ArgumentParser(description='benchmark siwa hot paths against stored baselines')
+    parser.add_argument('-k', dest='pattern', default=None, help='only run benchmarks matching this regex')
+    parser.add_argument('--save', action='store_true', help='store the results as the new baselines')
+    parser.add_argument('--repeat', type=int, default=REPEAT)
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='fraction slower than baseline that still passes')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = get_params()
+    results = run(args.pattern, args.repeat)
+    if args.save:
+        save_baselines(results)
+        print(f'saved baselines for {len(results)} benchmarks')
+    else:
+        baselines = load_baselines()
+        results = confirm(results, baselines, args.tolerance, args.repeat)
+        if not report(results, baselines, args.tolerance):
+            sys.exit(1)
@@ -0,0 +1,137 @@
+''' load benchmark of the http/json endpoint: p50/p99 latency of
+/datafeed/<feedname> with many concurrent pollers (each one keep-alive
+connection polling as fast as it is answered), for each webserver:
+waitress (WEBSERVER_THREADS threads) and asgi (evented, see asgi.py;
+skipped unless uvicorn is installed). the server runs in its own
+interpreter, so the pollers don't compete with it for the GIL
+
+run from the project root:
+    python -m benchmarks.bench_serving --pollers 1000 --seconds 10
+    python -m benchmarks.bench_serving --server asgi --logs 5   #5 of the pollers fetch /logs instead
+'''
+
+#stdlib
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import importlib.util
+import statistics
+import subprocess
+
+#third party
+import aiohttp
+
+#our stuff
+import constants as c
+
+SERVERS = ['waitress', 'asgi']
+
+#runs in the server interpreter
+SERVER = '''
+import sys
+from feeds.registry import FeedRegistry, FeedSpec
+server, port = sys.argv[1], int(sys.argv[2])
+feeds = FeedRegistry({'test': FeedSpec(0, 'feeds.test_feed', 'Test')})
+feeds['test'].publish(.5)
+if server == 'asgi':
+    import asgi
+    asgi.run(feeds, port)
+else:
+    import endpoint
+    endpoint.run(all_feeds=feeds, port=port)
+'''
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_listening(port, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'server exited with code {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(.1)
+    raise RuntimeError('server did not start')
+
+
+async def poll(session, url, deadline, latencies, errors):
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            async with session.get(url) as response:
+                await response.read()
+                ok = response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors.append(1)
+
+
+async def load(port, pollers, seconds, logs):
+    latencies, errors, log_latencies = [], [], []
+    connector = aiohttp.TCPConnector(limit=0)
+    timeout = aiohttp.ClientTimeout(total=max(seconds, 30))
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        deadline = time.perf_counter() + seconds
+        base = f'http://127.0.0.1:{port}'
+        await asyncio.gather(
+            *(poll(session, f'{base}/datafeed/test', deadline, latencies, errors) for _ in range(pollers - logs)),
+            *(poll(session, f'{base}/logs', deadline, log_latencies, errors) for _ in range(logs)))
+    return latencies, errors
+
+
+def measure(server, pollers=1000, seconds=10, logs=0):
+    ''' latency percentiles (ms) and throughput of /datafeed under load from `pollers` clients '''
+    port = free_port()
+    process = subprocess.Popen([sys.executable, '-c', SERVER, server, str(port)], cwd=c.PROJECT_PATH,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_listening(port, process)
+        latencies, errors = asyncio.run(load(port, pollers, seconds, logs))
+    finally:
+        process.terminate()
+        process.wait()
+    if len(latencies) < 2:
+        return {'server': server, 'requests': len(latencies), 'errors': len(errors)}
+    percentiles = statistics.quantiles(latencies, n=100)
+    return {
+        'server': server,
+        'pollers': pollers,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'requests_per_second': len(latencies) / seconds,
+        'p50_ms': percentiles[49] * 1000,
+        'p99_ms': percentiles[98] * 1000,
+    }
+
+
+def run(servers=SERVERS, pollers=1000, seconds=10, logs=0):
+    results = []
+    for server in servers:
+        if server == 'asgi' and importlib.util.find_spec('uvicorn') is None:
+            results.append({'server': server, 'skipped': 'uvicorn is not installed'})
+            continue
+        results.append(measure(server, pollers, seconds, logs))
+    return results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--server', choices=SERVERS, action='append', help='default: all')
+    parser.add_argument('--pollers', type=int, default=1000)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--logs', type=int, default=0, help='pollers fetching /logs (the slow route) instead')
+    args = parser.parse_args()
+    print(json.dumps(run(args.server or SERVERS, args.pollers, args.seconds, args.logs), indent=2))
@@ -0,0 +1,68 @@
+''' cold-start benchmark for the siwa CLI:
+time (and peak RSS) to import siwa, resolve `--datafeeds <feed>` and check the
+feed config as siwa.py does when it starts, each run in a fresh interpreter so
+nothing is cached in-process
+
+run from the project root:
+    python -m benchmarks.bench_startup --feed test --runs 5
+'''
+
+#stdlib
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+#our stuff
+import constants as c
+
+HEAVY_MODULES = ['web3', 'pandas', 'requests', 'nltk', 'tweepy', 'flask', 'cmd2']
+
+#runs in the child interpreter; prints one json line
+CHILD = '''
+import sys, time, json, resource
+start = time.perf_counter()
+sys.argv = ['siwa.py', '--datafeeds', {feed!r}]
+import siwa
+feeds = siwa.get_params()
+siwa.config_watcher.on_change = None    #check and apply the config, start nothing
+siwa.config_watcher.reload()
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': elapsed,
+    'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'imported': [m for m in {heavy!r} if m in sys.modules],
+    'modules': len(sys.modules),
+}}))
+'''
+
+
+def measure(feed):
+    ''' one cold start in a fresh interpreter '''
+    out = subprocess.run(
+        [sys.executable, '-c', CHILD.format(feed=feed, heavy=HEAVY_MODULES)],
+        cwd=c.PROJECT_PATH, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def run(feed='test', runs=5):
+    results = [measure(feed) for _ in range(runs)]
+    return {
+        'feed': feed,
+        'runs': runs,
+        'seconds_median': statistics.median(r['seconds'] for r in results),
+        'seconds_min': min(r['seconds'] for r in results),
+        'max_rss_mb_median': statistics.median(r['max_rss_mb'] for r in results),
+        'imported': results[-1]['imported'],
+        'modules': results[-1]['modules'],
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--feed', default='test', help='feed passed to --datafeeds')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+    print(json.dumps(run(args.feed, args.runs), indent=2))
@@ -0,0 +1,130 @@
+''' minimal timeit-based benchmark runner with stored baselines
+
+a benchmark is a setup function returning the callable to time;
+it gets an ExitStack for anything to undo afterwards (patches, temp dirs, servers):
+    @benchmark('gauss.generate_data_points[1e5]')
+    def _(stack):
+        feed = TestClass()
+        return lambda: feed._generate_data_points(100_000, 1000.)
+
+each callable is timed with timeit (autoranged, best of REPEAT) and compared
+against the seconds per call stored in baselines.json; anything slower than
+baseline * (1 + tolerance) is reported as a regression and the run fails
+'''
+
+#stdlib
+import re
+import sys
+import json
+import time
+import timeit
+import platform
+import contextlib
+from pathlib import Path
+
+#our stuff
+import constants as c
+
+BASELINES_PATH = Path(__file__).with_name('baselines.json')
+REPEAT = 5
+TOLERANCE = .3      #fraction slower than baseline that still passes
+
+BENCHMARKS = {}     #name -> setup function
+
+
+def benchmark(name):
+    ''' register a setup function under name '''
+    def register(setup):
+        if name in BENCHMARKS:
+            raise ValueError(f'benchmark {name} registered twice')
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def machine():
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'processor': platform.machine()}
+
+
+def time_call(func, repeat=REPEAT):
+    ''' best seconds per call of func, and the number of calls per repeat '''
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number, number
+
+
+def run(pattern=None, repeat=REPEAT, names=None):
+    ''' time every benchmark whose name matches pattern (or is in names); name -> seconds per call '''
+    results = {}
+    for name, setup in BENCHMARKS.items():
+        if pattern and not re.search(pattern, name) or names is not None and name not in names:
+            continue
+        with contextlib.ExitStack() as stack:
+            seconds, number = time_call(setup(stack), repeat)
+        results[name] = seconds
+        print(f'{name:<50} {format_seconds(seconds):>10}  ({number} calls x {repeat})')
+    return results
+
+
+def format_seconds(seconds):
+    for unit, scale in [('s', 1), ('ms', 1e-3), ('us', 1e-6)]:
+        if seconds >= scale:
+            return f'{seconds / scale:.3g} {unit}'
+    return f'{seconds / 1e-9:.3g} ns'
+
+
+def load_baselines(path=BASELINES_PATH):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'machine': None, 'results': {}}
+
+
+def save_baselines(results, path=BASELINES_PATH):
+    ''' merge results into the stored baselines '''
+    baselines = load_baselines(path)
+    baselines['machine'] = machine()
+    baselines['saved'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    baselines['results'] = {**baselines['results'], **results}
+    with open(path, 'w') as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def compare(results, baselines, tolerance=TOLERANCE):
+    ''' name -> (seconds, baseline seconds) for every result slower than tolerance allows '''
+    regressions = {}
+    for name, seconds in results.items():
+        baseline = baselines['results'].get(name)
+        if baseline is not None and seconds > baseline * (1 + tolerance):
+            regressions[name] = (seconds, baseline)
+    return regressions
+
+
+def confirm(results, baselines, tolerance=TOLERANCE, repeat=REPEAT):
+    ''' time apparent regressions once more, keeping the faster result,
+    so one noisy measurement doesn't fail the run '''
+    regressed = compare(results, baselines, tolerance)
+    if regressed:
+        print(f're-timing {len(regressed)} apparent regression(s)')
+        rerun = run(repeat=repeat, names=set(regressed))
+        results = {**results, **{name: min(results[name], rerun[name]) for name in rerun}}
+    return results
+
+
+def report(results, baselines, tolerance=TOLERANCE):
+    ''' print the comparison with the baselines; returns False on any regression '''
+    if baselines['machine'] and baselines['machine'] != machine():
+        print(f'{c.WARNING}baselines were saved on {baselines["machine"]}, '
+              f'this is {machine()}; timings may not be comparable{c.ENDC}')
+    missing = [name for name in results if name not in baselines['results']]
+    if missing:
+        print(f'{c.WARNING}no baseline for {", ".join(missing)} (save one with --save){c.ENDC}')
+    regressions = compare(results, baselines, tolerance)
+    for name, (seconds, baseline) in regressions.items():
+        print(f'{c.FAIL}REGRESSION {name}: {format_seconds(seconds)} vs baseline '
+              f'{format_seconds(baseline)} ({seconds / baseline - 1:+.0%}){c.ENDC}', file=sys.stderr)
+    if not regressions:
+        print(f'{c.OKGREEN}no regressions (tolerance {tolerance:.0%}){c.ENDC}')
+    return not regressions
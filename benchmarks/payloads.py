@@ -0,0 +1,127 @@
+''' deterministic, provider-shaped api responses, so benchmarks run offline
+
+SyntheticTransport serves these in place of the real apis; recording through it
+writes the test/fixtures/<source>.synthetic.json.gz cassettes. they are shaped
+like the providers' responses as the parsers expect them, not recorded from the
+real apis, so they don't check the parsers against the real schemas (record
+those with `python -m apis.replay record ...`):
+    python -m benchmarks.payloads test/fixtures
+'''
+
+#stdlib
+import sys
+import json
+import random
+from pathlib import Path
+from unittest import mock
+
+#third party
+import requests
+
+ISO_TIME = '2023-05-01T12:00:00.000Z'
+UNIX_TIME = 1682942400
+
+
+def _coins(n, seed=0):
+    rng = random.Random(seed)
+    for i in range(n):
+        yield i, f'Coin {i}', rng.uniform(1e6, 1e12)
+
+
+def coingecko(n):
+    return [
+        {'id': f'coin-{i}', 'symbol': f'c{i}', 'name': name, 'current_price': mcap / 1e9,
+         'market_cap': mcap, 'market_cap_rank': i + 1, 'last_updated': ISO_TIME}
+        for i, name, mcap in _coins(n)
+    ]
+
+
+def coinmarketcap(n):
+    return {
+        'status': {'error_code': 0},
+        'data': [
+            {'id': i, 'name': name, 'symbol': f'C{i}', 'cmc_rank': i + 1, 'last_updated': ISO_TIME,
+             'quote': {'USD': {'price': mcap / 1e9, 'market_cap': mcap, 'last_updated': ISO_TIME}}}
+            for i, name, mcap in _coins(n)
+        ],
+    }
+
+
+def cryptocompare(n):
+    ''' the Data list, as returned by CryptoCompareAPI.get_data '''
+    return [
+        {'CoinInfo': {'Id': str(i), 'Name': f'C{i}', 'FullName': name},
+         'RAW': {'USD': {'PRICE': mcap / 1e9, 'MKTCAP': mcap, 'LASTUPDATE': UNIX_TIME}}}
+        for i, name, mcap in _coins(n)
+    ]
+
+
+def coinpaprika(n):
+    ''' the coin list, as returned by CoinPaprikaAPI.get_data '''
+    return [
+        {'id': f'c{i}-coin-{i}', 'name': name, 'symbol': f'C{i}', 'rank': i + 1, 'is_active': True}
+        for i, name, _ in _coins(n)
+    ]
+
+
+def coinpaprika_all(n, unranked=.2):
+    ''' /v1/coins: every coin, in no particular order, a fraction of them unranked (rank 0) '''
+    coins = coinpaprika(n)
+    rng = random.Random(n)
+    for coin in coins:
+        if rng.random() < unranked:
+            coin['rank'] = 0
+    rng.shuffle(coins)
+    return coins
+
+
+def coinpaprika_ohlcv(coin_id):
+    ''' /coins/{coin_id}/ohlcv/latest '''
+    mcap = random.Random(coin_id).uniform(1e6, 1e12)
+    return [{'time_open': ISO_TIME, 'close': mcap / 1e9, 'volume': 1e6, 'market_cap': mcap}]
+
+
+COINPAPRIKA_COINS = 10_000  #roughly the size of the real /v1/coins list
+
+
+class SyntheticTransport:
+    ''' a transport (see apis/replay.py) answering every provider's requests with the payloads above '''
+
+    def get(self, url, params=None, **kwargs):
+        params = params or {}
+        if url.startswith('https://api.coingecko.com/'):
+            payload = coingecko(int(params['per_page']))
+        elif url.startswith('https://pro-api.coinmarketcap.com/'):
+            payload = coinmarketcap(int(params['limit']))
+        elif url.startswith('https://min-api.cryptocompare.com/'):
+            payload = {'Message': 'Success', 'Type': 100, 'Data': cryptocompare(int(params['limit']))}
+        elif url == 'https://api.coinpaprika.com/v1/coins':
+            payload = coinpaprika_all(COINPAPRIKA_COINS)
+        elif url.startswith('https://api.coinpaprika.com/v1/coins/'):
+            payload = coinpaprika_ohlcv(url.split('/')[5])
+        else:
+            raise ValueError(f'no synthetic payload for {url}')
+        response = requests.Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(payload).encode()
+        response.encoding = 'utf-8'
+        response._content_consumed = True   # so iter_content() serves _content
+        response.url = url
+        return response
+
+
+def write_fixtures(directory, N=50):
+    ''' record one get_data + extract_market_cap round trip per provider through SyntheticTransport,
+    to <source>.synthetic.json.gz '''
+    from apis import replay
+    from apis.crypto_api import CryptoAPI
+    with mock.patch.object(CryptoAPI, 'get_api_key', lambda self, name: 'synthetic'):
+        for source in replay._providers():
+            path = Path(directory) / f'{source}.synthetic.json.gz'
+            replay.record(source, path, N, inner=SyntheticTransport())
+            print(f'wrote {path}')
+
+
+if __name__ == '__main__':
+    write_fixtures(sys.argv[1] if len(sys.argv) > 1 else 'test/fixtures')
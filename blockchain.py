@@ -1,17 +1,212 @@
+''' module documentation:
+access to chain data; nothing here connects at import time:
+a ChainProvider per chain is created on first use, it keeps one pooled
+http session per rpc url, prefers the url with the lowest observed
+latency and fails over to the others; contract reads from all feeds on
+a chain are batched (ChainReader) and latestAnswer() results are reused
+for a block time, so feeds reading the same aggregator share one call
+'''
+
+#stdlib
+import time
+import threading
+import itertools
 from dataclasses import dataclass
-import constants as c
-from numpy import random
-from web3 import Web3
+from concurrent.futures import Future
 
+#third party
+import requests
+from requests.adapters import HTTPAdapter
 
+#our stuff
+import constants as c
 
-arbi_goerli = Web3(Web3.HTTPProvider(c.ARBITRUM_GOERLI_RPC))
-arbi_main = Web3(Web3.HTTPProvider(c.ARBITRUM_MAINNET_RPC))
-eth_main = Web3(Web3.HTTPProvider(c.ETHEREUM_MAINNET_RPC))
+_CHAIN_ATTRS = {
+    'arbi_goerli': c.ARBITRUM_GOERLI,
+    'arbi_main': c.ARBITRUM_MAINNET,
+    'eth_main': c.ETHEREUM_MAINNET,
+}
+
+def __getattr__(name):
+    ''' lazily built web3 clients, e.g. blockchain.arbi_goerli '''
+    if name in _CHAIN_ATTRS:
+        return get_provider(_CHAIN_ATTRS[name]).web3
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
 def contract_interface(provider, address, abi):
     return provider.eth.contract(address=address, abi=abi)
 
+
+class ChainReadError(Exception):
+    """Raised when a batched json-rpc read returns an error"""
+    pass
+
+
+class RPCEndpoint:
+    ''' one rpc url: its pooled http session and health / latency stats '''
+
+    def __init__(self, url):
+        self.url = url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=c.RPC_POOL_SIZE)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.latency = 0.      #moving average, seconds; 0 until measured so new urls get tried
+        self.down_until = 0.
+
+    def post(self, payload):
+        start = time.perf_counter()
+        try:
+            response = self.session.post(self.url, json=payload, timeout=c.CHAIN_READ_TIMEOUT)
+            response.raise_for_status()
+            result = response.json()
+        except Exception:
+            self.down_until = time.monotonic() + c.RPC_FAILURE_COOLDOWN
+            raise
+        elapsed = time.perf_counter() - start
+        self.latency += c.RPC_LATENCY_ALPHA * (elapsed - self.latency) if self.latency else elapsed
+        return result
+
+
+class ChainReader:
+    '''Batches contract reads on one chain:
+    every read submitted within CHAIN_READ_WINDOW seconds of the first pending one
+    (typically one per on-chain feed per heartbeat) is sent in a single json-rpc
+    batch request, and each result is handed back to the feed that asked for it;
+    identical calls in the same batch are only sent once
+    '''
+
+    def __init__(self, post, window=c.CHAIN_READ_WINDOW):
+        self.post = post    #callable sending a json-rpc payload, returning the decoded response
+        self.window = window
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+
+    def submit(self, method, params):
+        ''' queue a json-rpc call; returns a Future resolved by the next flush '''
+        key = (method, repr(params))
+        with self._lock:
+            if key in self._pending:
+                return self._pending[key][1]
+            future = Future()
+            request = {'jsonrpc': '2.0', 'id': next(self._ids), 'method': method, 'params': params}
+            self._pending[key] = (request, future)
+            if self._timer is None and self.window is not None:
+                self._timer = threading.Timer(self.window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return future
+
+    def flush(self):
+        ''' send everything pending as one batch request and fan out the results '''
+        with self._lock:
+            pending, self._pending = list(self._pending.values()), {}
+            self._timer = None
+        if not pending:
+            return
+        try:
+            results = {r['id']: r for r in self.post([request for request, _ in pending])}
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+        for request, future in pending:
+            result = results.get(request['id'])
+            if result is None:
+                future.set_exception(ChainReadError(f'no response for {request}'))
+            elif 'error' in result:
+                future.set_exception(ChainReadError(result['error']))
+            else:
+                future.set_result(result['result'])
+
+    def call(self, address, data, block='latest'):
+        ''' eth_call (batched); blocks until the batch is answered, returns the raw hex result '''
+        future = self.submit('eth_call', [{'to': address, 'data': data}, block])
+        return future.result(timeout=c.CHAIN_READ_TIMEOUT)
+
+
+class ChainProvider:
+    ''' everything needed to read one chain, created lazily by get_provider '''
+
+    def __init__(self, chain, urls, block_time=1, window=c.CHAIN_READ_WINDOW):
+        self.chain = chain
+        self.endpoints = [RPCEndpoint(url) for url in urls]
+        self.block_time = block_time
+        self.reader = ChainReader(self.post, window=window)
+        self._web3 = None
+        self._lock = threading.Lock()
+        self._answers = {}              #address -> (monotonic time read, latestAnswer)
+
+    def ranked_endpoints(self):
+        ''' healthy urls fastest first, then the ones cooling down after a failure '''
+        now = time.monotonic()
+        return sorted(self.endpoints, key=lambda e: (e.down_until > now, e.latency))
+
+    def post(self, payload):
+        ''' send a json-rpc payload, failing over through the ranked urls '''
+        error = None
+        for endpoint in self.ranked_endpoints():
+            try:
+                return endpoint.post(payload)
+            except Exception as e:
+                error = e
+        if error is None:
+            raise ChainReadError(f'no rpc urls for {self.chain}')
+        raise error
+
+    @property
+    def web3(self):
+        ''' a web3 client on the fastest url, sharing its pooled session '''
+        if self._web3 is None:
+            from web3 import Web3
+            endpoint = self.ranked_endpoints()[0]
+            with self._lock:
+                if self._web3 is None:
+                    self._web3 = Web3(Web3.HTTPProvider(endpoint.url, session=endpoint.session))
+        return self._web3
+
+    def latest_answer(self, address):
+        ''' latestAnswer() of a (flux) aggregator at the latest block, decoded as int256;
+        reused for block_time seconds, as it can't have changed sooner '''
+        cached = self._answers.get(address)
+        if cached is not None and time.monotonic() - cached[0] < self.block_time:
+            return cached[1]
+        #at 'latest', not a block number fetched first: that would cost a round trip per read,
+        #and fail on load-balanced nodes that are a block behind
+        result = self.reader.call(address, c.LATEST_ANSWER_SELECTOR)
+        answer = int.from_bytes(bytes.fromhex(result[2:]), 'big', signed=True)
+        self._answers[address] = (time.monotonic(), answer)
+        return answer
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+def get_provider(chain):
+    ''' the shared ChainProvider for a chain, created on first use '''
+    with _providers_lock:
+        if chain not in _providers:
+            _providers[chain] = ChainProvider(chain, c.RPC_URLS[chain], block_time=c.BLOCK_TIMES[chain])
+        return _providers[chain]
+
+
+class _LazyContract:
+    ''' contract object built on first access, instead of at import time '''
+
+    def __init__(self, chain, address, abi):
+        self.chain, self.address, self.abi = chain, address, abi
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, owner):
+        contract = contract_interface(get_provider(self.chain).web3, address=self.address, abi=self.abi)
+        setattr(owner, self.name, contract)
+        return contract
+
+
 #we use Pokt to access chain data
 class Pokt():
     '''A class to collect Pokt functionality
@@ -23,26 +218,26 @@ class Translucent:
 
     '''A class to collect Translucent functionality
     '''
-    gauss_arbi_goerli  = contract_interface(
-            arbi_goerli,
+    gauss_arbi_goerli  = _LazyContract(
+            c.ARBITRUM_GOERLI,
             address=c.TRANSLUCENT_GAUSS_ARBITRUM_GOERLI,
             abi=c.TRANSLUCENT_FLUX_AGGREGATOR
         )
     #currently unsupported
-    # gauss_arbi_main  = contract_interface(
-    #         arbi_main,
+    # gauss_arbi_main  = _LazyContract(
+    #         c.ARBITRUM_MAINNET,
     #         address=c.TRANSLUCENT_GAUSS_ARBITRUM_MAINNET,
     #         abi=c.TRANSLUCENT_FLUX_AGGREGATOR
     #     )
 
-    # faceripper_arbi_goerli  = contract_interface(
-    #         arbi_goerli,
+    # faceripper_arbi_goerli  = _LazyContract(
+    #         c.ARBITRUM_GOERLI,
     #         address=... ,
     #         abi=c.TRANSLUCENT_FLUX_AGGREGATOR
     #     )
     #currently unsupported
-    # faceripper_arbi_main  = contract_interface(
-    #         arbi_main,
+    # faceripper_arbi_main  = _LazyContract(
+    #         c.ARBITRUM_MAINNET,
     #         address=c.TRANSLUCENT_GAUSS_ARBITRUM_MAINNET,
     #         abi=c.TRANSLUCENT_FLUX_AGGREGATOR
-    #     )
\ No newline at end of file
+    #     )
@@ -5,6 +5,10 @@ from pathlib import Path
 
 DEBUG = True #show debug messages in CLI
 WEBSERVER_THREADS = 1
+ENDPOINT_PORT = 16556
+HTTP_SERVER = 'waitress'    #or 'asgi': evented, see asgi.py
+HTTP_WORKERS = 1            #asgi worker processes
+HTTP_KEEP_ALIVE = 5         #seconds an idle keep-alive connection stays open (asgi)
 
 HEADER = '\033[95m'
 OKBLUE = '\033[94m'
@@ -22,16 +26,55 @@ TEST_DIR = 'test'
 LOGGING_FILE = 'data_feeds.db'
 DATEFORMAT = '%Y-%m-%d %H:%M:%S.%f %z'
 DATA_EXT = '.csv'
+COLUMNAR_EXT = '.cols'          #directory of one .npy per column, see dataset.py
+COLUMNAR_META_FILE = 'meta.json'
 LINE_START = '>'
+FEEDS_CONFIG_FILE = 'feeds.toml'
+CONFIG_POLL_INTERVAL = 2   #seconds between checks of the feed config for changes
+PROFILE_DIR = 'profiles'
+CATALOG_DIR = 'catalogs'
+CATALOG_REFRESH_INTERVAL = 6 * 60 * 60  #seconds between revalidations of a provider's coin list
+CATALOG_RETRY_INTERVAL = 5 * 60         #seconds before retrying a failed revalidation
+CIRCUIT_FAILURE_THRESHOLD = 3           #consecutive failed requests that open a provider's circuit
+CIRCUIT_RESET_TIMEOUT = 60              #seconds an open circuit waits before a trial request
+CIRCUIT_MAX_RESET_TIMEOUT = 60 * 60     #cap of that wait, which doubles after each failed trial
+REPLICATION_PORT = 16557               #default port a leader streams data points to followers on, see replication.py
+REPLICATION_PING_INTERVAL = 1           #seconds of silence after which a leader pings its followers
+REPLICATION_TIMEOUT = 5                 #seconds of silence after which a follower reconnects to its leader
+REPLICATION_RECONNECT_DELAY = 1         #seconds before a follower reconnects, doubling after each failure
+REPLICATION_MAX_RECONNECT_DELAY = 30
+REPLICATION_QUEUE_SIZE = 10000          #data points queued for a follower before it is dropped (and re-snapshots)
+SUPERVISOR_CHECK_INTERVAL = 1           #seconds between checks that the worker processes are alive, see supervisor.py
+SUPERVISOR_RESTART_DELAY = 1            #seconds before a dead worker is restarted, doubling while it keeps dying
+SUPERVISOR_MAX_RESTART_DELAY = 60
+SUPERVISOR_STOP_TIMEOUT = 5             #seconds a stopped worker gets to exit before it is terminated
+BOARD_SLOTS = 256                       #feeds the shared-memory board holds, see shm_board.py
+BOARD_POLL_INTERVAL = 1                 #seconds between checks for feeds to put on the board
+ATTESTATION_INTERVAL = 10               #seconds per round of signed data points, see attestation.py
+ATTESTATION_DECIMALS = 18               #values are attested as integers of value * 10**decimals
+ATTESTATION_MERKLE = True               #include a merkle root of the round's data points, for per-feed proofs
+ATTESTATION_HISTORY = 100               #signed rounds kept (and served)
+ATTESTATION_KEY_ENV = 'SIWA_SIGNING_KEY'    #environment variable holding the signing key (hex)
+ATTESTATION_CONTRACT_ENV = 'SIWA_ATTESTATION_CONTRACT'    #environment variable holding the address of the contract batches are for
+PROFILE_SAMPLE_INTERVAL = .005  #seconds between stack samples of the sampling profiler
 
 FEED_NAME = 'feed_name'
 DATA_POINT = 'data_point'
 TIME_STAMP = 'time_stamp'
+SOURCE_TIME = 'source_time'
+AGE = 'age'
+DEGRADED = 'degraded'
+MAX_AGE = 'max_age'
 
 PROJECT_PATH = Path(os.path.dirname(os.path.realpath(__file__)))
 DATA_PATH = PROJECT_PATH / DATA_DIR
 TEST_PATH = PROJECT_PATH / TEST_DIR
 LOGGING_PATH = DATA_PATH / LOGGING_FILE
+FEEDS_CONFIG_PATH = PROJECT_PATH / FEEDS_CONFIG_FILE
+PROFILE_PATH = DATA_PATH / PROFILE_DIR
+CATALOG_PATH = DATA_PATH / CATALOG_DIR
+BOARD_FILE = 'siwa_board'
+BOARD_PATH = (Path('/dev/shm') if os.path.isdir('/dev/shm') else DATA_PATH) / BOARD_FILE   #in memory where possible
 LOGGING_FORMAT = ('%(asctime)s:%(thread)d - %(name)s - %(levelname)s - %(message)s')
 
 def start_message(feed):
@@ -61,9 +104,13 @@ def status_message(feed):
     x = feed.ACTIVE
     return f'{get_color(x)}{feed.NAME}{ENDC} with id {feed.ID} is {get_word(x)}active, with {feed.COUNT} data points served since {get_starttime_string(feed)}'
 
+def unloaded_status_message(name, feed_id):
+    return f'{get_color(False)}{name}{ENDC} with id {feed_id} is not loaded (never started)'
+
 #################### COINGECKo####################
 
 PRICE = 'current_price'
+MARKET_CAP = 'market_cap'
 
 #ids
 USDC = 'usd-coin'
@@ -93,9 +140,39 @@ ARBITRUM_GOERLI_RPC = 'https://goerli-rollup.arbitrum.io/rpc'
 ARBITRUM_MAINNET_RPC = f'https://{POKT_ARBITRUM}.gateway.pokt.network/v1/lb/{POKT_PORTAL_ID}'
 ETHEREUM_MAINNET_RPC = f'https://{POKT_ETHEREUM}.gateway.pokt.network/v1/lb/{POKT_PORTAL_ID}'
 
+# several rpc urls per chain are allowed; the fastest healthy one is used
+# (see blockchain.ChainProvider)
+RPC_URLS = {
+    ARBITRUM_GOERLI: [ARBITRUM_GOERLI_RPC],
+    ARBITRUM_MAINNET: [ARBITRUM_MAINNET_RPC, 'https://arb1.arbitrum.io/rpc'],
+    ETHEREUM_MAINNET: [ETHEREUM_MAINNET_RPC],
+}
+CHAIN_IDS = {
+    ARBITRUM_GOERLI: 421613,
+    ARBITRUM_MAINNET: 42161,
+    ETHEREUM_MAINNET: 1,
+}
+ATTESTATION_CHAIN = ARBITRUM_MAINNET    #chain signed batches are submitted on, see attestation.py
+BLOCK_TIMES = {         #seconds; how long a latestAnswer read is reused
+    ARBITRUM_GOERLI: .25,
+    ARBITRUM_MAINNET: .25,
+    ETHEREUM_MAINNET: 12,
+}
+RPC_POOL_SIZE = 10          #pooled http connections per rpc url
+RPC_FAILURE_COOLDOWN = 30   #seconds an rpc url is skipped after a failed request
+RPC_LATENCY_ALPHA = .2      #weight of the newest sample in the latency moving average
+
+# Batched chain reads (see blockchain.ChainReader)
+CHAIN_READ_WINDOW = .05   #seconds to collect reads from all feeds into one batch request
+CHAIN_READ_TIMEOUT = 10   #seconds
+LATEST_ANSWER_SELECTOR = '0x50d25bcd' #keccak('latestAnswer()')[:4]
+
 # Addresses:
 TRANSLUCENT_GAUSS_ARBITRUM_GOERLI = '0xB39AC20b8b0C840a863ceB58A29b597022d98Bf5'#'0x77f85f243dCd2A69F20c2A98F1ef993DC4492A51'
 # TRANSLUCENT_GAUSS_ARBITRUM_MAINNET = None
+TRANSLUCENT_GAUSS = {
+    ARBITRUM_GOERLI: TRANSLUCENT_GAUSS_ARBITRUM_GOERLI,
+}
 
 # ABIs below
 TRANSLUCENT_FLUX_AGGREGATOR = '[{"inputs":[{"internalType":"address","name":"_link","type":"address"},{"internalType":"uint128","name":"_paymentAmount","type":"uint128"},{"internalType":"uint32","name":"_timeout","type":"uint32"},{"internalType":"address","name":"_validator","type":"address"},{"internalType":"int256","name":"_minSubmissionValue","type":"int256"},{"internalType":"int256","name":"_maxSubmissionValue","type":"int256"},{"internalType":"uint8","name":"_decimals","type":"uint8"},{"internalType":"string","name":"_description","type":"string"}],"stateMutability":"nonpayable","type":"constructor"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"int256","name":"current","type":"int256"},{"indexed":true,"internalType":"uint256","name":"roundId","type":"uint256"},{"indexed":false,"internalType":"uint256","name":"updatedAt","type":"uint256"}],"name":"AnswerUpdated","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"uint256","name":"amount","type":"uint256"}],"name":"AvailableFundsUpdated","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"uint256","name":"roundId","type":"uint256"},{"indexed":true,"internalType":"address","name":"startedBy","type":"address"},{"indexed":false,"internalType":"uint256","name":"startedAt","type":"uint256"}],"name":"NewRound","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"oracle","type":"address"},{"indexed":false,"internalType":"address","name":"admin","type":"address"},{"indexed":false,"internalType":"address","name":"newAdmin","type":"address"}],"name":"OracleAdminUpdateRequested","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"oracle","type":"address"},{"indexed":true,"internalType":"address","name":"newAdmin","type":"address"}],"name":"OracleAdminUpdated","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"oracle","type":"address"},{"indexed":true,"internalType":"bool","name":"whitelisted","type":"bool"}],"name":"OraclePermissionsUpdated","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"from","type":"address"},{"indexed":true,"internalType":"address","name":"to","type":"address"}],"name":"OwnershipTransferRequested","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"from","type":"address"},{"indexed":true,"internalType":"address","name":"to","type":"address"}],"name":"OwnershipTransferred","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"requester","type":"address"},{"indexed":false,"internalType":"bool","name":"authorized","type":"bool"},{"indexed":false,"internalType":"uint32","name":"delay","type":"uint32"}],"name":"RequesterPermissionsSet","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"uint128","name":"paymentAmount","type":"uint128"},{"indexed":true,"internalType":"uint32","name":"minSubmissionCount","type":"uint32"},{"indexed":true,"internalType":"uint32","name":"maxSubmissionCount","type":"uint32"},{"indexed":false,"internalType":"uint32","name":"restartDelay","type":"uint32"},{"indexed":false,"internalType":"uint32","name":"timeout","type":"uint32"}],"name":"RoundDetailsUpdated","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"int256","name":"submission","type":"int256"},{"indexed":true,"internalType":"uint32","name":"round","type":"uint32"},{"indexed":true,"internalType":"address","name":"oracle","type":"address"}],"name":"SubmissionReceived","type":"event"},{"anonymous":false,"inputs":[{"indexed":true,"internalType":"address","name":"previous","type":"address"},{"indexed":true,"internalType":"address","name":"current","type":"address"}],"name":"ValidatorUpdated","type":"event"},{"inputs":[{"internalType":"address","name":"_oracle","type":"address"}],"name":"acceptAdmin","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[],"name":"acceptOwnership","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[],"name":"allocatedFunds","outputs":[{"internalType":"uint128","name":"","type":"uint128"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"availableFunds","outputs":[{"internalType":"uint128","name":"","type":"uint128"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address[]","name":"_removed","type":"address[]"},{"internalType":"address[]","name":"_added","type":"address[]"},{"internalType":"address[]","name":"_addedAdmins","type":"address[]"},{"internalType":"uint32","name":"_minSubmissions","type":"uint32"},{"internalType":"uint32","name":"_maxSubmissions","type":"uint32"},{"internalType":"uint32","name":"_restartDelay","type":"uint32"}],"name":"changeOracles","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[],"name":"decimals","outputs":[{"internalType":"uint8","name":"","type":"uint8"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"description","outputs":[{"internalType":"string","name":"","type":"string"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"_oracle","type":"address"}],"name":"getAdmin","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"uint256","name":"_roundId","type":"uint256"}],"name":"getAnswer","outputs":[{"internalType":"int256","name":"","type":"int256"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"getOracles","outputs":[{"internalType":"address[]","name":"","type":"address[]"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"uint80","name":"_roundId","type":"uint80"}],"name":"getRoundData","outputs":[{"internalType":"uint80","name":"roundId","type":"uint80"},{"internalType":"int256","name":"answer","type":"int256"},{"internalType":"uint256","name":"startedAt","type":"uint256"},{"internalType":"uint256","name":"updatedAt","type":"uint256"},{"internalType":"uint80","name":"answeredInRound","type":"uint80"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"uint256","name":"_roundId","type":"uint256"}],"name":"getTimestamp","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"latestAnswer","outputs":[{"internalType":"int256","name":"","type":"int256"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"latestRound","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"latestRoundData","outputs":[{"internalType":"uint80","name":"roundId","type":"uint80"},{"internalType":"int256","name":"answer","type":"int256"},{"internalType":"uint256","name":"startedAt","type":"uint256"},{"internalType":"uint256","name":"updatedAt","type":"uint256"},{"internalType":"uint80","name":"answeredInRound","type":"uint80"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"latestTimestamp","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"linkToken","outputs":[{"internalType":"contract LinkTokenInterface","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"maxSubmissionCount","outputs":[{"internalType":"uint32","name":"","type":"uint32"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"maxSubmissionValue","outputs":[{"internalType":"int256","name":"","type":"int256"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"minSubmissionCount","outputs":[{"internalType":"uint32","name":"","type":"uint32"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"minSubmissionValue","outputs":[{"internalType":"int256","name":"","type":"int256"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"","type":"address"},{"internalType":"uint256","name":"","type":"uint256"},{"internalType":"bytes","name":"_data","type":"bytes"}],"name":"onTokenTransfer","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[],"name":"oracleCount","outputs":[{"internalType":"uint8","name":"","type":"uint8"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"_oracle","type":"address"},{"internalType":"uint32","name":"_queriedRoundId","type":"uint32"}],"name":"oracleRoundState","outputs":[{"internalType":"bool","name":"_eligibleToSubmit","type":"bool"},{"internalType":"uint32","name":"_roundId","type":"uint32"},{"internalType":"int256","name":"_latestSubmission","type":"int256"},{"internalType":"uint64","name":"_startedAt","type":"uint64"},{"internalType":"uint64","name":"_timeout","type":"uint64"},{"internalType":"uint128","name":"_availableFunds","type":"uint128"},{"internalType":"uint8","name":"_oracleCount","type":"uint8"},{"internalType":"uint128","name":"_paymentAmount","type":"uint128"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"owner","outputs":[{"internalType":"address","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"paymentAmount","outputs":[{"internalType":"uint128","name":"","type":"uint128"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"requestNewRound","outputs":[{"internalType":"uint80","name":"","type":"uint80"}],"stateMutability":"nonpayable","type":"function"},{"inputs":[],"name":"restartDelay","outputs":[{"internalType":"uint32","name":"","type":"uint32"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"_requester","type":"address"},{"internalType":"bool","name":"_authorized","type":"bool"},{"internalType":"uint32","name":"_delay","type":"uint32"}],"name":"setRequesterPermissions","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"_newValidator","type":"address"}],"name":"setValidator","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"uint256","name":"_roundId","type":"uint256"},{"internalType":"int256","name":"_submission","type":"int256"}],"name":"submit","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[],"name":"timeout","outputs":[{"internalType":"uint32","name":"","type":"uint32"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"_oracle","type":"address"},{"internalType":"address","name":"_newAdmin","type":"address"}],"name":"transferAdmin","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"_to","type":"address"}],"name":"transferOwnership","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[],"name":"updateAvailableFunds","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"uint128","name":"_paymentAmount","type":"uint128"},{"internalType":"uint32","name":"_minSubmissions","type":"uint32"},{"internalType":"uint32","name":"_maxSubmissions","type":"uint32"},{"internalType":"uint32","name":"_restartDelay","type":"uint32"},{"internalType":"uint32","name":"_timeout","type":"uint32"}],"name":"updateFutureRounds","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[],"name":"validator","outputs":[{"internalType":"contract AggregatorValidatorInterface","name":"","type":"address"}],"stateMutability":"view","type":"function"},{"inputs":[],"name":"version","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"},{"inputs":[{"internalType":"address","name":"_recipient","type":"address"},{"internalType":"uint256","name":"_amount","type":"uint256"}],"name":"withdrawFunds","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"_oracle","type":"address"},{"internalType":"address","name":"_recipient","type":"address"},{"internalType":"uint256","name":"_amount","type":"uint256"}],"name":"withdrawPayment","outputs":[],"stateMutability":"nonpayable","type":"function"},{"inputs":[{"internalType":"address","name":"_oracle","type":"address"}],"name":"withdrawablePayment","outputs":[{"internalType":"uint256","name":"","type":"uint256"}],"stateMutability":"view","type":"function"}]'
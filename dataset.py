@@ -0,0 +1,165 @@
+''' module documentation:
+columnar, memory-mappable storage for historical / generated datasets
+
+a csv (e.g. data/ETH-USD_..._300secs) is parsed once and converted to
+a directory of one .npy file per column plus a json metadata sidecar;
+after that, load() memory-maps the columns, so loading takes milliseconds
+and worker processes reading the same dataset share the same pages
+'''
+
+#stdlib
+import os
+import json
+import shutil
+import tempfile
+from pathlib import Path
+
+#third party
+import numpy as np
+import pandas as pd
+
+#our stuff
+import constants as c
+
+FORMAT_VERSION = 1
+DATETIME = 'datetime'
+
+
+class Dataset:
+    ''' read-only view of a columnar dataset; columns are (memory-mapped) numpy arrays '''
+
+    def __init__(self, path, columns, meta):
+        self.path = path
+        self.columns = columns
+        self.meta = meta
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __len__(self):
+        return self.meta['rows']
+
+    def keys(self):
+        return self.columns.keys()
+
+    def to_frame(self):
+        ''' copy into a pandas DataFrame (index restored if one was saved) '''
+        frame = pd.DataFrame({k: np.asarray(v) for k, v in self.columns.items()})
+        index = self.meta.get('index')
+        return frame.set_index(index) if index else frame
+
+
+def columnar_path(path):
+    ''' where the columnar copy of a (csv) file lives '''
+    path = Path(path)
+    return path if path.suffix == c.COLUMNAR_EXT else path.with_name(path.name + c.COLUMNAR_EXT)
+
+
+def _source_stamp(path):
+    stat = os.stat(path)
+    return {'path': Path(path).name, 'size': stat.st_size, 'mtime': stat.st_mtime}
+
+
+def _to_column(values):
+    ''' convert a pandas column to a fixed-width numpy array that np.load can mmap '''
+    if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_datetime64_any_dtype(values):
+        return np.asarray(values)
+    try:
+        return pd.to_datetime(values).to_numpy(dtype='datetime64[ns]')
+    except (ValueError, TypeError):
+        return np.asarray(values, dtype=str)
+
+
+def save(path, columns, meta=None):
+    ''' write columns (name -> 1d array) as a columnar dataset at path;
+    the directory is built aside and renamed in place (the old one renamed
+    away just before, and deleted after) so concurrent readers never see a
+    partially written dataset, and a missing one only between the two renames '''
+    path = columnar_path(path)
+    columns = {name: _to_column(pd.Series(values)) for name, values in columns.items()}
+    lengths = {len(v) for v in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f'columns of unequal length: {lengths}')
+
+    meta = dict(meta or {})
+    meta['version'] = FORMAT_VERSION
+    meta['rows'] = lengths.pop() if lengths else 0
+    meta['columns'] = {
+        name: {'dtype': values.dtype.str, 'kind': DATETIME if values.dtype.kind == 'M' else values.dtype.kind}
+        for name, values in columns.items()
+    }
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = Path(tempfile.mkdtemp(prefix=path.name, dir=path.parent))
+    old = None
+    try:
+        for name, values in columns.items():
+            np.save(tmp / f'{name}.npy', values, allow_pickle=False)
+        with open(tmp / c.COLUMNAR_META_FILE, 'w') as f:
+            json.dump(meta, f, indent=2)
+        if path.exists():
+            old = Path(tempfile.mkdtemp(prefix=path.name, dir=path.parent))
+            os.replace(path, old)
+        os.replace(tmp, path)
+    except BaseException:
+        if old is not None and not path.exists():
+            os.replace(old, path)       #put the old dataset back
+        elif old is not None:
+            shutil.rmtree(old, ignore_errors=True)
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    if old is not None:
+        shutil.rmtree(old, ignore_errors=True)     #readers that mapped its columns keep them
+    return path
+
+
+def save_frame(path, frame):
+    ''' write a DataFrame or Series (with its index) as a columnar dataset '''
+    frame = frame.to_frame() if isinstance(frame, pd.Series) else frame
+    index = frame.index.name or 'index'
+    columns = {index: frame.index.to_numpy()}
+    columns.update({str(k): frame[k].to_numpy() for k in frame.columns})
+    return save(path, columns, meta={'index': index})
+
+
+def convert_csv(csv_path, **read_csv_kwargs):
+    ''' parse a csv once and store it as a columnar dataset next to it '''
+    read_csv_kwargs.setdefault('index_col', 0)
+    frame = pd.read_csv(csv_path, **read_csv_kwargs)
+    columns = {str(k): frame[k] for k in frame.columns}
+    return save(csv_path, columns, meta={'source': _source_stamp(csv_path)})
+
+
+def read_meta(path):
+    with open(columnar_path(path) / c.COLUMNAR_META_FILE) as f:
+        return json.load(f)
+
+
+def _is_stale(csv_path):
+    ''' columnar copy missing, or made from a different version of the csv '''
+    try:
+        meta = read_meta(csv_path)
+    except FileNotFoundError:
+        return True
+    source = meta.get('source', {})
+    stamp = _source_stamp(csv_path)
+    return meta.get('version') != FORMAT_VERSION or \
+        (source.get('size'), source.get('mtime')) != (stamp['size'], stamp['mtime'])
+
+
+def load(path, mmap_mode='r'):
+    ''' load a dataset; path may be a columnar directory, or a csv
+    which is (re)converted first if it has no up to date columnar copy '''
+    path = Path(path)
+    if path.suffix != c.COLUMNAR_EXT and path.is_file() and _is_stale(path):
+        convert_csv(path)
+    path = columnar_path(path)
+    meta = read_meta(path)
+    columns = {
+        name: np.load(path / f'{name}.npy', mmap_mode=mmap_mode, allow_pickle=False)
+        for name in meta['columns']
+    }
+    return Dataset(path, columns, meta)
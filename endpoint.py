@@ -6,27 +6,84 @@ in c.DEBUG mode, will show traceback
 '''
 
 #stdlib
-import traceback, sqlite3
+import time, traceback, sqlite3
 
 #third party
 import flask
 from waitress import serve
-from werkzeug.exceptions import HTTPException, NotFound
+from werkzeug.exceptions import HTTPException, NotFound, BadRequest, PreconditionFailed
 
 #our stuff
 import constants as c
+import metrics
+import attestation
 
 app = flask.Flask(__name__)
 
+REQUEST_LATENCY = metrics.histogram(
+    'siwa_http_request_seconds',
+    'latency of requests to this endpoint', ['route', 'status'])
+
+def _loaded_feeds():
+    all_feeds = getattr(app, 'all_feeds', None)
+    return all_feeds.loaded() if all_feeds is not None else {}
+
+def _datapoint_ages():
+    now = time.time()
+    return {(name,): now - feed.DATAPOINT_DEQUE[-1].timestamp
+            for name, feed in _loaded_feeds().items() if feed.DATAPOINT_DEQUE}
+
+def _source_ages():
+    now = time.time()
+    return {(name,): feed.DATAPOINT_DEQUE[-1].age(now)
+            for name, feed in _loaded_feeds().items() if feed.DATAPOINT_DEQUE}
+
+def _heartbeat_drifts():
+    return {(name,): feed.DRIFT for name, feed in _loaded_feeds().items() if feed.ACTIVE}
+
+metrics.gauge('siwa_datapoint_age_seconds',
+              'seconds since the latest data point of each feed was produced', ['feed'],
+              callback=_datapoint_ages)
+metrics.gauge('siwa_datapoint_source_age_seconds',
+              'seconds since the inputs of the latest data point of each feed were updated at their source', ['feed'],
+              callback=_source_ages)
+metrics.gauge('siwa_heartbeat_drift_seconds',
+              'how far behind its heartbeat schedule each running feed is', ['feed'],
+              callback=_heartbeat_drifts)
+
+@app.before_request
+def start_timer():
+    flask.g.request_start = time.perf_counter()
+
+@app.after_request
+def record_latency(response):
+    start = flask.g.pop('request_start', None)
+    if start is not None:
+        route = flask.request.url_rule.rule if flask.request.url_rule else 'unmatched'
+        REQUEST_LATENCY.labels(route, response.status_code).observe(time.perf_counter() - start)
+    return response
+
 @app.route("/")
 def blank():
     return 'this is a siwa endpoint'
 
 @app.route("/datafeed/<feedname>")
 def json_route(feedname):
-    '''return (over http) latest datapoint as JSON'''
-    if feedname in app.all_feeds:
-        feed = app.all_feeds[feedname]
+    '''return (over http) latest datapoint as JSON
+    with ?max_age=<seconds>, a datapoint whose source data is older than that
+    is refused with http 412, so e.g. relayers can skip re-submitting stale values'''
+    return flask.jsonify(latest_data_point(app.all_feeds, feedname, flask.request.args.get(c.MAX_AGE)))
+
+def latest_data_point(all_feeds, feedname, max_age=None):
+    '''the latest datapoint of a feed, as served by /datafeed/<feedname>
+    (also by the asgi app, see asgi.py); raises the http error to answer with instead'''
+    if max_age is not None:
+        try:
+            max_age = float(max_age)
+        except ValueError:
+            raise BadRequest(description = f'{c.MAX_AGE} must be a number of seconds')
+    if feedname in all_feeds:
+        feed = all_feeds[feedname]
         data_point = feed.get_most_recently_stored_data_point()
         #print('data_point ',data_point)
 
@@ -35,16 +92,17 @@ def json_route(feedname):
             #to ensure we return a NotFound if data_point['data_point'] not yet populated
             #note: this means deque empty
             raise NotFound(description = 'new feed / no data yet')
+        if max_age is not None and data_point[c.AGE] > max_age:
+            raise PreconditionFailed(description =
+                f'stale data point: age {data_point[c.AGE]:.1f}s > {c.MAX_AGE} {max_age:g}s'
+                + (' (degraded, sources failing)' if data_point[c.DEGRADED] else ''))
     else:
         raise NotFound(description = 'unknown feed name')
 
-    return flask.jsonify(data_point)
+    return data_point
 
-@app.errorhandler(HTTPException)
-def handle_http_exception(error):
-    ''' handle errors; return JSON so result still 
-        parseable by whatever connects to siwa '''
-    
+def error_dict(error):
+    ''' the JSON body of an http error '''
     error_dict = {
         'error': f'http {error.code}', 
         'code': error.code,
@@ -55,8 +113,13 @@ def handle_http_exception(error):
         # don't show in non-debug mode?
         # bad idea to show traceback to everyone?
         error_dict['stack_trace'] = traceback.format_exc() 
+    return error_dict
 
-    response = flask.jsonify(error_dict)
+@app.errorhandler(HTTPException)
+def handle_http_exception(error):
+    ''' handle errors; return JSON so result still 
+        parseable by whatever connects to siwa '''
+    response = flask.jsonify(error_dict(error))
     response.status_code = error.code
 
     # TODO
@@ -69,6 +132,10 @@ def handle_http_exception(error):
 @app.route('/logs')
 def sqlite_logs_route():
     '''return last 10 log entries as json'''
+    return flask.jsonify(read_logs())
+
+def read_logs():
+    '''the last 10 log entries'''
     #NOTE: we could easily change this to say "after ___",
     #e.g. so any tool could fetch all new-to-them logs after a given timestamp
     
@@ -80,11 +147,48 @@ def sqlite_logs_route():
     rows = conn.execute('SELECT * FROM log ORDER BY created DESC LIMIT 10')
     result = rows.fetchall()
     conn.close()
-    return flask.jsonify(result)
+    return result
+
+@app.route('/attestation')
+def attestation_route():
+    '''return the latest signed batch of datapoints (or that of ?round=<n>), see attestation.py'''
+    return flask.jsonify(attestation_batch(flask.request.args.get('round')).to_dict())
+
+@app.route('/attestation/proof/<feedname>')
+def attestation_proof_route(feedname):
+    '''return the merkle proof of a feed's entry in the latest signed batch (or that of ?round=<n>)'''
+    return flask.jsonify(attestation_proof(feedname, flask.request.args.get('round')))
+
+def attestation_batch(round=None):
+    '''a signed batch of this siwa's attester (also served by asgi.py);
+    raises the http error to answer with instead'''
+    attester = attestation.attester()
+    if attester is None:
+        raise NotFound(description = 'not attesting, see siwa.py --attest')
+    if round is not None:
+        try:
+            round = int(round)
+        except ValueError:
+            raise BadRequest(description = 'round must be an integer')
+    try:
+        return attester.batch(round)
+    except attestation.AttestationError as e:
+        raise NotFound(description = str(e))
+
+def attestation_proof(feedname, round=None):
+    try:
+        return attestation_batch(round).proof(feedname)
+    except attestation.AttestationError as e:
+        raise NotFound(description = str(e))
+
+@app.route('/metrics')
+def metrics_route():
+    '''return metrics in the prometheus text format'''
+    return flask.Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 def run(*args, **kwargs):
     '''run the webserver'''
     #TODO confirm below feeds reference acceptable w/r/t multithreading?
     #we never write from flask, only read, is that relevant?
     app.all_feeds = kwargs['all_feeds']
-    serve(app, host='0.0.0.0', port=16556, threads=c.WEBSERVER_THREADS)
+    serve(app, host='0.0.0.0', port=kwargs.get('port', c.ENDPOINT_PORT), threads=c.WEBSERVER_THREADS)
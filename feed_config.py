@@ -0,0 +1,142 @@
+''' module documentation:
+declarative feed configuration (feeds.toml) with hot-reload
+
+the config defines which feed instances siwa runs and their parameters;
+ConfigWatcher polls the file and re-applies it on change:
+changed parameters are set on the running feeds (e.g. a new heartbeat
+is used from the next sleep on), new instances are registered (and started
+if `start = true`), removed / disabled ones are stopped and unregistered;
+in-memory datapoints of feeds that keep running are untouched
+'''
+
+#stdlib
+import os
+import time
+import threading
+from dataclasses import dataclass, field
+
+try:
+    import tomllib
+except ModuleNotFoundError:     #python < 3.11
+    import tomli as tomllib
+
+#our stuff
+import constants as c
+from feeds.registry import FeedSpec
+
+#keys of a [feeds.<name>] table that are not feed parameters
+FEED = 'feed'
+ID = 'id'
+ENABLED = 'enabled'
+START = 'start'
+
+
+class ConfigError(Exception):
+    """Raised when the feed config file is invalid"""
+    pass
+
+
+@dataclass
+class FeedConfig:
+    name: str
+    spec: FeedSpec
+    start: bool = False
+
+
+@dataclass
+class ConfigChanges:
+    ''' result of applying a config: which feed instances to start / stop '''
+    to_start: list = field(default_factory=list)
+    removed: list = field(default_factory=list)     #loaded feed classes that are no longer configured
+
+
+def load(path, available_feeds):
+    ''' parse the config into {name: FeedConfig} for enabled instances; imports no feed
+    (their params are checked when applied, see apply) '''
+    with open(path, 'rb') as f:
+        try:
+            raw = tomllib.load(f)
+        except tomllib.TOMLDecodeError as e:
+            raise ConfigError(f'{path}: {e}')
+
+    configs = {}
+    for name, table in raw.get('feeds', {}).items():
+        table = dict(table)
+        feed = table.pop(FEED, name)
+        if feed not in available_feeds:
+            raise ConfigError(f'{path}: [feeds.{name}] unknown feed {feed!r}')
+        base = available_feeds.specs[feed]
+        feed_id = table.pop(ID, base.ID)
+        enabled = table.pop(ENABLED, True)
+        start = table.pop(START, False)
+        if not enabled:
+            continue
+        params = {key.upper(): value for key, value in table.items()}
+        configs[name] = FeedConfig(name, FeedSpec(feed_id, base.module, base.cls, params), start)
+    return configs
+
+
+def apply(configs, registry, check=True):
+    ''' make registry match configs, all at once; returns what the caller has to start / stop.
+    unless told not to, the params of the instances that are new, changed or to be started
+    are checked first (see FeedRegistry.check, which imports those feeds), and an invalid
+    one raises ConfigError and changes nothing; unchanged ones are not imported '''
+    if check:
+        for name, config in configs.items():
+            if config.start or registry.specs.get(name) != config.spec:
+                try:
+                    registry.check(name, config.spec)
+                except (ImportError, KeyError, TypeError, ValueError) as e:
+                    raise ConfigError(f'[feeds.{name}] {e}')
+    removed = registry.replace({name: config.spec for name, config in configs.items()}, check=False)
+    return ConfigChanges(to_start=[registry[name] for name, config in configs.items() if config.start],
+                         removed=removed)
+
+
+class ConfigWatcher:
+    ''' polls the config file's mtime and re-applies it when it changes;
+    on_change(changes) is called after every successful (re)load '''
+
+    def __init__(self, path, registry, available_feeds, on_change=None, interval=c.CONFIG_POLL_INTERVAL):
+        self.path = path
+        self.registry = registry
+        self.available_feeds = available_feeds
+        self.on_change = on_change
+        self.interval = interval
+        self._mtime = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def reload(self):
+        ''' (re)apply the config now; a broken config (including invalid feed params)
+        is reported and the running one kept, unchanged '''
+        self._mtime = os.stat(self.path).st_mtime_ns
+        try:
+            changes = apply(load(self.path, self.available_feeds), self.registry)
+        except (ConfigError, KeyError) as e:
+            print(f'{c.FAIL}not reloading {self.path}: {e}{c.ENDC}')
+            return None
+        if self.on_change is not None:
+            self.on_change(changes)
+        return changes
+
+    def check(self):
+        ''' reload if the file changed since the last (re)load '''
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime != self._mtime:
+            return self.reload()
+        return None
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,225 @@
+''' module documentation:
+composite feeds, computed from other feeds' data points
+
+a CompositeFeed declares the feeds it is computed from (INPUTS) and how
+(combine); it never fetches anything itself. the FeedGraph keeps the running
+composites in topological order and subscribes to the feeds they read that
+are not composites themselves: when one of those publishes, the composites
+downstream of it are recomputed, each once and after all of its inputs, and
+only if one of their inputs got a new value
+'''
+
+#stdlib
+import time
+import threading
+from functools import partial
+
+#our stuff
+from feeds.data_feed import DataFeed
+
+
+class GraphError(Exception):
+    """Raised when composite feeds' inputs are unknown or form a cycle"""
+    pass
+
+
+class FeedGraph:
+    ''' the dependency graph of running composite feeds;
+    feeds maps feed names to feeds (e.g. all_feeds.all_feeds) '''
+
+    def __init__(self, feeds):
+        self.feeds = feeds
+        self.composites = {}        #name -> CompositeFeed
+        self.order = []             #composites, every one after all of its inputs
+        self._subscriptions = {}    #name of a non-composite input -> (feed, callback)
+        self._lock = threading.RLock()
+
+    def add(self, composite):
+        ''' (re)add a composite, e.g. after its INPUTS changed '''
+        with self._lock:
+            previous = self.composites.get(composite.NAME)
+            self.composites[composite.NAME] = composite
+            try:
+                self._rebuild()
+            except GraphError:
+                if previous is None:
+                    del self.composites[composite.NAME]
+                else:
+                    self.composites[composite.NAME] = previous
+                raise
+
+    def remove(self, composite):
+        with self._lock:
+            if self.composites.get(composite.NAME) is composite:
+                del self.composites[composite.NAME]
+                self._rebuild()
+
+    def _rebuild(self):
+        for name, composite in self.composites.items():
+            for input_name in composite.inputs():
+                if input_name not in self.composites and input_name not in self.feeds:
+                    raise GraphError(f'{name}: unknown input feed {input_name}')
+        #kahn's algorithm over the composites, edges input -> composite
+        waiting = {name: {i for i in composite.inputs() if i in self.composites}
+                   for name, composite in self.composites.items()}
+        order = []
+        ready = [name for name, inputs in waiting.items() if not inputs]
+        while ready:
+            name = ready.pop()
+            order.append(self.composites[name])
+            for other, inputs in waiting.items():
+                if name in inputs:
+                    inputs.discard(name)
+                    if not inputs:
+                        ready.append(other)
+        if len(order) < len(self.composites):
+            cycle = sorted(name for name, inputs in waiting.items() if inputs)
+            raise GraphError(f'composite feeds depend on each other in a cycle: {", ".join(cycle)}')
+        self.order = order
+
+        sources = {i for composite in order for i in composite.inputs() if i not in self.composites}
+        for name in list(self._subscriptions):
+            if name not in sources:
+                feed, callback = self._subscriptions.pop(name)
+                feed.unsubscribe(callback)
+        for name in sources:
+            if name not in self._subscriptions:
+                feed, callback = self.feeds[name], partial(self.on_publish, name)
+                feed.subscribe(callback)
+                self._subscriptions[name] = (feed, callback)
+
+    def feed(self, name):
+        return self.composites.get(name) or self.feeds[name]
+
+    def on_publish(self, name, dp):
+        self.propagate(name)
+
+    def propagate(self, name):
+        ''' recompute, in order, the composites that read (directly or not) a feed that published;
+        returns the names of the composites that published '''
+        with self._lock:
+            changed = {name}
+            published = []
+            for composite in self.order:
+                if not changed.isdisjoint(composite.inputs()):
+                    if composite.recompute({i: self.feed(i) for i in composite.inputs()}) is not None:
+                        changed.add(composite.NAME)
+                        published.append(composite.NAME)
+            return published
+
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_graph():
+    ''' the graph of the composites siwa runs, over all_feeds '''
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            import all_feeds
+            _graph = FeedGraph(all_feeds.all_feeds)
+        return _graph
+
+
+class CompositeFeed(DataFeed):
+    ''' a feed computed from other feeds' latest values (see FeedGraph);
+    the input feeds have to be running for this one to update '''
+    HEARTBEAT = float('inf')    #updates are driven by the inputs; with a deviation, set a heartbeat to
+                                #also publish at the first update that long after the last publish
+    INPUTS = ()                 #names of the input feeds
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._graph = None
+
+    def inputs(self):
+        return tuple(self.INPUTS)
+
+    def set_params(self, params):
+        ''' re-add to the graph if the inputs changed '''
+        before = self.inputs()
+        super().set_params(params)
+        graph = getattr(self, '_graph', None)
+        if graph is not None and before != self.inputs():
+            try:
+                graph.add(self)
+            except GraphError as e:
+                super().set_params({**params, 'INPUTS': before})
+                raise KeyError(str(e))
+
+    def combine(self, values):
+        ''' NOTE: implemented by the child class: {input name: latest value} -> value (None to skip) '''
+        raise NotImplementedError
+
+    def recompute(self, feeds):
+        ''' publish the combination of the inputs' latest data points, following the
+        publishing policy; it is as fresh as its stalest input, and degraded if any input is.
+        returns the published DataPoint, None if an input has no value yet or nothing was published '''
+        points = {}
+        for name in self.inputs():
+            deque = feeds[name].DATAPOINT_DEQUE
+            if not deque:
+                return None
+            points[name] = deque[-1]
+        value = self.combine({name: dp.value for name, dp in points.items()})
+        now = time.time()
+        if value is None:
+            return None
+        self._source_time = min(dp.source_time for dp in points.values())
+        self._degraded = any(dp.degraded for dp in points.values())
+        if not self.should_publish(value, now):
+            self.confirm(now)
+            return None
+        return self.publish(value, now)
+
+    def create_new_data_point(self):
+        graph = self._graph or get_graph()
+        feeds = {name: graph.feed(name) for name in self.inputs()}
+        if not all(feed.DATAPOINT_DEQUE for feed in feeds.values()):
+            return None
+        return self.combine({name: feed.DATAPOINT_DEQUE[-1].value for name, feed in feeds.items()})
+
+    def attach(self, graph=None):
+        graph = graph or get_graph()
+        graph.add(self)
+        self._graph = graph
+
+    def detach(self):
+        if self._graph is not None:
+            self._graph.remove(self)
+            self._graph = None
+
+    def start(self):
+        super().start()
+        if self._graph is None:
+            self.attach()
+
+    def stop(self):
+        self.detach()
+        super().stop()
+
+    def run(self):
+        ''' nothing to poll: recompute is called by the FeedGraph when an input publishes '''
+        pass
+
+
+class StablecoinDepeg(CompositeFeed):
+    ''' how far (as a fraction) the worst-pegged stablecoin is from $1 '''
+    NAME = 'stablecoin_depeg'
+    ID = 11
+    INPUTS = ('usdc', 'busd', 'tether', 'dai')
+
+    def combine(self, values):
+        return max(abs(price - 1) for price in values.values())
+
+
+class McapDogRatio(CompositeFeed):
+    ''' the MCAP1000 index over the dogcoins' market cap '''
+    NAME = 'mcap_dog_ratio'
+    ID = 12
+    INPUTS = ('mcap1000', 'dogcoins')
+
+    def combine(self, values):
+        mcap, dogcoins = (values[name] for name in self.inputs())
+        return mcap / dogcoins if dogcoins else None
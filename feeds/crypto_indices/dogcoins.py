@@ -1,27 +1,25 @@
 from feeds.data_feed import DataFeed
 import apis.coingecko as cgecko
+from apis import utils
 from collections import deque 
 import constants as c
 
 
 class DogCoins(DataFeed):
     NAME = 'dogcoins'
-    ID =  7
+    ID = 13
     HEARTBEAT = 180
-    DATAPOINT_DEQUE = deque([], maxlen=100)
     CGECKO_IDS = [c.DOGE, c.BABYDOGE, c.DOGELON, c.SHIBA, c.SHIBASWAP] 
 
-    @classmethod
-    def process_source_data_into_siwa_datapoint(cls):
+    def process_source_data_into_siwa_datapoint(self):
         '''
         '''
-        market_data = cgecko.fetch_data_from_web(cls.CGECKO_IDS) 
-        if market_data is None:
-            return cls.DATAPOINT_DEQUE[-1]  #This should fail if DEQUE is empty
-        mcaps = sorted(list(market_data.keys()), reverse=True)
-        res =  sum(mcaps[:cls.N])
+        market_data = cgecko.fetch_data_from_web(self.CGECKO_IDS) 
+        if not market_data:
+            return self.last_good_value()  #This should fail if DEQUE is empty
+        self.source_updated(utils.latest_update(market_data))
+        res = sum(coin[c.MARKET_CAP] for coin in market_data.values())
         return res
 
-    @classmethod
-    def create_new_data_point(cls):
-        return cls.process_source_data_into_siwa_datapoint()
+    def create_new_data_point(self):
+        return self.process_source_data_into_siwa_datapoint()
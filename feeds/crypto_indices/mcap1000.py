@@ -1,6 +1,8 @@
 from feeds.data_feed import DataFeed
 from collections import deque
 
+from apis import utils, circuit
+
 from apis.coinmarketcap import CoinMarketCapAPI as coinmarketcap
 from apis.coingecko import CoinGeckoAPI as coingecko
 from apis.cryptocompare import CryptoCompareAPI as cryptocompare
@@ -10,13 +12,12 @@ class MCAP1000(DataFeed):
     NAME = 'mcap1000'
     ID = 2
     HEARTBEAT = 180
-    DATAPOINT_DEQUE = deque([], maxlen=100)
     N = 50
 
-    @classmethod
-    def process_source_data_into_siwa_datapoint(cls):
+    def process_source_data_into_siwa_datapoint(self):
         '''
             Process data from multiple sources
+            (skipping those whose circuit is open, see apis/circuit.py)
         '''
         res = []
         for source in [
@@ -24,17 +25,20 @@ class MCAP1000(DataFeed):
             coinmarketcap,
             coingecko
         ]:
-            market_data = source().fetch_data_by_mcap(cls.N)
+            api = source()
+            if not circuit.available(api.source):
+                continue
+            market_data = api.fetch_data_by_mcap(self.N)
             if market_data is None:
                 continue
+            self.source_updated(utils.latest_update(market_data))
             mcaps = sorted(list(market_data.keys()), reverse=True)
-            res.append(sum(mcaps[:cls.N]))
+            res.append(sum(mcaps[:self.N]))
         if sum(res) == 0:
-            return cls.DATAPOINT_DEQUE[-1]  # Should fail if DEQUE is empty
+            return self.last_good_value()  # Should fail if DEQUE is empty
         else:
             # Take average of values from all sources
             return sum(res) / len(res)
 
-    @classmethod
-    def create_new_data_point(cls):
-        return cls.process_source_data_into_siwa_datapoint()
+    def create_new_data_point(self):
+        return self.process_source_data_into_siwa_datapoint()
@@ -8,11 +8,9 @@ from collections import deque
 from datetime import datetime, timezone
 from dataclasses import dataclass
 
-#third party
-import pandas as pd
-
 #our stuff
 import constants as c
+import metrics
 import siwa_logging
 
 #'%(asctime)s:%(thread)d - %(name)s - %(levelname)s - %(message)s') 
@@ -21,66 +19,267 @@ logger.setLevel(logging.INFO)
 logger.addHandler(siwa_logging.SQLite_Handler())
 logger.propagate = False # TODO determine if undesirable
 
-@dataclass
+CREATE_LATENCY = metrics.histogram(
+    'siwa_create_data_point_seconds',
+    'time taken by create_new_data_point', ['feed'])
+HEARTBEAT_LAG = metrics.histogram(
+    'siwa_heartbeat_lag_seconds',
+    'how late each tick is relative to one sample interval (the heartbeat, without a deviation threshold) after the previous one', ['feed'])
+SUPPRESSED = metrics.counter(
+    'siwa_suppressed_samples_total',
+    'samples not published because they stayed within the deviation threshold', ['feed'])
+DEGRADED = metrics.counter(
+    'siwa_degraded_data_points_total',
+    'data points that re-served the last good value because the sources failed', ['feed'])
+
+class DataPoint:
+    ''' one datapoint as kept in a feed's DATAPOINT_DEQUE;
+    __slots__ keeps these small, there are up to maxlen per feed instance '''
+    __slots__ = ('value', 'timestamp', 'source_time', 'degraded')
+
+    def __init__(self, value, timestamp, source_time=None, degraded=False):
+        self.value = value
+        self.timestamp = timestamp     #unix time it was produced
+        #unix time the newest input was last updated at its source
+        self.source_time = timestamp if source_time is None else source_time
+        self.degraded = degraded       #True if the sources failed and this re-serves the last good value
+
+    def age(self, now=None):
+        ''' seconds since the inputs of this datapoint were last updated at their source '''
+        return (time.time() if now is None else now) - self.source_time
+
+    def __repr__(self):
+        return f'DataPoint({self.value!r}, {self.timestamp!r}, {self.source_time!r}, {self.degraded!r})'
+
+
+def deviation(previous, value):
+    ''' relative change from previous to value, e.g. .01 for 1%;
+    inf if they differ but previous is 0 or not a number '''
+    try:
+        return abs(value - previous) / abs(previous)
+    except (TypeError, ZeroDivisionError):
+        return 0. if value == previous else float('inf')
+
+
 class DataFeed:
-    ''' The base-level implementation for all data feeds, which should inherit from DataFeed and implement the get_data_point method as required.
+    ''' The base-level implementation for all data feeds, which should inherit from DataFeed and implement the create_new_data_point method as required.
+    Feeds are instances: the class-level attributes below are defaults, and any of them
+    can be overridden per instance, e.g. MCAP1000(name='mcap100', N=100) next to MCAP1000()
     '''
 
     #NOTE: all child classes must define these class-level attributes
-    CHAIN: str
+    CHAIN: str = None
     NAME: str
     ID: int
     HEARTBEAT: int              #in seconds
-    START_TIME: float           #unix timestamp
-    DATAPOINT_DEQUE: deque      
 
     #NOTE: the below are default attrs inherited by child classes
-    ACTIVE: bool = False
-    COUNT: int = 0              #number of data points served since starting
-    DATA_KEYS = (c.FEED_NAME, c.TIME_STAMP, c.DATA_POINT)
+    #publishing policy (chainlink style): with DEVIATION set, run() samples every SAMPLE_INTERVAL
+    #seconds but only publishes when the value moved more than DEVIATION (relative, .005 = 0.5%)
+    #from the last published one, or when HEARTBEAT seconds have passed since it (a suppressed
+    #sample still refreshes the source_time, i.e. the age, of the one served, see confirm);
+    #with DEVIATION None, every sample is published, one per HEARTBEAT
+    DEVIATION = None
+    SAMPLE_INTERVAL = None      #in seconds, defaults to HEARTBEAT
+    DATAPOINT_MAXLEN = 100
+    WORKER = None               #worker process to run in with siwa.py --workers, None: by hash (see supervisor.py)
+    DATA_KEYS = (c.FEED_NAME, c.TIME_STAMP, c.DATA_POINT, c.SOURCE_TIME, c.AGE, c.DEGRADED)
+    #per-instance runtime state, set in __init__; never a parameter
+    STATE_ATTRS = ('NAME', 'ID', 'ACTIVE', 'COUNT', 'START_TIME', 'DRIFT', 'DATAPOINT_DEQUE', 'PROFILER', 'SUBSCRIBERS', 'CONFIRMERS')
+
+    def __init__(self, name=None, feed_id=None, **params):
+        self.NAME = name or type(self).NAME
+        self.ID = type(self).ID if feed_id is None else feed_id
+        self.set_params(params)
+        self.ACTIVE = False
+        self.COUNT = 0              #number of data points served since starting
+        self.START_TIME = None      #unix timestamp
+        self.DRIFT = 0.             #seconds run() has fallen behind its sampling schedule
+        self.DATAPOINT_DEQUE = deque([], maxlen=self.DATAPOINT_MAXLEN)
+        self.PROFILER = None        #cProfile.Profile while profiled, see profiling.FeedProfiler
+        self.SUBSCRIBERS = ()       #called with every published DataPoint, see subscribe
+        self.CONFIRMERS = ()        #(subscriber, callback) called with every DataPoint confirm moves up
+        #reported by create_new_data_point for the datapoint being made, see source_updated / last_good_value
+        self._source_time = None
+        self._degraded = False
+
+    def set_params(self, params):
+        ''' override class-level parameters (e.g. HEARTBEAT, N) for this instance only;
+        parameters set before but not given now go back to the class default '''
+        for key in params:
+            if key in self.STATE_ATTRS or not hasattr(type(self), key):
+                raise KeyError(f'{self.NAME} has no parameter {key.lower()}')
+        for key in getattr(self, '_params', ()):
+            if key not in params:
+                delattr(self, key)
+        for key, value in params.items():
+            setattr(self, key, value)
+        self._params = tuple(params)
 
-    @classmethod
-    def get_data_dir(cls):
-        return c.DATA_PATH / (cls.NAME + c.DATA_EXT)
+    def inputs(self):
+        ''' names of the feeds this one is computed from (see rolling.py, composite.py) '''
+        return ()
 
-    @classmethod
-    def start(cls):
+    def get_data_dir(self):
+        return c.DATA_PATH / (self.NAME + c.DATA_EXT)
+
+    def start(self):
         ''' flag feed as active so it can start receiving/processing data '''
-        cls.START_TIME = time.time()
-        cls.ACTIVE = True
+        self.START_TIME = time.time()
+        self.ACTIVE = True
 
-    @classmethod
-    def stop(cls):
+    def stop(self):
         ''' stop / pause feed from receiving/processing data 
         for some feeds, this may involve some cleanup, disconnecting a stream etc.
         and would be handled in the overridden stop() method in that specific feed'''
-        cls.ACTIVE = False
+        self.ACTIVE = False
 
-    @classmethod
-    def run(cls):
+    def run(self):
         ''' run the data generating function(s)
         for some feeds this may be a loop, 
         in others it may be handled by a library e.g. tweepy (twitter) stream
         in that case there would be an overridden run() method in that feed'''
 
-        while cls.ACTIVE:
-            dp = cls.create_new_data_point()
-            logger.info(f'\nNext data point for {cls.NAME}: {dp}\n')
-            cls.DATAPOINT_DEQUE.append(dp)
-            cls.COUNT += 1
-            time.sleep(cls.HEARTBEAT)
-                
-    @classmethod
-    def create_new_data_point(cls):
+        create_latency = CREATE_LATENCY.labels(self.NAME)
+        heartbeat_lag = HEARTBEAT_LAG.labels(self.NAME)
+        suppressed = SUPPRESSED.labels(self.NAME)
+        first_tick = previous_tick = interval = None
+        due = 0.        #seconds after the first tick that this one was due
+        while self.ACTIVE:
+            tick = time.perf_counter()
+            if previous_tick is None:
+                first_tick = tick
+            else:
+                heartbeat_lag.observe(tick - previous_tick - interval)
+                self.DRIFT = tick - first_tick - due
+            previous_tick = tick
+
+            self._source_time, self._degraded = None, False
+            profiler = self.PROFILER
+            if profiler is None:
+                dp = self.create_new_data_point()
+            else:
+                dp = profiler.runcall(self.create_new_data_point)
+            create_latency.observe(time.perf_counter() - tick)
+            interval = self.sample_interval()
+            now = time.time()
+            if self.should_publish(dp, now, interval):
+                logger.info(f'\nNext data point for {self.NAME}: {dp}\n')
+                self.publish(dp, now)
+            else:
+                suppressed.inc()
+                self.confirm(now)
+            due += interval
+            time.sleep(interval)
+
+    def sample_interval(self):
+        ''' seconds run() sleeps between samples '''
+        if self.DEVIATION is None:
+            return self.HEARTBEAT
+        return self.SAMPLE_INTERVAL or self.HEARTBEAT
+
+    def should_publish(self, value, now=None, interval=0.):
+        ''' the publishing policy (see DEVIATION): whether a sampled value is published;
+        the heartbeat counts as expired up to half a sample interval early,
+        so publishing doesn't slip a whole sample late '''
+        if self.DEVIATION is None or not self.DATAPOINT_DEQUE:
+            return True
+        last = self.DATAPOINT_DEQUE[-1]
+        now = time.time() if now is None else now
+        if now - last.timestamp + interval / 2 >= self.HEARTBEAT:
+            return True
+        if self._degraded != last.degraded:
+            return True     #sources just failed or recovered
+        return deviation(last.value, value) > self.DEVIATION
+
+    def publish(self, value, timestamp=None, source_time=None, degraded=None):
+        ''' store a new data point so it is served;
+        source_time and degraded default to what create_new_data_point reported
+        (see source_updated and last_good_value), and a degraded data point
+        keeps the source time of the last good one '''
+        timestamp = time.time() if timestamp is None else timestamp
+        if source_time is None:
+            source_time = self._source_time
+        if degraded is None:
+            degraded = self._degraded
+        self._source_time, self._degraded = None, False
+        if degraded:
+            DEGRADED.labels(self.NAME).inc()
+            if source_time is None and self.DATAPOINT_DEQUE:
+                source_time = self.DATAPOINT_DEQUE[-1].source_time
+        dp = DataPoint(value, timestamp, source_time, degraded)
+        self.DATAPOINT_DEQUE.append(dp)
+        self.COUNT += 1
+        for callback in self.SUBSCRIBERS:
+            try:
+                callback(dp)
+            except Exception as e:
+                print(f'{c.FAIL}subscriber {callback} of {self.NAME} failed: {e!r}{c.ENDC}')
+        return dp
+
+    def confirm(self, now=None):
+        ''' called instead of publish for a sample the publishing policy suppressed:
+        it confirms the value served, so the last data point's source_time moves up to
+        the sample's (see source_updated; the time it was sampled if not reported) and
+        its age doesn't grow up to the heartbeat. a degraded sample confirms nothing '''
+        source_time, degraded = self._source_time, self._degraded
+        self._source_time, self._degraded = None, False
+        if degraded or not self.DATAPOINT_DEQUE:
+            return
+        if source_time is None:
+            source_time = time.time() if now is None else now
+        last = self.DATAPOINT_DEQUE[-1]
+        if source_time <= last.source_time:
+            return
+        last.source_time = source_time
+        for subscriber, callback in self.CONFIRMERS:
+            try:
+                callback(last)
+            except Exception as e:
+                print(f'{c.FAIL}subscriber {subscriber} of {self.NAME} failed: {e!r}{c.ENDC}')
+
+    def subscribe(self, callback, confirmed=None):
+        ''' call callback(dp) with every data point published from now on (e.g. rolling.RollingFeed),
+        and confirmed(dp) (if given) whenever confirm moves the last one's source_time up (e.g. to
+        replicate it); callbacks run in the publishing thread, so should be quick '''
+        self.SUBSCRIBERS = self.SUBSCRIBERS + (callback,)
+        if confirmed is not None:
+            self.CONFIRMERS = self.CONFIRMERS + ((callback, confirmed),)
+
+    def unsubscribe(self, callback):
+        self.SUBSCRIBERS = tuple(s for s in self.SUBSCRIBERS if s != callback)
+        self.CONFIRMERS = tuple(pair for pair in self.CONFIRMERS if pair[0] != callback)
+
+    def source_updated(self, *times):
+        ''' called from create_new_data_point with the unix times its inputs were
+        last updated at their source (None for unknown);
+        the data point's source_time is the latest of them '''
+        times = [t for t in times if t is not None]
+        if times:
+            latest = max(times)
+            if self._source_time is None or latest > self._source_time:
+                self._source_time = latest
+
+    def last_good_value(self):
+        ''' the latest value, for create_new_data_point to return when its sources fail;
+        flags the data point degraded. raises IndexError if there is no value yet '''
+        value = self.DATAPOINT_DEQUE[-1].value
+        self._degraded = True
+        return value
+
+    def create_new_data_point(self):
         ''' NOTE: this method must be implemented by the child class '''
         raise NotImplementedError
 
-    @classmethod
-    def get_most_recently_stored_data_point(cls):
-        ''' pass '''
-        data_point = cls.DATAPOINT_DEQUE[-1] if len(cls.DATAPOINT_DEQUE) else None
-        to_serve = (cls.NAME, time.time(), data_point)
-        return dict(zip(cls.DATA_KEYS, to_serve))
+    def get_most_recently_stored_data_point(self):
+        ''' the latest data point, with when it was produced (time_stamp),
+        when its inputs were last updated at their source (source_time),
+        seconds since then (age) and whether it re-serves a last good value (degraded) '''
+        if not self.DATAPOINT_DEQUE:
+            return dict(zip(self.DATA_KEYS, (self.NAME, time.time(), None, None, None, False)))
+        dp = self.DATAPOINT_DEQUE[-1]
+        to_serve = (self.NAME, dp.timestamp, dp.value, dp.source_time, dp.age(), dp.degraded)
+        return dict(zip(self.DATA_KEYS, to_serve))
 
     # @staticmethod
     # def format_data(dp):
@@ -4,53 +4,44 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 
 #3rd party
-from web3 import Web3
 from numpy import random
 import pandas as pd
 
 #our stuff
 import constants as c
 from feeds.data_feed import DataFeed
-from blockchain import Translucent
+import blockchain
 
 class FaceRipper(DataFeed):
     CHAIN = c.ARBITRUM_GOERLI
     NAME = 'faceripper'
     ID = 8 
     HEARTBEAT = 1
-    DATAPOINT_DEQUE = deque([], maxlen=100)
     #Feed-specific class-level attrs
     THRESHOLD = 1 
 
 
-    @classmethod
-    def get_latest_source_data(cls):
-        ''' fetch data from datasource; in this case, the blockchain'''
+    def get_latest_source_data(self):
+        ''' fetch data from datasource; in this case, the blockchain
+        (batched and cached for a block time with reads from other on-chain feeds, see blockchain.ChainProvider)'''
         #TODO TBD: return None if datum already seen?
-        if cls.CHAIN == c.ARBITRUM_GOERLI:
-            gauss = Translucent.gauss_arbi_goerli
-        elif cls.CHAIN == c.ARBITRUM_MAINNET:
-            gauss = Translucent.gauss_arbi_main
+        return blockchain.get_provider(self.CHAIN).latest_answer(c.TRANSLUCENT_GAUSS[self.CHAIN])
 
-        return gauss.functions.latestAnswer().call()
-
-    @classmethod
-    def process_source_data_into_siwa_datapoint(cls, source_data):
+    def process_source_data_into_siwa_datapoint(self, source_data):
         ''' We have a dynamic standard deviation, based on the last data point, so we can get a new data point
             that is within a certain percentage of the last data point. Without this, if the previous data point
             is large, the delta (between previous and new) will be very small, and vice versa.
         '''
         seed = ...
-        source_data = cls.get_latest_source_data()
+        source_data = self.get_latest_source_data()
         current_datapoint = ... # XXX.functions.latestAnswer().call()
-        if source_data < cls.THRESHOLD:
+        if source_data < self.THRESHOLD:
             mul = random.choice([0.5, 2])
             new_datapoint = current_datapoint * mul, seed
         else:
             new_datapoint = current_datapoint, None 
 
-    @classmethod
-    def create_new_data_point(cls):
+    def create_new_data_point(self):
         ''' fetches imbalance from datasource,
             applies siwa algorithms to create new siwa datapoint,
             returns said new siwa datapoint (or None if datasource stale?? TBD)
@@ -61,7 +52,7 @@ class FaceRipper(DataFeed):
         #NOTE TODO / BUG POTENTIAL / should we check and ensure latest datasource data
         #is new and we haven't seen it before? Or is that irrelevant?
 
-        return cls.process_source_data_into_siwa_datapoint(datapoint)
+        return self.process_source_data_into_siwa_datapoint(datapoint)
 
 
 
@@ -77,22 +68,20 @@ class TestClass(Gauss):
         self.VOLATILITY = volatility
         self.HEARTBEAT = heartbeat
 
-    @classmethod
-    def _generate_data_points(cls, n, first_data_value):
+    def _generate_data_points(self, n, first_data_value):
         ''' generate n data points for testing purposes, starting at first_data_value'''
 
         res = []
         last_data_value = first_data_value
         for _ in range(n):
-            std = max(cls.VOLATILITY * last_data_value * cls.PERCENT, .1)
+            std = max(self.VOLATILITY * last_data_value * self.PERCENT, .1)
             delta = random.normal(0, std)
-            last_data_value =  last_data_value + (cls.VOLATILITY * delta)
+            last_data_value =  last_data_value + (self.VOLATILITY * delta)
             res.append(last_data_value)
 
         return res
 
-    @classmethod
-    def _prep_data(cls, data, resample_freq='300s'):
+    def _prep_data(self, data, resample_freq='300s'):
         '''prepare the data into ohlc resampled at proper frequency for overlay-risk repo to compute risk parameters'''
         start = datetime(2021, 1, 1)  #make arbitrary starting date
         end = start + timedelta(seconds=len(data) - 1)
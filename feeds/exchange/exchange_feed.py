@@ -0,0 +1,205 @@
+''' module documentation:
+exchange-aggregated price feeds, streamed over websockets
+
+an ExchangeFeed watches the ticker (or order book) of one symbol on several
+exchanges at once through ccxt's async websocket interface (ccxt.pro),
+keeps the latest top of book per venue in memory, and publishes their
+median (or volume-weighted) price as soon as quotes move, at most every
+MIN_PUBLISH_INTERVAL seconds and at least every HEARTBEAT seconds,
+instead of polling a rest api every heartbeat
+
+ccxt is only imported when a feed starts; tests pass stand-in exchanges
+through the EXCHANGE_FACTORY parameter (see test/exchange_stub.py)
+'''
+
+#stdlib
+import time
+import asyncio
+import statistics
+
+#our stuff
+from feeds.data_feed import DataFeed
+
+TICKER = 'ticker'
+ORDER_BOOK = 'order_book'
+
+
+class Quote:
+    ''' the latest top of book of one venue;
+    weight is what the vwap weighs its price by: the 24h base volume for
+    tickers, the size at the best bid and ask for order books '''
+    __slots__ = ('venue', 'bid', 'ask', 'price', 'weight', 'timestamp')
+
+    def __init__(self, venue, bid, ask, price, weight, timestamp):
+        self.venue = venue
+        self.bid = bid
+        self.ask = ask
+        self.price = price
+        self.weight = weight
+        self.timestamp = timestamp     #unix time of the venue's update
+
+    def __repr__(self):
+        return f'Quote({self.venue!r}, {self.bid!r}, {self.ask!r}, {self.price!r}, {self.weight!r}, {self.timestamp!r})'
+
+
+def _unixtime(milliseconds):
+    ''' ccxt timestamps are in milliseconds, and may be missing '''
+    return milliseconds / 1000 if milliseconds else time.time()
+
+
+def quote_from_ticker(venue, ticker):
+    ''' a ccxt ticker -> Quote; the price is the mid, or the last trade without a bid and ask '''
+    bid, ask = ticker.get('bid'), ticker.get('ask')
+    price = (bid + ask) / 2 if bid and ask else ticker.get('last')
+    return Quote(venue, bid, ask, price, ticker.get('baseVolume') or 0., _unixtime(ticker.get('timestamp')))
+
+
+def quote_from_order_book(venue, order_book):
+    ''' a ccxt order book -> Quote of the mid at the top of the book '''
+    if not order_book['bids'] or not order_book['asks']:
+        return None
+    bid, bid_size = order_book['bids'][0][:2]
+    ask, ask_size = order_book['asks'][0][:2]
+    return Quote(venue, bid, ask, (bid + ask) / 2, bid_size + ask_size, _unixtime(order_book.get('timestamp')))
+
+
+def median_price(quotes):
+    return statistics.median(quote.price for quote in quotes)
+
+
+def vwap(quotes):
+    ''' volume-weighted average price; the median if no venue reports a volume '''
+    total = sum(quote.weight for quote in quotes)
+    if not total:
+        return median_price(quotes)
+    return sum(quote.price * quote.weight for quote in quotes) / total
+
+
+AGGREGATIONS = {'median': median_price, 'vwap': vwap}
+
+
+def ccxt_exchange(name):
+    ''' the async (websocket) ccxt client of an exchange, e.g. 'binance' '''
+    import ccxt.pro
+    return getattr(ccxt.pro, name)({'enableRateLimit': True})
+
+
+class ExchangeFeed(DataFeed):
+    ''' a price aggregated over several exchanges' websocket streams;
+    runs its own asyncio loop in the feed thread '''
+    HEARTBEAT = 1               #most seconds without publishing
+    SYMBOL = 'BTC/USDT'
+    EXCHANGES = ('binance', 'okx', 'kucoin')
+    AGGREGATION = 'median'      #or 'vwap', see AGGREGATIONS
+    WATCH = TICKER              #or ORDER_BOOK
+    MIN_PUBLISH_INTERVAL = .1   #seconds; quotes arriving faster are published together
+    MAX_QUOTE_AGE = 10          #seconds; venues quiet for longer are left out
+    RECONNECT_DELAY = 1         #seconds before re-subscribing to a failed venue, doubling...
+    MAX_RECONNECT_DELAY = 60    #...up to this
+    EXCHANGE_FACTORY = None     #exchange name -> async ccxt-like client; defaults to ccxt_exchange
+    STATE_ATTRS = DataFeed.STATE_ATTRS + ('QUOTES',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.QUOTES = {}            #venue -> latest Quote
+        self._loop = None
+        self._updated = None        #asyncio.Event, set when a quote arrives
+
+    def fresh_quotes(self, now=None):
+        now = time.time() if now is None else now
+        return [quote for quote in self.QUOTES.values()
+                if quote.price is not None and now - quote.timestamp <= self.MAX_QUOTE_AGE]
+
+    def create_new_data_point(self):
+        ''' the aggregate price of the venues with fresh quotes;
+        the last good value if there are none (None before the first) '''
+        quotes = self.fresh_quotes()
+        if not quotes:
+            return self.last_good_value() if self.DATAPOINT_DEQUE else None
+        self.source_updated(max(quote.timestamp for quote in quotes))
+        return AGGREGATIONS[self.AGGREGATION](quotes)
+
+    def stop(self):
+        self.ACTIVE = False
+        loop, updated = self._loop, self._updated
+        if loop is not None and updated is not None:
+            try:
+                loop.call_soon_threadsafe(updated.set)   #wake the publisher so run() returns now
+            except RuntimeError:    #loop already closed
+                pass
+
+    def run(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        self._loop = asyncio.get_running_loop()
+        self._updated = asyncio.Event()
+        factory = self.EXCHANGE_FACTORY or ccxt_exchange
+        exchanges = {name: factory(name) for name in self.EXCHANGES}
+        watchers = [asyncio.create_task(self._watch(name, exchange)) for name, exchange in exchanges.items()]
+        try:
+            await self._publish_loop()
+        finally:
+            for watcher in watchers:
+                watcher.cancel()
+            await asyncio.gather(*watchers, return_exceptions=True)
+            for exchange in exchanges.values():
+                try:
+                    await exchange.close()
+                except Exception as e:
+                    print(f'Warning: {self.NAME} could not close {exchange}: {e}')
+            self._loop = self._updated = None
+
+    async def _watch(self, name, exchange):
+        ''' keep QUOTES[name] up to date, re-subscribing with backoff on errors '''
+        delay = self.RECONNECT_DELAY
+        while self.ACTIVE:
+            try:
+                if self.WATCH == ORDER_BOOK:
+                    quote = quote_from_order_book(name, await exchange.watch_order_book(self.SYMBOL))
+                else:
+                    quote = quote_from_ticker(name, await exchange.watch_ticker(self.SYMBOL))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f'Warning: {self.NAME} lost {name} ({type(e).__name__}: {e}), retrying in {delay:g}s')
+                self.QUOTES.pop(name, None)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.MAX_RECONNECT_DELAY)
+                continue
+            delay = self.RECONNECT_DELAY
+            if quote is not None:
+                self.QUOTES[name] = quote
+                self._updated.set()
+
+    async def _publish_loop(self):
+        ''' publish when quotes arrive (or every HEARTBEAT), following the publishing policy;
+        not logged to sqlite, which would be a write per quote '''
+        while self.ACTIVE:
+            try:
+                await asyncio.wait_for(self._updated.wait(), self.HEARTBEAT)
+            except asyncio.TimeoutError:
+                pass
+            self._updated.clear()
+            if not self.ACTIVE:
+                break
+            self._source_time, self._degraded = None, False
+            value = self.create_new_data_point()
+            now = time.time()
+            if value is not None and self.should_publish(value, now):
+                self.publish(value, now)
+            elif value is not None:
+                self.confirm(now)
+            await asyncio.sleep(self.MIN_PUBLISH_INTERVAL)
+
+
+class BTCUSD(ExchangeFeed):
+    NAME = 'btc_usd'
+    ID = 14
+    SYMBOL = 'BTC/USDT'
+
+
+class ETHUSD(ExchangeFeed):
+    NAME = 'eth_usd'
+    ID = 9
+    SYMBOL = 'ETH/USDT'
@@ -4,50 +4,42 @@ from dataclasses import dataclass
 from datetime import datetime, timedelta
 
 #3rd party
-from web3 import Web3
 from numpy import random
 import pandas as pd
 
 #our stuff
 import constants as c
 from feeds.data_feed import DataFeed
-from blockchain import Translucent
+from feeds.gauss import ohlc
+import blockchain
 
 class Gauss(DataFeed):
     CHAIN = c.ARBITRUM_GOERLI
     NAME = 'gauss'
     ID = 1
     HEARTBEAT = 10
-    DATAPOINT_DEQUE = deque([], maxlen=100)
     #Feed-specific class-level attrs
     PERCENT = .01
     VOLATILITY = 1
 
 
 
-    @classmethod
-    def get_latest_source_data(cls):
-        ''' fetch data from datasource; in this case, the blockchain'''
+    def get_latest_source_data(self):
+        ''' fetch data from datasource; in this case, the blockchain
+        (batched and cached for a block time with reads from other on-chain feeds, see blockchain.ChainProvider)'''
         #TODO TBD: return None if datum already seen?
-        if cls.CHAIN == c.ARBITRUM_GOERLI:
-            gauss = Translucent.gauss_arbi_goerli
-        elif cls.CHAIN == c.ARBITRUM_MAINNET:
-            return Translucent.gauss_arbi_main
+        return blockchain.get_provider(self.CHAIN).latest_answer(c.TRANSLUCENT_GAUSS[self.CHAIN])
 
-        return gauss.functions.latestAnswer().call()
-
-    @classmethod
-    def process_source_data_into_siwa_datapoint(cls, source_data):
+    def process_source_data_into_siwa_datapoint(self, source_data):
         ''' We have a dynamic standard deviation, based on the last data point, so we can get a new data point
             that is within a certain percentage of the last data point. Without this, if the previous data point
             is large, the delta (between previous and new) will be very small, and vice versa.
         '''
-        std = max(cls.VOLATILITY * source_data * cls.PERCENT, .001)
+        std = max(self.VOLATILITY * source_data * self.PERCENT, .001)
         delta = random.normal(0, std)
-        return source_data + cls.VOLATILITY * delta
+        return source_data + self.VOLATILITY * delta
 
-    @classmethod
-    def create_new_data_point(cls):
+    def create_new_data_point(self):
         ''' fetches data from datasource,
             applies siwa algorithms to create new siwa datapoint,
             returns said new siwa datapoint (or None if datasource stale?? TBD)
@@ -57,9 +49,9 @@ class Gauss(DataFeed):
         '''
         #NOTE TODO / BUG POTENTIAL / should we check and ensure latest datasource data
         #is new and we haven't seen it before? Or is that irrelevant?
-        source_data = cls.get_latest_source_data()
+        source_data = self.get_latest_source_data()
         # print(f'got source data and it is {source_data}') #manually checking functionality
-        return cls.process_source_data_into_siwa_datapoint(source_data)
+        return self.process_source_data_into_siwa_datapoint(source_data)
 
 
 
@@ -67,36 +59,49 @@ class Gauss(DataFeed):
 
 class TestClass(Gauss):
     def __init__(self,
-            percent,
-            volatility,
-            heartbeat):
+            percent=Gauss.PERCENT,
+            volatility=Gauss.VOLATILITY,
+            heartbeat=Gauss.HEARTBEAT):
 
-        self.PERCENT = percent
-        self.VOLATILITY = volatility
-        self.HEARTBEAT = heartbeat
+        super().__init__(PERCENT=percent, VOLATILITY=volatility, HEARTBEAT=heartbeat)
 
-    @classmethod
-    def _generate_data_points(cls, n, first_data_value):
+    def _generate_data_chunks(self, n, first_data_value, chunk_size=100_000):
+        ''' generate n data points in chunks (lists of at most chunk_size points),
+        so long paths can be consumed (e.g. resampled) while they are generated'''
+        last_data_value = first_data_value
+        for start in range(0, n, chunk_size):
+            #draw the normals up front; same random stream as per-step random.normal(0, std)
+            deltas = random.standard_normal(min(chunk_size, n - start))
+            res = []
+            for delta in deltas.tolist():
+                std = max(self.VOLATILITY * last_data_value * self.PERCENT, .1)
+                last_data_value = last_data_value + (self.VOLATILITY * (std * delta))
+                res.append(last_data_value)
+            yield res
+
+    def _generate_data_points(self, n, first_data_value):
         ''' generate n data points for testing purposes, starting at first_data_value'''
-
         res = []
-        last_data_value = first_data_value
-        for _ in range(n):
-            std = max(cls.VOLATILITY * last_data_value * cls.PERCENT, .1)
-            delta = random.normal(0, std)
-            last_data_value =  last_data_value + (cls.VOLATILITY * delta)
-            res.append(last_data_value)
-
+        for chunk in self._generate_data_chunks(n, first_data_value):
+            res.extend(chunk)
         return res
 
-    @classmethod
-    def _prep_data(cls, data, resample_freq='300s'):
-        '''prepare the data into ohlc resampled at proper frequency for overlay-risk repo to compute risk parameters'''
+    @staticmethod
+    def _to_close_series(bars, resample_freq):
+        ''' wrap the close column of ohlc bars in the same series the pandas resample produced'''
         start = datetime(2021, 1, 1)  #make arbitrary starting date
-        end = start + timedelta(seconds=len(data) - 1)
-        dates = pd.date_range(start=start, end=end, freq='s')
-        pxs = pd.DataFrame({'time':dates, 'pxs': data})
-        pxs = pxs.set_index('time')
-        pxs = pxs.resample('300s').ohlc()
-        return pxs['pxs']['close']
+        index = pd.date_range(start=start, periods=len(bars), freq=resample_freq, name='time')
+        return pd.Series(bars[:, ohlc.CLOSE], index=index, name='close')
 
+    def _prep_data(self, data, resample_freq='300s'):
+        '''prepare the data into ohlc resampled at proper frequency for overlay-risk repo to compute risk parameters'''
+        bar_size = int(pd.Timedelta(resample_freq).total_seconds())
+        return self._to_close_series(ohlc.ohlc(data, bar_size), resample_freq)
+
+    def _generate_prepped_data(self, n, first_data_value, resample_freq='300s'):
+        ''' same as _prep_data(_generate_data_points(...)), but resamples each chunk
+        as it is generated so the full path is never held in memory'''
+        resampler = ohlc.OHLCResampler(int(pd.Timedelta(resample_freq).total_seconds()))
+        for chunk in self._generate_data_chunks(n, first_data_value):
+            resampler.update(chunk)
+        return self._to_close_series(resampler.finish(), resample_freq)
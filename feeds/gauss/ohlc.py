@@ -0,0 +1,64 @@
+''' vectorized ohlc resampling for regularly spaced price paths
+(e.g. simulated gauss data, one value per second);
+bars are computed with reshape/reduce directly on the array,
+so no timestamp index is ever built
+'''
+
+#third party
+import numpy as np
+
+OPEN, HIGH, LOW, CLOSE = range(4)
+OHLC_COLUMNS = ('open', 'high', 'low', 'close')
+
+
+def _reduce_bars(data, bar_size):
+    ''' reduce a 1d array whose length is a multiple of bar_size into ohlc bars '''
+    full = data.reshape(-1, bar_size)
+    bars = np.empty((len(full), 4))
+    bars[:, OPEN] = full[:, 0]
+    bars[:, HIGH] = full.max(axis=1)
+    bars[:, LOW] = full.min(axis=1)
+    bars[:, CLOSE] = full[:, -1]
+    return bars
+
+
+def ohlc(data, bar_size=300):
+    ''' resample data (one value per interval) into bars of bar_size intervals;
+    returns an (n_bars, 4) array of open, high, low, close;
+    like pandas, a trailing partial bar is kept '''
+    resampler = OHLCResampler(bar_size)
+    resampler.update(data)
+    return resampler.finish()
+
+
+class OHLCResampler:
+    ''' incremental ohlc resampler; feed it chunks of a path as they are
+    generated via update(), then call finish() to flush the last (partial) bar;
+    output is identical to resampling the whole path at once '''
+
+    def __init__(self, bar_size=300):
+        self.bar_size = bar_size
+        self._carry = np.empty(0)
+        self._bars = []
+
+    def update(self, chunk):
+        ''' add the next chunk of the path; returns the bars completed by it '''
+        data = np.asarray(chunk, dtype=float)
+        if len(self._carry):
+            data = np.concatenate((self._carry, data))
+        n_full = len(data) // self.bar_size * self.bar_size
+        #copy so we don't keep the whole chunk alive through a view
+        self._carry = data[n_full:].copy()
+        bars = _reduce_bars(data[:n_full], self.bar_size)
+        self._bars.append(bars)
+        return bars
+
+    def finish(self):
+        ''' flush the trailing partial bar (if any) and return all bars '''
+        if len(self._carry):
+            tail = self._carry
+            self._bars.append(np.array([[tail[0], tail.max(), tail.min(), tail[-1]]]))
+            self._carry = np.empty(0)
+        if not self._bars:
+            return np.empty((0, 4))
+        return np.concatenate(self._bars)
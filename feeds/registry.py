@@ -0,0 +1,128 @@
+''' lazy feed registry, keyed by feed instance name:
+feeds are known by name and id up front, but a feed's module
+(and whatever it pulls in: web3, pandas, nltk, tweepy...)
+is only imported, and the feed instance created, when the feed
+is started or queried
+'''
+
+#stdlib
+import importlib
+import threading
+from collections.abc import Mapping
+from dataclasses import dataclass, field
+
+
+@dataclass(frozen=True)
+class FeedSpec:
+    ''' where to find a feed, without importing it;
+    params override the feed class' parameters for this instance (e.g. {'HEARTBEAT': 60}) '''
+    ID: int
+    module: str
+    cls: str
+    params: dict = field(default_factory=dict)
+
+
+class FeedRegistry(Mapping):
+    ''' name -> feed instance mapping that imports and creates feeds on first access;
+    iterating / `in` / len() never import anything '''
+
+    def __init__(self, specs):
+        self.specs = dict(specs)
+        self._loaded = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name):
+        if name not in self._loaded:
+            spec = self.specs[name]
+            with self._lock:
+                if name not in self._loaded:
+                    self._loaded[name] = self._load(name, spec)
+        return self._loaded[name]
+
+    @staticmethod
+    def _load(name, spec):
+        feed_class = getattr(importlib.import_module(spec.module), spec.cls)
+        return feed_class(name=name, feed_id=spec.ID, **spec.params)
+
+    def __iter__(self):
+        return iter(self.specs)
+
+    def __len__(self):
+        return len(self.specs)
+
+    def __contains__(self, name):
+        return name in self.specs
+
+    def is_loaded(self, name):
+        return name in self._loaded
+
+    def loaded(self):
+        ''' feeds created so far, name -> feed instance '''
+        return {name: self._loaded[name] for name in self.specs if name in self._loaded}
+
+    def get_id(self, name):
+        return self.specs[name].ID
+
+    def by_id(self, feed_id):
+        ''' the (first) feed registered under an id '''
+        for name, spec in self.specs.items():
+            if spec.ID == feed_id:
+                return self[name]
+        raise KeyError(feed_id)
+
+    @staticmethod
+    def check(name, spec):
+        ''' raise KeyError (or TypeError / ValueError) if the spec's params are not valid for its feed,
+        by creating a throwaway instance: this imports the feed's module (raising ImportError if
+        it can't be). a spec without params is always valid, and imports nothing '''
+        if not spec.params:
+            return
+        feed_class = getattr(importlib.import_module(spec.module), spec.cls)
+        feed_class(name=name, feed_id=spec.ID, **spec.params)
+
+    def add(self, name, spec):
+        ''' register (or re-specify) a feed instance; a created instance is re-tuned in place,
+        keeping its datapoints, unless it now is a different kind of feed.
+        an invalid spec (see check) raises and changes nothing '''
+        self.check(name, spec)
+        with self._lock:
+            self._set(name, spec)
+
+    def _set(self, name, spec):
+        old = self.specs.get(name)
+        self.specs[name] = spec
+        if name in self._loaded:
+            if old is not None and (old.module, old.cls) != (spec.module, spec.cls):
+                del self._loaded[name]
+            else:
+                self._loaded[name].ID = spec.ID
+                self._loaded[name].set_params(spec.params)
+
+    def replace(self, specs, check=True):
+        ''' re-specify all feed instances at once ({name: FeedSpec}, see feed_config.apply):
+        all specs are checked before any is applied, so an invalid one changes nothing;
+        returns the created instances of the feeds no longer registered (so they can be stopped) '''
+        if check:
+            for name, spec in specs.items():
+                self.check(name, spec)
+        with self._lock:
+            gone = [name for name in self.specs if name not in specs]
+            removed = [self._loaded[name] for name in gone if name in self._loaded]
+            for name in gone:
+                del self.specs[name]
+            for name, spec in specs.items():
+                self._set(name, spec)
+        return removed
+
+    def remove(self, name):
+        ''' unregister a feed instance; returns it if it was created (so it can be stopped) '''
+        with self._lock:
+            del self.specs[name]
+            return self._loaded.get(name)
+
+    def subset(self, names):
+        ''' a registry of just the given feeds, sharing already-created instances '''
+        registry = FeedRegistry({name: self.specs[name] for name in names})
+        registry._loaded = self._loaded
+        registry._lock = self._lock
+        return registry
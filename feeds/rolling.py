@@ -0,0 +1,245 @@
+''' module documentation:
+rolling statistics over a feed's history, served as derived feeds
+
+each statistic is updated in O(1) (amortised) per new data point, from
+running sums and monotonic deques over a time window, so serving it never
+recomputes over history:
+    twa         time-weighted average (each value holds until the next one)
+    ewma        exponentially weighted moving average, WINDOW is the half-life
+    variance    sample variance of the values in the window
+    volatility  standard deviation of the log returns in the window
+    min / max   smallest / largest value in the window
+
+a RollingFeed subscribes to its SOURCE feed (see DataFeed.subscribe) and
+publishes the statistic every time the source publishes, e.g. in feeds.toml:
+    [feeds.btc_usd_twap]
+    feed = "rolling"
+    id = 10
+    source = "btc_usd"
+    statistic = "twa"
+    window = 300
+'''
+
+#stdlib
+import math
+from collections import deque
+
+#our stuff
+from feeds.data_feed import DataFeed
+
+
+class TWA:
+    ''' time-weighted average over the last `window` seconds '''
+
+    def __init__(self, window):
+        self.window = window
+        self.segments = deque()     #(start, end, value): value held from start to end
+        self.area = 0.              #sum of value * duration over the segments
+        self.last = None            #(timestamp, value) of the latest update
+
+    def update(self, value, timestamp):
+        if self.last is not None and timestamp > self.last[0]:
+            start, held = self.last
+            self.segments.append((start, timestamp, held))
+            self.area += held * (timestamp - start)
+        self.last = (timestamp, value)
+        cutoff = timestamp - self.window
+        while self.segments and self.segments[0][1] <= cutoff:
+            start, end, held = self.segments.popleft()
+            self.area -= held * (end - start)
+        if self.segments and self.segments[0][0] < cutoff:
+            start, end, held = self.segments[0]
+            self.area -= held * (cutoff - start)
+            self.segments[0] = (cutoff, end, held)
+
+    @property
+    def value(self):
+        if not self.segments:
+            return None if self.last is None else self.last[1]
+        return self.area / (self.last[0] - self.segments[0][0])
+
+
+class EWMA:
+    ''' exponentially weighted moving average; a value `half_life` seconds old has half the weight '''
+
+    def __init__(self, half_life):
+        self.half_life = half_life
+        self.value = None
+        self.timestamp = None
+
+    def update(self, value, timestamp):
+        if self.value is None:
+            self.value = value
+        else:
+            alpha = 1 - .5 ** (max(timestamp - self.timestamp, 0) / self.half_life)
+            self.value += alpha * (value - self.value)
+        self.timestamp = timestamp
+
+
+class RollingVariance:
+    ''' sample variance of the values of the last `window` seconds, from running sums
+    (of values shifted by the first one, so the sums don't lose precision) '''
+
+    def __init__(self, window):
+        self.window = window
+        self.points = deque()       #(timestamp, shifted value)
+        self.shift = None
+        self.total = 0.
+        self.total_squares = 0.
+
+    def update(self, value, timestamp):
+        if self.shift is None:
+            self.shift = value
+        x = value - self.shift
+        self.points.append((timestamp, x))
+        self.total += x
+        self.total_squares += x * x
+        cutoff = timestamp - self.window
+        while self.points[0][0] <= cutoff:
+            _, x = self.points.popleft()
+            self.total -= x
+            self.total_squares -= x * x
+
+    @property
+    def value(self):
+        n = len(self.points)
+        if n < 2:
+            return None if n == 0 else 0.
+        return max((self.total_squares - self.total * self.total / n) / (n - 1), 0.)
+
+
+class Volatility:
+    ''' standard deviation of the log returns between successive values of the last `window` seconds '''
+
+    def __init__(self, window):
+        self.returns = RollingVariance(window)
+        self.previous = None
+
+    def update(self, value, timestamp):
+        if self.previous is not None and self.previous > 0 and value > 0:
+            self.returns.update(math.log(value / self.previous), timestamp)
+        self.previous = value
+
+    @property
+    def value(self):
+        variance = self.returns.value
+        return None if variance is None else math.sqrt(variance)
+
+
+class RollingMax:
+    ''' largest value of the last `window` seconds, from a deque of decreasing values '''
+
+    def __init__(self, window):
+        self.window = window
+        self.points = deque()       #(timestamp, value), values decreasing
+
+    def _dominates(self, new, old):
+        return new >= old
+
+    def update(self, value, timestamp):
+        while self.points and self._dominates(value, self.points[-1][1]):
+            self.points.pop()
+        self.points.append((timestamp, value))
+        cutoff = timestamp - self.window
+        while self.points[0][0] <= cutoff:
+            self.points.popleft()
+
+    @property
+    def value(self):
+        return self.points[0][1] if self.points else None
+
+
+class RollingMin(RollingMax):
+    ''' smallest value of the last `window` seconds, from a deque of increasing values '''
+
+    def _dominates(self, new, old):
+        return new <= old
+
+
+STATISTICS = {
+    'twa': TWA,
+    'ewma': EWMA,
+    'variance': RollingVariance,
+    'volatility': Volatility,
+    'min': RollingMin,
+    'max': RollingMax,
+}
+
+
+class RollingFeed(DataFeed):
+    ''' a statistic of another feed's values, published whenever the source publishes;
+    the source feed has to be running for this one to update '''
+    NAME = 'rolling'
+    ID = 10
+    HEARTBEAT = float('inf')    #updates are driven by the source; with a deviation, set a heartbeat to
+                                #also publish at the first update that long after the last publish
+    SOURCE = None               #name of the source feed
+    STATISTIC = 'twa'           #see STATISTICS
+    WINDOW = 3600               #seconds (the half-life for ewma)
+    STATE_ATTRS = DataFeed.STATE_ATTRS + ('STAT',)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.STAT = None            #the statistic, built when attached to the source
+        self._source = None
+
+    def set_params(self, params):
+        ''' re-attach (rebuilding the statistic from the source's history)
+        if the source, statistic or window changed '''
+        if params.get('STATISTIC', self.STATISTIC) not in STATISTICS:
+            raise KeyError(f'{self.NAME}: unknown statistic {params["STATISTIC"]}, one of {", ".join(STATISTICS)}')
+        before = (getattr(self, 'SOURCE', None), getattr(self, 'STATISTIC', None), getattr(self, 'WINDOW', None))
+        super().set_params(params)
+        source = getattr(self, '_source', None)
+        if source is not None and before != (self.SOURCE, self.STATISTIC, self.WINDOW):
+            self.attach(source if before[0] == self.SOURCE else None)
+
+    def inputs(self):
+        return (self.SOURCE,) if self.SOURCE else ()
+
+    def get_source(self):
+        import all_feeds
+        return all_feeds.all_feeds[self.SOURCE]
+
+    def attach(self, source=None):
+        ''' subscribe to the source feed, and seed the statistic with the history it holds '''
+        self.detach()
+        source = source or self.get_source()
+        self.STAT = STATISTICS[self.STATISTIC](self.WINDOW)
+        for dp in list(source.DATAPOINT_DEQUE):
+            self.STAT.update(dp.value, dp.timestamp)
+        self._source = source
+        source.subscribe(self.on_source_publish)
+
+    def detach(self):
+        if self._source is not None:
+            self._source.unsubscribe(self.on_source_publish)
+            self._source = None
+
+    def on_source_publish(self, dp):
+        ''' update the statistic, and publish it following the publishing policy '''
+        self.STAT.update(dp.value, dp.timestamp)
+        value = self.STAT.value
+        if value is None:
+            return
+        self._source_time, self._degraded = dp.source_time, dp.degraded
+        if self.should_publish(value, dp.timestamp):
+            self.publish(value, dp.timestamp)
+        else:
+            self.confirm(dp.timestamp)
+
+    def start(self):
+        super().start()
+        if self._source is None:
+            self.attach()
+
+    def stop(self):
+        self.detach()
+        super().stop()
+
+    def run(self):
+        ''' nothing to poll: on_source_publish is called from the source feed's thread '''
+        pass
+
+    def create_new_data_point(self):
+        return self.STAT.value if self.STAT is not None else None
@@ -1,52 +1,50 @@
 from feeds.data_feed import DataFeed
 import apis.coingecko as cgecko
+from apis import utils
 from collections import deque 
 import constants as c
 
 
 class StableCoin(DataFeed):
-    @classmethod
-    def process_source_data_into_siwa_datapoint(cls):
+    #pegged prices barely move: sample every minute, but only publish on a
+    #0.1% move from the last published price, or hourly
+    DEVIATION = .001
+    SAMPLE_INTERVAL = 60
+    HEARTBEAT = 3600
+
+    def process_source_data_into_siwa_datapoint(self):
         '''
         '''
-        market_data = cgecko.fetch_data_from_web([cls.CGECKO_ID])
-        if market_data is None:
-            return cls.DATAPOINT_DEQUE[-1]
-        px = market_data[cls.CGECKO_ID][c.PRICE]
+        market_data = cgecko.fetch_data_from_web([self.CGECKO_ID])
+        if not market_data:
+            return self.last_good_value()
+        self.source_updated(utils.latest_update(market_data))
+        px = market_data[self.CGECKO_ID][c.PRICE]
         return px 
 
-    @classmethod
-    def create_new_data_point(cls):
-        return cls.process_source_data_into_siwa_datapoint()
+    def create_new_data_point(self):
+        return self.process_source_data_into_siwa_datapoint()
 
 
 
 class USDC(StableCoin):
     NAME = 'usdc'
     ID = 3 
-    HEARTBEAT = 120 
-    DATAPOINT_DEQUE = deque([], maxlen=100)
     CGECKO_ID = c.USDC
 
 
 class BUSD(StableCoin):
     NAME = 'busd'
     ID = 4 
-    HEARTBEAT = 120 
-    DATAPOINT_DEQUE = deque([], maxlen=100)
     CGECKO_ID = c.BUSD
 
 class Tether(StableCoin):
     NAME = 'tether'
     ID = 5 
-    HEARTBEAT = 120 
-    DATAPOINT_DEQUE = deque([], maxlen=100)
     CGECKO_ID = c.TETHER
 
 
 class Dai(StableCoin):
     NAME = 'dai'
     ID = 6 
-    HEARTBEAT = 120 
-    DATAPOINT_DEQUE = deque([], maxlen=100)
     CGECKO_ID = c.DAI
\ No newline at end of file
@@ -9,8 +9,6 @@ class Test(DataFeed):
     NAME = 'test'
     ID = 0
     HEARTBEAT = 1
-    DATAPOINT_DEQUE = deque([], maxlen=100)
 
-    @classmethod
-    def create_new_data_point(cls):
+    def create_new_data_point(self):
         return random.rand()
@@ -25,10 +25,11 @@ class STREAM_API(tweepy.StreamingClient):
         tweet_time = time.time() #note: tweet.created_at is None for some reason.
         self.tweet_count += 1
         sentiment = sentiment_analyzer.find_sentiment(tweet.text)
-        self.SENTIMENT_BUFFER.append(sentiment)
-        if len(self.SENTIMENT_BUFFER) == 5:
+        buffer = self.feed.SENTIMENT_BUFFER
+        buffer.append(sentiment)
+        if len(buffer) == 5:
             #only add datapoint if we have 5 tweets to average sentiment across
-            self.DATAPOINT_DEQUE.append(sum(self.SENTIMENT_BUFFER)/len(self.SENTIMENT_BUFFER))
+            self.feed.publish(sum(buffer)/len(buffer), tweet_time)
         
         #TODO SEND TO QUEUE
 
@@ -53,34 +54,40 @@ class Twitter(DataFeed):
     NAME = 'twitter'
     ID = 7 #
     HEARTBEAT = 1 #irrelevant for a twitter stream?
-    DATAPOINT_DEQUE = deque([], maxlen=100)
-    SENTIMENT_BUFFER = deque([], maxlen=5)
     RULES_TO_MONITOR = ['bitcoin OR litecoin',] #@raoulGMI
 
-    TWITTER_STREAM = STREAM_API(bearer_token = bearer_token)#,
-    TWITTER_STREAM.DATAPOINT_DEQUE = DATAPOINT_DEQUE
-    TWITTER_STREAM.SENTIMENT_BUFFER = SENTIMENT_BUFFER
-
     #Feed-specific class-level attrs
 
-    @classmethod
-    def stop(cls):
-        x=cls.TWITTER_STREAM.disconnect()
-        cls.ACTIVE = False
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.SENTIMENT_BUFFER = deque([], maxlen=5)
+        self.TWITTER_STREAM = None   #built on first run, see get_stream()
+
+    def get_stream(self):
+        ''' create the tweepy stream when first needed, not at import time '''
+        if self.TWITTER_STREAM is None:
+            self.TWITTER_STREAM = STREAM_API(bearer_token = bearer_token)#,
+            self.TWITTER_STREAM.feed = self
+        return self.TWITTER_STREAM
+
+    def stop(self):
+        if self.TWITTER_STREAM is not None:
+            self.TWITTER_STREAM.disconnect()
+        self.ACTIVE = False
 
-    @classmethod
-    def run(cls):
+    def run(self):
         #NOTE: you can have max 5 rules with Essential API access
         #however, each rule can have many terms, the below is ONE rule not 3, for example
         #https://developer.twitter.com/en/docs/twitter-api/tweets/filtered-stream/integrate/build-a-rule
 
         #CHECK LIST OF RULES TO MONITOR
         #UPDATE (add/delete new/old rules) AS NEEDED:
-        rules_to_monitor = cls.RULES_TO_MONITOR
+        rules_to_monitor = self.RULES_TO_MONITOR
         rules_to_add = [rule for rule in rules_to_monitor] # copy
         rules_to_delete = list()
 
-        current_rules = cls.TWITTER_STREAM.get_rules()
+        stream = self.get_stream()
+        current_rules = stream.get_rules()
         for rule in current_rules.data:
             if not rule.value in rules_to_monitor:
                 rules_to_delete.append(rule.id)
@@ -92,18 +99,17 @@ class Twitter(DataFeed):
             #this is so we dont just delete_all() every time
             #and hit an API rate limit while testing
             if c.DEBUG: print('unused twitter rules found; deleting')
-            cls.TWITTER_STREAM.delete_rules(rules_to_delete)
+            stream.delete_rules(rules_to_delete)
 
         if rules_to_add:
             #add new rules
             if c.DEBUG: print('new twitter rules found; adding')
-            cls.TWITTER_STREAM.add_rules([tweepy.StreamRule(rule) for rule in rules_to_add])
+            stream.add_rules([tweepy.StreamRule(rule) for rule in rules_to_add])
 
         #this is the loop:
-        cls.TWITTER_STREAM.filter()
+        stream.filter()
 
-    @classmethod
-    def get_latest_source_data(cls):
+    def get_latest_source_data(self):
         ''' fetch data from datasource; in this case, the blockchain'''
         #TODO TBD: return None if datum already seen?
         pass
\ No newline at end of file
@@ -0,0 +1,253 @@
+''' module documentation:
+prometheus-style metrics, cheap enough to leave on in production
+
+counters and histograms are sharded per thread: each thread only ever
+increments its own preallocated list, so recording a sample takes no lock
+(and allocates nothing beyond the number being added); shards are only
+summed when /metrics is scraped, and folded into one when their thread
+ends; gauges are computed at scrape time by a callback
+
+metrics are created once, at import time of the module that records them,
+and bound to their label values up front where possible, e.g.
+    CREATE_LATENCY = metrics.histogram('siwa_create_data_point_seconds', '...', ['feed'])
+    latency = CREATE_LATENCY.labels(feed.NAME)      #once
+    latency.observe(elapsed)                        #per sample
+'''
+
+#stdlib
+import time
+import weakref
+import threading
+from bisect import bisect_left
+
+#seconds; covers fast in-memory work up to slow upstream apis
+DEFAULT_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60)
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Owner:
+    ''' kept in a thread's thread-local only: collected when the thread ends '''
+
+
+class _Sharded:
+    ''' one preallocated list per thread; only the owning thread writes to it.
+    when a thread ends, its shard is folded into a base shard, so short-lived
+    threads (request handlers, to_thread workers...) don't pile up shards '''
+
+    def __init__(self, size):
+        self._size = size
+        self._local = threading.local()
+        self._shards = []
+        self._base = [0] * size     #totals of the threads that ended
+        self._lock = threading.Lock()
+
+    def shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            return self._new_shard()
+
+    def _new_shard(self):
+        shard = self._local.shard = [0] * self._size
+        #the thread-local is cleared when the thread ends, collecting the owner
+        owner = self._local.owner = _Owner()
+        weakref.finalize(owner, self._retire, shard).atexit = False
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+    def _retire(self, shard):
+        with self._lock:
+            for i, value in enumerate(shard):
+                self._base[i] += value
+            self._shards.remove(shard)
+
+    def totals(self):
+        with self._lock:
+            totals = list(self._base)
+            for shard in self._shards:
+                for i, value in enumerate(shard):
+                    totals[i] += value
+        return totals
+
+
+class _CounterChild(_Sharded):
+
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount=1):
+        self.shard()[0] += amount
+
+    def value(self):
+        return self.totals()[0]
+
+
+class _HistogramChild(_Sharded):
+
+    def __init__(self, buckets):
+        #one slot per bucket, one for +Inf, one for the sum
+        super().__init__(len(buckets) + 2)
+        self._buckets = buckets
+
+    def observe(self, value):
+        shard = self.shard()
+        shard[bisect_left(self._buckets, value)] += 1
+        shard[-1] += value
+
+    def time(self):
+        ''' context manager observing the duration of a block '''
+        return _Timer(self)
+
+
+class _Timer:
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.child.observe(time.perf_counter() - self.start)
+
+
+class _Metric:
+    TYPE = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        ''' the child for these label values (created once, then a dict lookup) '''
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def header(self):
+        return [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.TYPE}']
+
+    def render(self):
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    TYPE = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def render(self):
+        lines = self.header()
+        for values, child in list(self._children.items()):
+            lines.append(f'{self.name}{_format_labels(self.label_names, values)} {_format_value(child.value())}')
+        return lines
+
+
+class Histogram(_Metric):
+    TYPE = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = self.header()
+        for values, child in list(self._children.items()):
+            totals = child.totals()
+            cumulative = 0
+            for bound, count in zip([*self.buckets, float('inf')], totals):
+                cumulative += count
+                le = _format_labels(self.label_names, values, [('le', _format_value(bound))])
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            labels = _format_labels(self.label_names, values)
+            lines.append(f'{self.name}_sum{labels} {_format_value(totals[-1])}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Gauge(_Metric):
+    ''' computed when scraped: callback() returns {label values tuple: value} '''
+    TYPE = 'gauge'
+
+    def __init__(self, name, help, labels=(), callback=None):
+        super().__init__(name, help, labels)
+        self.callback = callback
+
+    def render(self):
+        lines = self.header()
+        for values, value in (self.callback() if self.callback else {}).items():
+            lines.append(f'{self.name}{_format_labels(self.label_names, values)} {_format_value(value)}')
+        return lines
+
+
+def _register(cls, name, *args, **kwargs):
+    ''' create a metric, or return the existing one of that name '''
+    with _registry_lock:
+        metric = _registry.get(name)
+        if metric is None:
+            metric = _registry[name] = cls(name, *args, **kwargs)
+        elif not isinstance(metric, cls):
+            raise ValueError(f'metric {name} already registered as a {metric.TYPE}')
+        return metric
+
+
+def counter(name, help, labels=()):
+    return _register(Counter, name, help, labels)
+
+
+def histogram(name, help, labels=(), buckets=DEFAULT_BUCKETS):
+    return _register(Histogram, name, help, labels, buckets=buckets)
+
+
+def gauge(name, help, labels=(), callback=None):
+    metric = _register(Gauge, name, help, labels)
+    if callback is not None:
+        metric.callback = callback
+    return metric
+
+
+def render():
+    ''' all metrics in the prometheus text exposition format '''
+    lines = []
+    for metric in list(_registry.values()):
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
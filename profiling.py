@@ -0,0 +1,124 @@
+''' module documentation:
+profilers that can be attached to a running siwa (see `profile` in the siwa CLI)
+
+    SamplingProfiler - samples the stacks of some threads (a feed's thread,
+                       or the endpoint's waitress threads) from a background thread;
+                       written as folded stacks (.folded), the input format of
+                       flamegraph.pl, speedscope and inferno
+    FeedProfiler     - cProfiles every create_new_data_point call of one feed;
+                       written as a .prof file, for snakeviz / flameprof / pstats
+
+nothing here runs unless a profiler is started: the feed loop only checks
+whether its PROFILER is None once per heartbeat
+'''
+
+#stdlib
+import os
+import sys
+import time
+import cProfile
+import threading
+from collections import Counter
+
+#our stuff
+import constants as c
+
+
+def output_path(target, ext):
+    ''' where a profile of target (a feed name or 'endpoint') is written '''
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    return c.PROFILE_PATH / f'{target}_{stamp}{ext}'
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'.replace(';', ':')
+
+
+def folded_stack(frame):
+    ''' root-first, semicolon-separated stack of a frame, as used by flamegraph tools '''
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class SamplingProfiler:
+    ''' samples the stacks of the threads returned by get_thread_ids()
+    every interval seconds (the threads may change while profiling,
+    e.g. a feed thread being restarted) '''
+    EXT = '.folded'
+
+    def __init__(self, get_thread_ids, interval=c.PROFILE_SAMPLE_INTERVAL):
+        self.get_thread_ids = get_thread_ids
+        self.interval = interval
+        self.samples = Counter()
+        self._running = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._running.is_set()
+
+    def start(self):
+        self._running.set()
+        self._thread = threading.Thread(target=self._sample_loop, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running.clear()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _sample_loop(self):
+        while self._running.is_set():
+            self.sample()
+            time.sleep(self.interval)
+
+    def sample(self):
+        ''' take one sample of every profiled thread '''
+        thread_ids = set(self.get_thread_ids())
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in thread_ids:
+                self.samples[folded_stack(frame)] += 1
+
+    def dump(self, path):
+        ''' write the samples so far as folded stacks: "frame;frame;frame count" per line '''
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+        return path
+
+
+class FeedProfiler:
+    ''' cProfile each create_new_data_point call of feed (see DataFeed.run);
+    calls from before start() or after stop() are not profiled '''
+    EXT = '.prof'
+
+    def __init__(self, feed):
+        self.feed = feed
+        self.profile = cProfile.Profile()
+
+    @property
+    def running(self):
+        return self.feed.PROFILER is self.profile
+
+    def start(self):
+        self.feed.PROFILER = self.profile
+
+    def stop(self):
+        if self.running:
+            self.feed.PROFILER = None
+
+    def dump(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.profile.dump_stats(path)
+        return path
+
+
+def endpoint_thread_ids():
+    ''' the threads serving the endpoint: waitress' workers, or the asgi event loop '''
+    return [t.ident for t in threading.enumerate() if t.name.startswith('waitress-') or t.name == 'asgi']
@@ -0,0 +1,357 @@
+''' module documentation:
+leader / follower replication of the feeds' data points
+
+one siwa process (the leader) runs the feeds and streams every data point it
+publishes to any number of followers; a follower runs no feeds, it keeps
+replicated copies of the leader's deques and serves them over the http
+endpoint. followers scale reads out, and one can be promoted to run the feeds
+when the leader dies, with its deques already warm.
+
+the protocol is newline-delimited json over tcp (host:port) or a unix socket
+(a path), leader to follower only:
+    {"op": "snapshot", "feeds": {name: [point, ...]}}   replace these feeds' deques
+    {"op": "publish", "feed": name, "point": point}    one new data point
+    {"op": "confirm", "feed": name, "timestamp": t, "source_time": s}
+                                                       the source time of the last data point (the one at t)
+                                                       moved up, see DataFeed.confirm
+    {"op": "ping", "time": t}                          sent when idle, so followers notice a dead leader
+with a point being [value, timestamp, source_time, degraded]. a follower gets a
+snapshot of every feed on connect (and of every feed the leader loads later),
+then the stream; it reconnects (and re-snapshots) after any error.
+
+    python siwa.py --replicate 16557                   leader
+    python siwa.py --follow 127.0.0.1:16557 --port 16558   follower
+'''
+
+#stdlib
+import os
+import json
+import time
+import queue
+import socket
+import threading
+import socketserver
+
+#our stuff
+import constants as c
+import metrics
+from feeds.data_feed import DataPoint
+
+
+def parse_address(address):
+    ''' 'host:port' / (host, port) -> (socket family, address); anything with a / is a unix socket path '''
+    if isinstance(address, tuple):
+        return socket.AF_INET, address
+    if '/' in address:
+        return socket.AF_UNIX, address
+    host, _, port = address.rpartition(':')
+    return socket.AF_INET, (host or '0.0.0.0', int(port))
+
+
+def remove_stale_socket(path):
+    ''' remove the unix socket file a crashed leader left behind (but not a live leader's) '''
+    if not os.path.exists(path):
+        return
+    with socket.socket(socket.AF_UNIX) as sock:
+        try:
+            sock.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+
+
+def encode(message):
+    return json.dumps(message, default=float).encode() + b'\n'
+
+
+def to_point(dp):
+    return [dp.value, dp.timestamp, dp.source_time, dp.degraded]
+
+
+def replicate(feed, point):
+    ''' publish a data point another process produced on a (not running) feed;
+    returns the DataPoint, None for a repeat of one it already has '''
+    value, timestamp, source_time, degraded = point
+    if feed.DATAPOINT_DEQUE and timestamp <= feed.DATAPOINT_DEQUE[-1].timestamp:
+        return None
+    return feed.publish(value, timestamp, source_time, degraded)
+
+
+def confirm(feed, timestamp, source_time):
+    ''' move the source time of a (not running) feed's last data point up, as another process's
+    DataFeed.confirm did; returns the DataPoint, None if it is not the last one or was not older '''
+    if not feed.DATAPOINT_DEQUE:
+        return None
+    last = feed.DATAPOINT_DEQUE[-1]
+    if last.timestamp != timestamp or source_time <= last.source_time:
+        return None
+    last.source_time = source_time
+    return last
+
+
+class _Follower:
+    ''' a connected follower: the lines waiting to be sent to it '''
+
+    def __init__(self, address):
+        self.address = address
+        self.lines = queue.Queue(maxsize=c.REPLICATION_QUEUE_SIZE)
+        self.dropped = False        #it fell too far behind, it will reconnect and re-snapshot
+
+    def send(self, line):
+        try:
+            self.lines.put_nowait(line)
+        except queue.Full:
+            self.dropped = True
+
+
+class ReplicationLeader:
+    ''' streams the data points of the loaded feeds of a registry (e.g. all_feeds.all_feeds)
+    to the followers that connect to address '''
+
+    def __init__(self, feeds, address=('0.0.0.0', c.REPLICATION_PORT)):
+        self.feeds = feeds
+        self.family, self.address = parse_address(address)
+        self.followers = []
+        self._subscriptions = {}    #feed name -> (feed, callback)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.server = None
+        self._thread = None
+
+    def start(self):
+        leader = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                leader.serve(self.client_address, self.wfile)
+
+        base = socketserver.ThreadingUnixStreamServer if self.family == socket.AF_UNIX \
+            else socketserver.ThreadingTCPServer
+
+        class Server(base):
+            daemon_threads = True
+            allow_reuse_address = True
+
+        if self.family == socket.AF_UNIX:
+            remove_stale_socket(self.address)
+        self._stop.clear()
+        self.server = Server(self.address, Handler)
+        self.address = self.server.server_address
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True, name='replication-leader')
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            if self.family == socket.AF_UNIX:
+                os.unlink(self.address)
+        with self._lock:
+            for feed, callback in self._subscriptions.values():
+                feed.unsubscribe(callback)
+            self._subscriptions = {}
+
+    def _follow_new_feeds(self):
+        ''' subscribe to the feeds loaded since the last call; returns their snapshot line (or None).
+        call with the lock held: points published meanwhile are in the snapshot, the stream,
+        or both (followers skip the repeats) '''
+        new = {}
+        for name, feed in self.feeds.loaded().items():
+            subscribed = self._subscriptions.get(name)
+            if subscribed is None or subscribed[0] is not feed:
+                if subscribed is not None:
+                    subscribed[0].unsubscribe(subscribed[1])
+                callback = lambda dp, name=name: self.on_publish(name, dp)
+                feed.subscribe(callback, lambda dp, name=name: self.on_confirm(name, dp))
+                self._subscriptions[name] = (feed, callback)
+                new[name] = feed
+        if not new:
+            return None
+        return encode({'op': 'snapshot',
+                       'feeds': {name: [to_point(dp) for dp in list(feed.DATAPOINT_DEQUE)]
+                                 for name, feed in new.items()}})
+
+    def snapshot(self):
+        ''' the snapshot line of every feed followed '''
+        return encode({'op': 'snapshot',
+                       'feeds': {name: [to_point(dp) for dp in list(feed.DATAPOINT_DEQUE)]
+                                 for name, (feed, _) in self._subscriptions.items()}})
+
+    def on_publish(self, name, dp):
+        ''' called in the publishing feed's thread: queue the point for every follower '''
+        line = encode({'op': 'publish', 'feed': name, 'point': to_point(dp)})
+        for follower in self.followers:
+            follower.send(line)
+
+    def on_confirm(self, name, dp):
+        ''' called in the confirming feed's thread: queue the new source time for every follower '''
+        line = encode({'op': 'confirm', 'feed': name, 'timestamp': dp.timestamp, 'source_time': dp.source_time})
+        for follower in self.followers:
+            follower.send(line)
+
+    def poll(self):
+        ''' pick up the feeds loaded since, sending their history to the followers '''
+        with self._lock:
+            line = self._follow_new_feeds()
+            if line is not None:
+                for follower in self.followers:
+                    follower.send(line)
+
+    def serve(self, client_address, wfile):
+        ''' stream to one follower, from a snapshot, until it disconnects or falls behind '''
+        follower = _Follower(client_address)
+        with self._lock:
+            line = self._follow_new_feeds()
+            if line is not None:
+                for other in self.followers:
+                    other.send(line)
+            #followed before the snapshot is taken, so nothing published meanwhile is missed
+            self.followers = self.followers + [follower]
+            follower.send(self.snapshot())
+        try:
+            while not self._stop.is_set() and not follower.dropped:
+                try:
+                    line = follower.lines.get(timeout=c.REPLICATION_PING_INTERVAL)
+                except queue.Empty:
+                    self.poll()
+                    line = encode({'op': 'ping', 'time': time.time()})
+                wfile.write(line)
+                wfile.flush()
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self.followers = [f for f in self.followers if f is not follower]
+
+
+class ReplicationFollower:
+    ''' keeps the deques of the feeds of a registry (e.g. all_feeds.all_feeds) in sync with a leader's;
+    feeds the leader runs but that are not in the registry are ignored '''
+
+    def __init__(self, feeds, leader_address, timeout=None):
+        self.feeds = feeds
+        self.family, self.leader_address = parse_address(leader_address)
+        self.timeout = c.REPLICATION_TIMEOUT if timeout is None else timeout
+        self.connected = threading.Event()
+        self.last_message = None    #unix time of the last message from the leader
+        self.snapshots = 0          #snapshots applied, for tests / status
+        self._stop = threading.Event()
+        self._socket = None
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True, name='replication-follower')
+            self._thread.start()
+        return self
+
+    def stop(self):
+        ''' stop following, e.g. to be promoted to leader; the replicated deques are kept '''
+        self._stop.set()
+        sock = self._socket
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        thread, self._thread = self._thread, None
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def lag(self, now=None):
+        ''' seconds since the last message from the leader (None if never connected) '''
+        if self.last_message is None:
+            return None
+        return (time.time() if now is None else now) - self.last_message
+
+    def _run(self):
+        delay = c.REPLICATION_RECONNECT_DELAY
+        while not self._stop.is_set():
+            try:
+                self._follow()
+                delay = c.REPLICATION_RECONNECT_DELAY
+            except (OSError, ValueError) as e:
+                if not self._stop.is_set():
+                    print(f'{c.WARNING}replication: lost leader {self.leader_address}: {e!r}, '
+                          f'reconnecting in {delay:g}s{c.ENDC}')
+            self.connected.clear()
+            if self._stop.wait(delay):
+                return
+            delay = min(delay * 2, c.REPLICATION_MAX_RECONNECT_DELAY)
+
+    def _follow(self):
+        sock = socket.socket(self.family, socket.SOCK_STREAM)
+        self._socket = sock
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(self.leader_address)
+            with sock.makefile('rb') as lines:
+                for line in lines:
+                    self.apply(json.loads(line))
+                    if self._stop.is_set():
+                        return
+        finally:
+            self._socket = None
+            sock.close()
+
+    def apply(self, message):
+        ''' apply one message from the leader '''
+        self.last_message = time.time()
+        op = message['op']
+        if op == 'snapshot':
+            for name, points in message['feeds'].items():
+                if name in self.feeds:
+                    deque = self.feeds[name].DATAPOINT_DEQUE
+                    deque.clear()
+                    deque.extend(DataPoint(*point) for point in points)
+            self.snapshots += 1
+            self.connected.set()
+        elif op == 'publish' and message['feed'] in self.feeds:
+            replicate(self.feeds[message['feed']], message['point'])
+        elif op == 'confirm' and message['feed'] in self.feeds:
+            confirm(self.feeds[message['feed']], message['timestamp'], message['source_time'])
+
+
+_roles = {}     #'leader' / 'follower' -> the running ReplicationLeader / ReplicationFollower
+
+
+def _followers():
+    leader = _roles.get('leader')
+    return {(): len(leader.followers)} if leader is not None else {}
+
+def _leader_lag():
+    follower = _roles.get('follower')
+    lag = follower.lag() if follower is not None else None
+    return {(): lag} if lag is not None else {}
+
+metrics.gauge('siwa_replication_followers',
+              'followers connected to this (leader) siwa',
+              callback=_followers)
+metrics.gauge('siwa_replication_leader_lag_seconds',
+              'seconds since this (follower) siwa last heard from its leader',
+              callback=_leader_lag)
+
+
+def lead(feeds, address):
+    ''' start streaming the feeds' data points to followers (see siwa.py --replicate) '''
+    _roles['leader'] = ReplicationLeader(feeds, address).start()
+    return _roles['leader']
+
+def follow(feeds, leader_address):
+    ''' start following a leader (see siwa.py --follow) '''
+    _roles['follower'] = ReplicationFollower(feeds, leader_address).start()
+    return _roles['follower']
+
+def following():
+    ''' the running ReplicationFollower, None unless this siwa is a follower '''
+    return _roles.get('follower')
+
+def unfollow():
+    ''' stop following (e.g. to promote this siwa to leader); the replicated deques are kept '''
+    follower = _roles.pop('follower', None)
+    if follower is not None:
+        follower.stop()
+    return follower
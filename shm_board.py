@@ -0,0 +1,258 @@
+''' module documentation:
+a shared-memory board of every feed's latest data point, for local consumers
+
+siwa (with --board) keeps the latest data point of each loaded feed in a
+memory-mapped file of fixed layout; a process on the same host maps the file
+too and reads any feed with plain memory loads: no request, no syscall, no
+json. BoardReader is the reader for python; the layout is simple enough to
+map from any language (native byte order, little-endian on x86):
+
+    header, 64 bytes:   magic b'SIWABRD1', version u32, slots u32, slot size u32
+    then `slots` slots of 96 bytes:
+        seq             u64     +2 per update; odd while being written, 0 unused
+        feed id         i64
+        timestamp       f64     unix time the data point was produced
+        value           f64     NaN if the value is not a number
+        source time     f64     unix time its inputs were updated at their source
+        degraded        u64     1 if the sources failed and this is the last good value
+        name            48 bytes, utf-8, NUL padded
+
+the slots are a seqlock: the writer makes seq odd, writes the fields, then
+makes seq even again; a reader reads seq, the fields, then seq again, and
+retries if the two differ or are odd. seq is always read and written as one
+aligned 8-byte word (never byte by byte), so it is never seen half-written.
+the writer issues no memory barriers: this relies on x86 keeping stores in
+order, and is not safe on weakly ordered cpus (arm). a reader in a compiled
+language must still keep its compiler from reordering the loads: read seq
+with acquire loads (e.g. __atomic_load_n(p, __ATOMIC_ACQUIRE)) and put an
+acquire fence before reading it the second time.
+
+a feed keeps its slot (slots are used in the order feeds first publish), so
+readers can cache where a feed is. siwa replaces the file when it restarts:
+a reader's mapping keeps the old one, see BoardReader.stale
+'''
+
+#stdlib
+import os
+import time
+import mmap
+import struct
+import tempfile
+import threading
+from pathlib import Path
+from collections import namedtuple
+
+#our stuff
+import constants as c
+
+MAGIC = b'SIWABRD1'
+VERSION = 1
+HEADER = struct.Struct('=8sIII')
+HEADER_SIZE = 64
+NAME_SIZE = 48
+SEQ_SIZE = 8
+FIELDS = struct.Struct(f'=qdddQ{NAME_SIZE}s')   #a slot after its seq
+SLOT_SIZE = SEQ_SIZE + FIELDS.size
+SPINS = 1000                            #reads of a slot being written before yielding to the writer
+MAX_RETRIES = 100000                    #before giving up
+
+Record = namedtuple('Record', 'name feed_id seq timestamp value source_time degraded')
+Record.__doc__ = ''' a feed's latest data point as read from the board; seq counts its updates '''
+
+
+class BoardError(Exception):
+    """Raised when a board file is missing, of another layout, or full"""
+    pass
+
+
+class Board:
+    ''' the writer: one per board file, in the siwa process '''
+
+    def __init__(self, path=c.BOARD_PATH, slots=c.BOARD_SLOTS):
+        self.path = Path(path)
+        self.slots = slots
+        self.size = HEADER_SIZE + slots * SLOT_SIZE
+        self.index = {}             #feed name -> slot
+        self.feeds = None           #the registry whose feeds are put on the board, see attach
+        self._lock = threading.Lock()
+        self._subscriptions = {}    #feed name -> (feed, callback)
+        self._written = {}          #feed name -> (data point, its source time) last written, see refresh
+        self._stop = threading.Event()
+        self._thread = None
+        #a new file, swapped in: readers of a previous one keep a valid (if stale) mapping
+        os.makedirs(self.path.parent, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=self.path.name, suffix='.tmp')
+        try:
+            os.chmod(tmp, 0o644)
+            os.ftruncate(fd, self.size)
+            self.mm = mmap.mmap(fd, self.size)
+            self._seqs = memoryview(self.mm).cast('Q')     #the slots' seqs, as whole words
+            HEADER.pack_into(self.mm, 0, MAGIC, VERSION, slots, SLOT_SIZE)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        finally:
+            os.close(fd)
+
+    def write(self, name, feed_id, dp):
+        ''' put a feed's data point on the board '''
+        with self._lock:
+            self._write(name, feed_id, dp)
+
+    def refresh(self, name, feed_id, dp):
+        ''' write a data point again if it is still the feed's latest on the board but its
+        source time moved since (see DataFeed.confirm) '''
+        with self._lock:
+            if self._written.get(name, (None,))[0] is dp and self._written[name][1] != dp.source_time:
+                self._write(name, feed_id, dp)
+
+    def _write(self, name, feed_id, dp):
+        ''' put a data point on the board; the caller holds the lock '''
+        try:
+            value = float(dp.value)
+        except (TypeError, ValueError):
+            value = float('nan')
+        slot = self.index.get(name)
+        if slot is None:
+            if len(name.encode()) > NAME_SIZE:
+                raise BoardError(f'{self.path}: feed name {name} is longer than {NAME_SIZE} bytes')
+            if len(self.index) >= self.slots:
+                raise BoardError(f'{self.path}: no free slot for {name}, all {self.slots} are used')
+            slot = self.index[name] = len(self.index)
+        offset = HEADER_SIZE + slot * SLOT_SIZE
+        seqs, word = self._seqs, offset // SEQ_SIZE
+        seq = seqs[word]
+        seqs[word] = seq + 1
+        source_time = dp.source_time
+        FIELDS.pack_into(self.mm, offset + SEQ_SIZE, feed_id, dp.timestamp, value,
+                         source_time, bool(dp.degraded), name.encode())
+        seqs[word] = seq + 2
+        self._written[name] = (dp, source_time)
+
+    def attach(self, feeds):
+        ''' keep the latest data point of every loaded feed of a registry (e.g. all_feeds.all_feeds)
+        on the board, checking for newly loaded feeds (and refreshed source times) every
+        BOARD_POLL_INTERVAL seconds '''
+        self.feeds = feeds
+        self.poll()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._poll_loop, daemon=True, name='board')
+        self._thread.start()
+        return self
+
+    def poll(self):
+        ''' subscribe to the feeds loaded since the last call, writing their latest data point;
+        rewrite those whose source time was refreshed since '''
+        for name, feed in self.feeds.loaded().items():
+            subscribed = self._subscriptions.get(name)
+            if subscribed is not None and subscribed[0] is feed:
+                if feed.DATAPOINT_DEQUE:
+                    self.refresh(name, feed.ID, feed.DATAPOINT_DEQUE[-1])
+                continue
+            if subscribed is not None:
+                subscribed[0].unsubscribe(subscribed[1])
+            callback = lambda dp, feed=feed: self.write(feed.NAME, feed.ID, dp)
+            feed.subscribe(callback)
+            self._subscriptions[name] = (feed, callback)
+            if feed.DATAPOINT_DEQUE:
+                self.write(name, feed.ID, feed.DATAPOINT_DEQUE[-1])
+
+    def _poll_loop(self):
+        while not self._stop.wait(c.BOARD_POLL_INTERVAL):
+            self.poll()
+
+    def close(self):
+        self._stop.set()
+        for feed, callback in self._subscriptions.values():
+            feed.unsubscribe(callback)
+        self._subscriptions = {}
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._seqs.release()
+        self.mm.close()
+
+
+class BoardReader:
+    ''' reads feeds' latest data points from a board file, e.g.
+        with BoardReader() as board:
+            board.read('btc_usd').value '''
+
+    def __init__(self, path=c.BOARD_PATH):
+        self.path = Path(path)
+        try:
+            with open(self.path, 'rb') as f:
+                self._inode = os.fstat(f.fileno()).st_ino
+                self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError) as e:
+            raise BoardError(f'{self.path}: no board ({e}), is siwa running with --board?')
+        if len(self.mm) < HEADER_SIZE:
+            raise BoardError(f'{self.path}: not a board')
+        magic, version, slots, slot_size = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION or slot_size != SLOT_SIZE \
+                or len(self.mm) < HEADER_SIZE + slots * slot_size:
+            raise BoardError(f'{self.path}: not a version {VERSION} board')
+        self.slots = slots
+        self._seqs = memoryview(self.mm).cast('Q')
+        self._index = {}            #feed name -> slot
+
+    def _read_slot(self, slot):
+        ''' the slot's seq and fields, consistent; None if unused '''
+        seqs, offset = self._seqs, HEADER_SIZE + slot * SLOT_SIZE
+        word = offset // SEQ_SIZE
+        for attempt in range(MAX_RETRIES):
+            seq = seqs[word]
+            if seq & 1 == 0:
+                fields = FIELDS.unpack_from(self.mm, offset + SEQ_SIZE)
+                if seqs[word] == seq:
+                    return (seq, *fields) if seq else None
+            if attempt >= SPINS:
+                time.sleep(0)       #the writer was preempted while writing: let it finish
+        raise BoardError(f'{self.path}: slot {slot} kept changing while read')
+
+    def _scan(self):
+        for slot in range(len(self._index), self.slots):
+            fields = self._read_slot(slot)
+            if fields is None:
+                break
+            self._index[fields[-1].rstrip(b'\0').decode()] = slot
+
+    def read(self, name):
+        ''' a feed's latest data point; raises KeyError if the feed is not on the board '''
+        slot = self._index.get(name)
+        if slot is None:
+            self._scan()
+            slot = self._index[name]
+        seq, feed_id, timestamp, value, source_time, degraded, _ = self._read_slot(slot)
+        return Record(name, feed_id, seq >> 1, timestamp, value, source_time, bool(degraded))
+
+    def names(self):
+        ''' the feeds on the board '''
+        self._scan()
+        return list(self._index)
+
+    def read_all(self):
+        return {name: self.read(name) for name in self.names()}
+
+    def stale(self):
+        ''' whether siwa replaced the board (restarted) since it was opened: then open a new reader.
+        unlike read, this makes a syscall '''
+        try:
+            return os.stat(self.path).st_ino != self._inode
+        except FileNotFoundError:
+            return True
+
+    def close(self):
+        self._seqs.release()
+        self.mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def serve(feeds, path=c.BOARD_PATH):
+    ''' keep the loaded feeds' latest data points on a board (see siwa.py --board) '''
+    return Board(path).attach(feeds)
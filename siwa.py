@@ -11,14 +11,32 @@ from datetime import datetime, timezone
 import cmd2
 
 #our stuff
-from all_feeds import all_feeds
+from all_feeds import all_feeds, available_feeds
+import attestation
 import constants as c
 import endpoint
+import feed_config
+import profiling
+import replication
+import shm_board
+import supervisor
 
 datafeed_threads = {}
+profilers = {}      #feed name or 'endpoint' -> running profiler, see profiling.py
+ENDPOINT = 'endpoint'
+replicate_address = None    #where to stream data points to followers, see replication.py
+worker_supervisor = None    #runs the feeds in worker processes with --workers, see supervisor.py
 
-endpoint_thread = threading.Thread(target=endpoint.run, daemon=True, kwargs={'all_feeds':all_feeds})
-endpoint_thread.start()
+def start_endpoint(port=c.ENDPOINT_PORT, server=c.HTTP_SERVER, workers=c.HTTP_WORKERS, board_path=c.BOARD_PATH):
+    ''' serve the http/json endpoint from a daemon thread, with waitress or (evented) with asgi.py '''
+    if server == 'asgi':
+        import asgi
+        endpoint_thread = threading.Thread(target=asgi.run, daemon=True, name='asgi',
+            kwargs={'all_feeds':all_feeds, 'port':port, 'workers':workers, 'board_path':board_path})
+    else:
+        endpoint_thread = threading.Thread(target=endpoint.run, daemon=True, kwargs={'all_feeds':all_feeds, 'port':port})
+    endpoint_thread.start()
+    return endpoint_thread
 
 def get_params():
     """
@@ -33,12 +51,83 @@ def get_params():
         help='List of datafeeds to start, separated by commas. Call like this: python siwa.py --datafeeds feed1 feed2 feed3'
     )
 
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=c.ENDPOINT_PORT,
+        help='Port of the http/json endpoint'
+    )
+
+    parser.add_argument(
+        '--server',
+        choices=['waitress', 'asgi'],
+        default=c.HTTP_SERVER,
+        help='Webserver of the http/json endpoint: waitress (threads) or asgi (evented, needs uvicorn, see asgi.py)'
+    )
+
+    parser.add_argument(
+        '--http-workers',
+        type=int,
+        default=c.HTTP_WORKERS,
+        help='With --server asgi: serve the endpoint from this many processes (reading the shared-memory board, --board is implied)'
+    )
+
+    parser.add_argument(
+        '--replicate',
+        metavar='ADDRESS',
+        help='Stream all data points to followers that connect to ADDRESS (port, host:port or unix socket path)'
+    )
+
+    parser.add_argument(
+        '--board',
+        nargs='?',
+        const=str(c.BOARD_PATH),
+        metavar='PATH',
+        help=f'Keep every feed\'s latest data point in a shared-memory board for local readers (see shm_board.py), default {c.BOARD_PATH}'
+    )
+
+    parser.add_argument(
+        '--attest',
+        action='store_true',
+        help=f'Sign a batch of the data points published every {c.ATTESTATION_INTERVAL}s, served at /attestation (see attestation.py); the key is read from ${c.ATTESTATION_KEY_ENV}, the address of the contract the batches are for from ${c.ATTESTATION_CONTRACT_ENV}'
+    )
+
+    parser.add_argument(
+        '--workers',
+        type=int,
+        help='Run the datafeeds in this many worker processes (see supervisor.py)'
+    )
+
+    parser.add_argument(
+        '--follow',
+        metavar='ADDRESS',
+        help='Run no feeds, serve (read-only) the data points replicated from the leader at ADDRESS (host:port or unix socket path)'
+    )
+
     args = parser.parse_args()
-    datafeeds = [all_feeds[f] for f in args.datafeeds]
-    return datafeeds
+    if args.follow and args.datafeeds:
+        parser.error('a follower runs no datafeeds, see the promote command')
+    if args.follow and args.workers:
+        parser.error('a follower runs no datafeeds, so has no workers')
+    if args.attest and not os.environ.get(c.ATTESTATION_KEY_ENV):
+        parser.error(f'--attest signs with the private key (hex) in the environment variable {c.ATTESTATION_KEY_ENV}, which is not set')
+    if args.attest and not os.environ.get(c.ATTESTATION_CONTRACT_ENV):
+        parser.error(f'--attest signs batches for the contract at the address in the environment variable {c.ATTESTATION_CONTRACT_ENV}, which is not set')
+    if args.http_workers > 1:
+        if args.server != 'asgi':
+            parser.error('--http-workers needs --server asgi')
+        if not args.board:
+            args.board = str(c.BOARD_PATH)
+    args.datafeeds = [all_feeds[f] for f in args.datafeeds]
+    return args
 
 def start_feeds(feeds):
     ''' start all feeds in feeds list '''
+    if worker_supervisor is not None:
+        for feed in feeds:
+            print(c.start_message(feed))
+        worker_supervisor.run([feed.NAME for feed in feeds])
+        return
     for feed in feeds:
         #(re)activate feed / allow it to start or resume processing
         feed.start()
@@ -54,10 +143,68 @@ def start_feeds(feeds):
 
 def stop_feeds(feeds):
     ''' stop *and kill thread for* all feeds in a list '''
+    if worker_supervisor is not None:
+        worker_supervisor.halt([feed.NAME for feed in feeds])
+        return
     for feed in feeds:
         feed.stop()
-        datafeed_threads[feed.NAME].join()
-        del(datafeed_threads[feed.NAME])
+        if feed.NAME in datafeed_threads:
+            datafeed_threads[feed.NAME].join()
+            del(datafeed_threads[feed.NAME])
+
+def start_profiler(target, mode='sample'):
+    ''' profile a feed or the endpoint;
+    mode 'sample' samples the target's threads, 'cprofile' profiles each
+    create_new_data_point call of a feed '''
+    if target in profilers:
+        raise ValueError(f'{target} is already being profiled')
+    if target == ENDPOINT:
+        if mode != 'sample':
+            raise ValueError('the endpoint can only be profiled by sampling')
+        profiler = profiling.SamplingProfiler(profiling.endpoint_thread_ids)
+    elif mode == 'cprofile':
+        profiler = profiling.FeedProfiler(all_feeds[target])
+    elif mode == 'sample':
+        thread_ids = lambda: [datafeed_threads[target].ident] if target in datafeed_threads else []
+        profiler = profiling.SamplingProfiler(thread_ids)
+    else:
+        raise ValueError(f'unknown profiling mode {mode}')
+    profiler.start()
+    profilers[target] = profiler
+    return profiler
+
+def dump_profiler(target, stop=False):
+    ''' write a profile (and stop profiling if stop); returns the file written '''
+    profiler = profilers[target]
+    if stop:
+        profiler.stop()
+        del profilers[target]
+    return profiler.dump(profiling.output_path(target, profiler.EXT))
+
+def apply_config_changes(changes):
+    ''' start / stop feed instances after the feed config was (re)loaded '''
+    for feed in changes.removed:
+        print(c.stop_message(feed))
+    #don't block the watcher until the removed feeds' heartbeats time out
+    threading.Thread(target=stop_feeds, args=(changes.removed,), daemon=True).start()
+    if replication.following() is None:
+        #a follower only serves what its leader's feeds publish
+        start_feeds([f for f in changes.to_start if not f.ACTIVE])
+    if worker_supervisor is not None:
+        #restart the workers of feeds whose parameters changed
+        worker_supervisor.rebalance()
+
+def promote(feeds=()):
+    ''' turn this follower into a leader: stop following, and start the feeds
+    (the given ones and those with `start = true`) on top of the replicated data points '''
+    replication.unfollow()
+    if replicate_address is not None:
+        replication.lead(all_feeds, replicate_address)
+    config_watcher.reload()
+    start_feeds([f for f in feeds if not f.ACTIVE])
+
+config_watcher = feed_config.ConfigWatcher(
+    c.FEEDS_CONFIG_PATH, all_feeds, available_feeds, on_change=apply_config_changes)
         
 class Siwa(cmd2.Cmd):
     ''' siwa CLI: allows user to start/stop datafeeds, list feed statuses '''
@@ -79,11 +226,32 @@ class Siwa(cmd2.Cmd):
         #if -v then shows params too
 
         self.poutput(c.init_time_message(self))
+        follower = replication.following()
+        if follower is not None:
+            lag = follower.lag()
+            self.poutput(f'following the leader at {follower.leader_address}, '
+                         + (f'last heard from {lag:.1f}s ago' if lag is not None else 'not connected yet'))
 
-        for feed in all_feeds.values():
+        for name in all_feeds:
+            if not all_feeds.is_loaded(name):
+                #don't import a feed just to report it never ran
+                self.poutput(c.unloaded_status_message(name, all_feeds.get_id(name)))
+                continue
+            feed = all_feeds[name]
             self.poutput(c.status_message(feed))
             self.poutput(f'{feed.NAME} deque len: {len(feed.DATAPOINT_DEQUE)}')
 
+        attester = attestation.attester()
+        if attester is not None and attester.batches:
+            batch = attester.batches[-1]
+            self.poutput(f'attesting as {attester.account.address}: round {batch.round} '
+                         f'signed {time.time() - batch.timestamp:.0f}s ago, {len(batch.entries)} feeds')
+
+        if worker_supervisor is not None:
+            for index, worker in sorted(worker_supervisor.workers.items()):
+                state = f'pid {worker.process.pid}' if worker.is_alive() else 'dead, restarting'
+                self.poutput(f'worker {index} ({state}): {", ".join(worker.specs)}')
+
         if c.DEBUG:
             threadcount = threading.active_count()
             datafeed_threadcount = threading.active_count() - 1 - 1 - c.WEBSERVER_THREADS
@@ -104,8 +272,21 @@ class Siwa(cmd2.Cmd):
             #else start all feeds
             feeds = all_feeds.values()
 
+        if replication.following() is not None:
+            self.perror('following a leader: feeds run on the leader (see promote)')
+            return
         start_feeds(feeds)
 
+    def do_promote(self, args: cmd2.Statement):
+        '''stop following the leader and run feeds here instead, e.g. after the leader died:
+        starts the specified feeds and those with `start = true` in feeds.toml,
+        continuing from the replicated data points (and streams to followers with --replicate)'''
+        if replication.following() is None:
+            self.perror('not following a leader')
+            return
+        promote([all_feeds[f] for f in args.arg_list])
+        self.poutput('promoted to leader')
+
     def do_stop(self, args: cmd2.Statement):
         '''stop datafeed processing
         (thread remains running in case we want to re-activate)'''
@@ -113,22 +294,91 @@ class Siwa(cmd2.Cmd):
             #stop specific feed, if given
             feeds = [all_feeds[f] for f in args.arg_list]
         else:
-            #else stop all active feeds
-            feeds = [f for f in all_feeds.values() if f.ACTIVE]
+            #else stop all active feeds (only loaded feeds can be active)
+            feeds = [f for f in all_feeds.loaded().values() if f.ACTIVE]
+            if worker_supervisor is not None:
+                feeds = [all_feeds[name] for name in worker_supervisor.names]
         for feed in feeds:
             self.poutput(c.stop_message(feed))
             stop_feeds([feed])
 
+    def do_reload(self, args: cmd2.Statement):
+        '''reload the feed config (feeds.toml) now;
+        it is also reloaded automatically whenever the file changes'''
+        if config_watcher.reload() is not None:
+            self.poutput(f'reloaded {c.FEEDS_CONFIG_PATH}')
+
+    def do_profile(self, args: cmd2.Statement):
+        '''profile a feed or the endpoint, writing flamegraph-compatible files to data/profiles:
+        profile start <feed|endpoint> [sample|cprofile]
+            sample (default): sample the stacks of the feed's / endpoint's threads (.folded)
+            cprofile: cProfile every create_new_data_point call of a feed (.prof)
+        profile dump [<feed|endpoint>]  write the profile(s) so far, keep profiling
+        profile stop [<feed|endpoint>]  stop profiling and write the profile(s)'''
+        command, *targets = args.arg_list or ['']
+        if command == 'start' and targets:
+            target, mode = targets[0], (targets[1:] or ['sample'])[0]
+            if target != ENDPOINT and target not in all_feeds:
+                self.perror(f'unknown feed {target}')
+                return
+            try:
+                start_profiler(target, mode)
+            except ValueError as e:
+                self.perror(str(e))
+                return
+            self.poutput(f'profiling {target} ({mode})')
+        elif command in ('dump', 'stop'):
+            for target in targets or list(profilers):
+                if target not in profilers:
+                    self.perror(f'{target} is not being profiled')
+                    continue
+                path = dump_profiler(target, stop=command == 'stop')
+                self.poutput(f'wrote {path}')
+        else:
+            self.perror('usage: profile start <feed|endpoint> [sample|cprofile] | profile dump [target] | profile stop [target]')
+
+    def do_rebalance(self, args: cmd2.Statement):
+        '''with --workers: re-split the running feeds over the worker processes,
+        over a new number of them if given (e.g. rebalance 4)'''
+        if worker_supervisor is None:
+            self.perror('not running workers (see --workers)')
+            return
+        workers = int(args.arg_list[0]) if args.arg_list else None
+        restarted = worker_supervisor.rebalance(workers)
+        self.poutput(f'restarted workers: {", ".join(map(str, restarted)) or "none"}')
+
     def do_quit(self,args: cmd2.Statement):
         """Exit the application"""
         self.poutput('quitting; waiting for heartbeat timeout')
-        for feed in all_feeds.values():
+        if worker_supervisor is not None:
+            worker_supervisor.stop()
+        for feed in all_feeds.loaded().values():
             feed.stop()
         return True
 
 if __name__ == '__main__':
     args = get_params()
-    if args:
-        start_feeds(args)
+    start_endpoint(args.port, args.server, args.http_workers, args.board)
+    replicate_address = args.replicate
+    if args.workers:
+        worker_supervisor = supervisor.Supervisor(all_feeds, args.workers).start()
+    if args.follow:
+        replication.follow(all_feeds, args.follow)
+    elif replicate_address is not None:
+        replication.lead(all_feeds, replicate_address)
+    if args.board:
+        shm_board.serve(all_feeds, args.board)
+    if args.attest:
+        try:
+            attestation.attest(all_feeds)
+        except attestation.AttestationError as e:
+            sys.exit(f'--attest: {e}')
+    #all_feeds already holds the config; this checks the params of the feeds with
+    #`start = true` (only theirs: the others aren't imported) and starts them (unless following)
+    if config_watcher.reload() is None:
+        sys.exit(f'fix the feed config {c.FEEDS_CONFIG_PATH} and restart')
+    config_watcher.start()
+    if args.datafeeds:
+        start_feeds(args.datafeeds)
     else:
         sys.exit(Siwa().cmdloop())
@@ -6,6 +6,11 @@ import time, logging, sqlite3
 
 #our stuff
 import constants as c
+import metrics
+
+SQLITE_WRITE_LATENCY = metrics.histogram(
+    'siwa_sqlite_write_seconds',
+    'latency of writes to sqlite, including connect and commit', ['table'])
 
 #NOTE: these db columns are named exactly the same as
 #the record.__dict__ keys to make it easy
@@ -30,11 +35,13 @@ class SQLite_Handler(logging.Handler):
         conn.commit()
         conn.close()
         self.propagate = False
+        self.write_latency = SQLITE_WRITE_LATENCY.labels('log')
 
     def emit(self, record):
         log_data = record.__dict__
-        conn = sqlite3.connect(c.LOGGING_PATH)
-        conn.execute(insert_log_line_sql, log_data)
-        conn.commit()
-        conn.close()
+        with self.write_latency.time():
+            conn = sqlite3.connect(c.LOGGING_PATH)
+            conn.execute(insert_log_line_sql, log_data)
+            conn.commit()
+            conn.close()
         return None
@@ -0,0 +1,250 @@
+''' module documentation:
+runs the feeds in worker processes, so they can use more than one core
+
+the supervisor (siwa.py --workers N) splits the feeds it runs into groups, a
+feed together with the feeds it is computed from (see DataFeed.inputs), and
+gives each group to a worker: the one in a feed's `worker` parameter, else one
+picked by a hash of the group's name. each worker is a process that runs its
+feeds as siwa does and sends every data point it publishes (and every source
+time it confirms) back over a queue; the supervisor publishes them on its own
+feeds (which don't run), so the endpoint serves them as usual.
+
+a worker that dies is restarted, after a delay that doubles while it keeps
+dying, its feeds continuing from the data points the supervisor holds.
+rebalance() re-splits the feeds (e.g. over a new number of workers, or after
+their parameters changed) and restarts only the workers whose feeds changed
+'''
+
+#stdlib
+import os
+import time
+import zlib
+import threading
+import multiprocessing
+
+#our stuff
+import constants as c
+import metrics
+import replication
+from feeds.data_feed import DataPoint
+
+WORKER_RESTARTS = metrics.counter(
+    'siwa_worker_restarts_total',
+    'worker processes restarted after they died', ['worker'])
+
+
+def groups(feeds, names):
+    ''' split the named feeds of a registry into the groups that have to run in one process:
+    each feed with the feeds it is (directly or not) computed from, which are added '''
+    parent = {}
+
+    def find(name):
+        while parent.setdefault(name, name) != name:
+            name = parent[name]
+        return name
+
+    pending, seen = list(names), set()
+    while pending:
+        name = pending.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        for input_name in feeds[name].inputs():
+            parent[find(input_name)] = find(name)
+            pending.append(input_name)
+    grouped = {}
+    for name in sorted(seen):
+        grouped.setdefault(find(name), set()).add(name)
+    return list(grouped.values())
+
+
+def worker_of(group, workers):
+    ''' the worker a group of feeds runs in if none is set; the same in every process (unlike hash()) '''
+    return zlib.crc32(min(group).encode()) % workers
+
+
+def assign(feeds, names, workers):
+    ''' worker index -> names of the feeds it runs, for the named feeds of a registry '''
+    assignment = {}
+    for group in groups(feeds, names):
+        explicit = [feeds[name].WORKER for name in sorted(group) if feeds[name].WORKER is not None]
+        index = explicit[0] % workers if explicit else worker_of(group, workers)
+        assignment.setdefault(index, set()).update(group)
+    return assignment
+
+
+def run_worker(specs, points, queue, stop):
+    ''' a worker process: run the feeds of specs ({name: FeedSpec}), continuing from points
+    ({name: [point, ...]}, see replication.to_point), and put every data point they publish
+    (or source time they confirm) on the queue, as replication messages, until stop is set '''
+    import all_feeds
+    registry = all_feeds.all_feeds      #rolling and composite feeds find their inputs there
+    for name, spec in specs.items():
+        registry.add(name, spec)
+    feeds = [registry[name] for name in specs]
+    for feed in feeds:
+        feed.DATAPOINT_DEQUE.extend(DataPoint(*point) for point in points.get(feed.NAME, ()))
+        feed.subscribe(
+            lambda dp, name=feed.NAME: queue.put({'op': 'publish', 'feed': name, 'point': replication.to_point(dp)}),
+            lambda dp, name=feed.NAME: queue.put({'op': 'confirm', 'feed': name, 'timestamp': dp.timestamp,
+                                                  'source_time': dp.source_time}))
+    for feed in feeds:
+        feed.start()
+        threading.Thread(target=feed.run, daemon=True, name=feed.NAME).start()
+    stop.wait()
+    for feed in feeds:
+        feed.stop()
+
+
+class Worker:
+    ''' a worker process and the feeds it runs '''
+
+    def __init__(self, index, specs):
+        self.index = index
+        self.specs = specs          #name -> FeedSpec
+        self.process = None
+        self.stop = None            #multiprocessing.Event that ends the process
+        self.started_at = None
+        self.crashes = 0            #deaths in a row, for the restart delay
+        self.restart_at = None      #unix time it is restarted at, while it is dead
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+
+class Supervisor:
+    ''' runs the feeds of a registry (e.g. all_feeds.all_feeds) in `workers` processes
+    (default: one per core), collecting their data points on the registry's feeds '''
+
+    def __init__(self, feeds, workers=None, context='spawn'):
+        self.feeds = feeds
+        self.size = workers or os.cpu_count()
+        self.names = set()          #feeds to run
+        self.workers = {}           #index -> Worker
+        self.context = multiprocessing.get_context(context)
+        self.queue = self.context.Queue()
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        self._stop.clear()
+        #the monitor is not a daemon: like feed threads, it keeps siwa running
+        self._threads = [threading.Thread(target=self._collect, daemon=True, name='supervisor-collect'),
+                         threading.Thread(target=self._monitor, name='supervisor-monitor')]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        ''' stop all workers '''
+        self._stop.set()
+        with self._lock:
+            for worker in self.workers.values():
+                self._stop_worker(worker)
+            self.workers = {}
+        self.queue.put(None)
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        self._threads = []
+
+    def run(self, names):
+        ''' run these feeds too (in the worker their group is assigned to) '''
+        with self._lock:
+            self.names.update(names)
+            self.rebalance()
+
+    def halt(self, names):
+        ''' stop running these feeds '''
+        with self._lock:
+            self.names.difference_update(names)
+            self.rebalance()
+
+    def rebalance(self, workers=None):
+        ''' re-split the feeds (over a new number of workers, if given): restarts the workers
+        whose feeds or feed parameters changed and stops those left without feeds;
+        returns the indices of the workers (re)started '''
+        with self._lock:
+            if workers:
+                self.size = workers
+            self.names = {name for name in self.names if name in self.feeds}
+            assignment = assign(self.feeds, self.names, self.size)
+            restarted = []
+            for index in sorted(set(self.workers) | set(assignment)):
+                specs = {name: self.feeds.specs[name] for name in sorted(assignment.get(index, ()))}
+                worker = self.workers.get(index)
+                if worker is not None and worker.specs == specs:
+                    continue
+                if worker is not None:
+                    self._stop_worker(worker)
+                    del self.workers[index]
+                if specs:
+                    self.workers[index] = self._start_worker(Worker(index, specs))
+                    restarted.append(index)
+            return restarted
+
+    def assignment(self):
+        ''' worker index -> names of the feeds it runs '''
+        return {index: list(worker.specs) for index, worker in self.workers.items()}
+
+    def _start_worker(self, worker):
+        #a (re)started worker continues from the data points collected so far
+        points = {name: [replication.to_point(dp) for dp in list(self.feeds[name].DATAPOINT_DEQUE)]
+                  for name in worker.specs}
+        worker.stop = self.context.Event()
+        worker.process = self.context.Process(
+            target=run_worker, args=(worker.specs, points, self.queue, worker.stop),
+            daemon=True, name=f'siwa-worker-{worker.index}')
+        worker.process.start()
+        worker.started_at = time.time()
+        return worker
+
+    def _stop_worker(self, worker):
+        if worker.process is None:
+            return
+        worker.stop.set()
+        worker.process.join(c.SUPERVISOR_STOP_TIMEOUT)
+        if worker.process.is_alive():
+            worker.process.terminate()
+            worker.process.join()
+
+    def _collect(self):
+        while True:
+            message = self.queue.get()
+            if message is None:
+                return
+            if message['feed'] not in self.feeds:
+                continue
+            feed = self.feeds[message['feed']]
+            if message['op'] == 'publish':
+                replication.replicate(feed, message['point'])
+            else:
+                replication.confirm(feed, message['timestamp'], message['source_time'])
+
+    def _monitor(self):
+        while not self._stop.wait(c.SUPERVISOR_CHECK_INTERVAL):
+            self.check()
+
+    def check(self, now=None):
+        ''' restart the workers that died (once their restart delay passed); returns their indices '''
+        now = time.time() if now is None else now
+        restarted = []
+        with self._lock:
+            for worker in self.workers.values():
+                if self._stop.is_set() or worker.is_alive():
+                    continue
+                if worker.restart_at is None:
+                    if now - worker.started_at > c.SUPERVISOR_MAX_RESTART_DELAY:
+                        worker.crashes = 0      #it ran fine for a while
+                    delay = min(c.SUPERVISOR_RESTART_DELAY * 2 ** worker.crashes, c.SUPERVISOR_MAX_RESTART_DELAY)
+                    worker.crashes += 1
+                    worker.restart_at = now + delay
+                    print(f'{c.WARNING}worker {worker.index} ({", ".join(worker.specs)}) died '
+                          f'(exit code {worker.process.exitcode}), restarting in {delay:g}s{c.ENDC}')
+                if now >= worker.restart_at:
+                    worker.restart_at = None
+                    WORKER_RESTARTS.labels(worker.index).inc()
+                    self._start_worker(worker)
+                    restarted.append(worker.index)
+        return restarted
@@ -0,0 +1,54 @@
+''' local stand-in for a ccxt.pro exchange, for tests and benchmarks;
+serves scripted tickers / order books to watch_ticker / watch_order_book,
+like a websocket that pushes an update every `interval` seconds '''
+
+import time
+import asyncio
+
+
+def ticker(bid, ask, volume=1., timestamp=None):
+    return {'bid': bid, 'ask': ask, 'last': (bid + ask) / 2, 'baseVolume': volume,
+            'timestamp': int((time.time() if timestamp is None else timestamp) * 1000)}
+
+
+def order_book(bid, ask, size=1.):
+    return {'bids': [[bid, size]], 'asks': [[ask, size]], 'timestamp': int(time.time() * 1000)}
+
+
+class ExchangeStub:
+    ''' updates are served in order, then the last one again every interval;
+    an Exception among them is raised instead, as a dropped connection '''
+
+    def __init__(self, name, updates, interval=.01):
+        self.name = name
+        self.updates = list(updates)
+        self.interval = interval
+        self.served = 0
+        self.closed = False
+
+    async def _next(self, symbol):
+        await asyncio.sleep(self.interval)
+        update = self.updates[min(self.served, len(self.updates) - 1)]
+        self.served += 1
+        if isinstance(update, Exception):
+            raise update
+        if isinstance(update, dict) and 'timestamp' in update:
+            update = dict(update, timestamp=int(time.time() * 1000))
+        return update
+
+    async def watch_ticker(self, symbol):
+        return await self._next(symbol)
+
+    async def watch_order_book(self, symbol, limit=None):
+        return await self._next(symbol)
+
+    async def close(self):
+        self.closed = True
+
+    def __repr__(self):
+        return f'ExchangeStub({self.name!r})'
+
+
+def factory(stubs):
+    ''' an EXCHANGE_FACTORY serving the given {name: ExchangeStub} '''
+    return lambda name: stubs[name]
@@ -0,0 +1,58 @@
+''' local json-rpc stand-in for an evm node, for tests and benchmarks;
+answers eth_call on latestAnswer() with per-address answers, and eth_blockNumber '''
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class RPCStub:
+
+    def __init__(self, answers=None, block_number=1):
+        self.answers = {k.lower(): v for k, v in (answers or {}).items()}
+        self.block_number = block_number
+        self.http_requests = 0
+        self.rpc_calls = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                stub.http_requests += 1
+                if isinstance(body, list):
+                    result = [stub.handle(request) for request in body]
+                else:
+                    result = stub.handle(body)
+                payload = json.dumps(result).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self.server.server_port}'
+
+    def handle(self, request):
+        self.rpc_calls.append(request)
+        response = {'jsonrpc': '2.0', 'id': request['id']}
+        method, params = request['method'], request.get('params', [])
+        if method == 'eth_blockNumber':
+            response['result'] = hex(self.block_number)
+        elif method == 'eth_call' and params[0]['to'].lower() in self.answers:
+            answer = self.answers[params[0]['to'].lower()]
+            response['result'] = '0x' + answer.to_bytes(32, 'big', signed=True).hex()
+        else:
+            response['error'] = {'code': -32000, 'message': 'execution reverted'}
+        return response
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,126 @@
+import json
+import time
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import constants as c
+import asgi
+import endpoint
+from shm_board import Board
+from feeds.data_feed import DataPoint
+from feeds.registry import FeedRegistry, FeedSpec
+
+
+def request(app, path, query='', method='GET'):
+    ''' (status, headers, body) of the app's answer to a request '''
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query.encode()}
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(app(scope, receive, send))
+    start, body = messages
+    return start['status'], dict(start['headers']), body['body']
+
+
+class TestApp(unittest.TestCase):
+
+    def setUp(self):
+        self.feeds = FeedRegistry({'test': FeedSpec(0, 'feeds.test_feed', 'Test')})
+        self.app = asgi.App(self.feeds)
+
+    def get_json(self, path, query=''):
+        status, headers, body = request(self.app, path, query)
+        self.assertEqual(headers[b'content-type'], b'application/json')
+        return status, json.loads(body)
+
+    def test_datafeed(self):
+        self.assertEqual(self.get_json('/datafeed/nope')[0], 404)
+        self.assertEqual(self.get_json('/datafeed/test')[0], 404)
+        now = time.time()
+        self.feeds['test'].publish(.5, timestamp=now - 5, source_time=now - 60)
+        status, data = self.get_json('/datafeed/test')
+        self.assertEqual(status, 200)
+        self.assertEqual(data[c.DATA_POINT], .5)
+        self.assertEqual(data[c.SOURCE_TIME], now - 60)
+        self.assertAlmostEqual(data[c.AGE], 60, delta=5)
+
+    def test_same_answers_as_flask(self):
+        self.feeds['test'].publish(.5, source_time=time.time() - 60)
+        endpoint.app.all_feeds = self.feeds
+        self.addCleanup(delattr, endpoint.app, 'all_feeds')
+        client = endpoint.app.test_client()
+        for path, query in [('/datafeed/test', 'max_age=120'), ('/datafeed/test', 'max_age=30'),
+                            ('/datafeed/test', 'max_age=soon'), ('/datafeed/nope', ''), ('/nope', '')]:
+            with self.subTest(path=path, query=query):
+                expected = client.get(f'{path}?{query}')
+                status, data = self.get_json(path, query)
+                self.assertEqual(status, expected.status_code)
+                if status != 200:
+                    data.pop('stack_trace', None)
+                    self.assertEqual(data, {k: v for k, v in expected.get_json().items() if k != 'stack_trace'})
+
+    def test_other_routes(self):
+        status, headers, body = request(self.app, '/metrics')
+        self.assertEqual(status, 200)
+        self.assertIn(b'siwa_http_request_seconds', body)
+        self.assertEqual(request(self.app, '/')[0], 200)
+        self.assertEqual(request(self.app, '/datafeed/test', method='POST')[0], 405)
+        status, headers, body = request(self.app, '/', method='HEAD')
+        self.assertEqual((status, body), (200, b''))
+        with patch.object(endpoint, 'read_logs', return_value=[[1, 'info', 'hello']]):
+            self.assertEqual(self.get_json('/logs'), (200, [[1, 'info', 'hello']]))
+
+    def test_lifespan(self):
+        messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(self.app({'type': 'lifespan'}, receive, send))
+        self.assertEqual(sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+
+
+class TestBoardFeeds(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = Path(self.dir.name) / 'board'
+        patcher = patch.object(c, 'BOARD_POLL_INTERVAL', 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_serve_from_board(self):
+        feeds = asgi.BoardFeeds(self.path)
+        app = asgi.App(feeds)
+        self.assertEqual(request(app, '/datafeed/test')[0], 404)    #no board yet
+        board = Board(self.path)
+        now = time.time()
+        board.write('test', 0, DataPoint(.5, now - 5, now - 60, True))
+        self.assertEqual(list(feeds), ['test'])
+        self.assertNotIn('nope', feeds)
+        status, headers, body = request(app, '/datafeed/test')
+        data = json.loads(body)
+        self.assertEqual(status, 200)
+        self.assertEqual((data[c.DATA_POINT], data[c.TIME_STAMP], data[c.DEGRADED]), (.5, now - 5, True))
+        self.assertAlmostEqual(data[c.AGE], 60, delta=5)
+
+        Board(self.path).write('test', 0, DataPoint(.6, now))       #siwa restarted
+        self.assertEqual(json.loads(request(app, '/datafeed/test')[2])[c.DATA_POINT], .6)
+        board.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
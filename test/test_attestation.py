@@ -0,0 +1,162 @@
+import time
+import unittest
+from unittest.mock import patch
+
+import constants as c
+import attestation
+import endpoint
+from attestation import Attester, AttestationError
+from feeds.data_feed import DataPoint
+from feeds.registry import FeedRegistry, FeedSpec
+
+KEY = '0x' + '11' * 32
+CONTRACT = '0x' + '22' * 20
+
+
+def decode(payload):
+    try:
+        from eth_abi import decode
+    except ImportError:     #eth-abi < 4
+        from eth_abi import decode_abi as decode
+    return decode(attestation.PAYLOAD_TYPES, payload)
+
+
+class TestMerkle(unittest.TestCase):
+
+    def test_every_leaf_proves(self):
+        for n in range(1, 8):
+            leaves = [attestation.keccak(bytes([i])) for i in range(n)]
+            levels = attestation.merkle_levels(leaves)
+            root = levels[-1][0]
+            for i, leaf in enumerate(leaves):
+                with self.subTest(n=n, i=i):
+                    self.assertTrue(attestation.verify(attestation.merkle_proof(levels, i), root, leaf))
+            if n > 1:
+                self.assertFalse(attestation.verify(attestation.merkle_proof(levels, 0), root, leaves[-1]))
+
+    def test_to_integer(self):
+        self.assertEqual(attestation.to_integer(1.1), 11 * 10**17)
+        self.assertEqual(attestation.to_integer(-2, decimals=2), -200)
+        for value in ['positive', None, float('nan'), float('inf')]:
+            self.assertIsNone(attestation.to_integer(value))
+
+
+class TestAttester(unittest.TestCase):
+
+    def setUp(self):
+        self.feeds = FeedRegistry({'usdc': FeedSpec(3, 'feeds.test_feed', 'Test'),
+                                   'dai': FeedSpec(6, 'feeds.test_feed', 'Test'),
+                                   'words': FeedSpec(9, 'feeds.test_feed', 'Test')})
+        for name in self.feeds:
+            self.feeds[name]
+        self.attester = Attester(self.feeds, key=KEY, contract=CONTRACT)
+        self.attester.poll()
+        self.addCleanup(self.attester.stop)
+
+    def test_sign_round(self):
+        now = time.time()
+        self.feeds['usdc'].publish(.999, now - 5, now - 60)
+        self.feeds['dai'].publish(1.5, now - 4)
+        self.feeds['dai'].publish(1.001, now - 3, degraded=True)
+        self.feeds['words'].publish('positive', now)
+        batch = self.attester.sign_round(now)
+        self.assertEqual((batch.round, batch.timestamp), (1, int(now)))
+        self.assertEqual(batch.names, ['usdc', 'dai'])
+        self.assertEqual(batch.entries, [(3, 999 * 10**15, int(now - 5), int(now - 60), False),
+                                         (6, 1001 * 10**15, int(now - 3), int(now - 4), True)])
+        self.assertEqual(attestation.recover(batch.payload, batch.signature), self.attester.account.address)
+        chain_id, contract, round, timestamp, root, entries = decode(batch.payload)
+        self.assertEqual((chain_id, contract.lower(), batch.contract.lower()), (c.CHAIN_IDS[c.ATTESTATION_CHAIN], CONTRACT, CONTRACT))
+        self.assertEqual((round, timestamp, root), (1, int(now), batch.root))
+        self.assertEqual([tuple(entry) for entry in entries], batch.entries)
+        for name in batch.names:
+            proof = batch.proof(name)
+            self.assertTrue(attestation.verify([bytes.fromhex(p[2:]) for p in proof['proof']], batch.root,
+                                               bytes.fromhex(proof['leaf'][2:])))
+        with self.assertRaises(AttestationError):
+            batch.proof('words')
+
+        self.assertIsNone(self.attester.sign_round())       #nothing published since
+        self.feeds['usdc'].publish(1., now + 1)
+        self.assertEqual(self.attester.sign_round().round, 2)
+        self.assertEqual(self.attester.batch(1), batch)
+        with self.assertRaises(AttestationError):
+            self.attester.batch(7)
+
+    def test_no_merkle_root(self):
+        attester = Attester(self.feeds, key=KEY, contract=CONTRACT, merkle=False)
+        attester.note('usdc', 3, DataPoint(1., 1000.))
+        batch = attester.sign_round()
+        self.assertEqual(batch.root, attestation.EMPTY_ROOT)
+        with self.assertRaises(AttestationError):
+            batch.proof('usdc')
+
+    def test_no_key(self):
+        with patch.dict('os.environ', {c.ATTESTATION_KEY_ENV: '', c.ATTESTATION_CONTRACT_ENV: CONTRACT}):
+            with self.assertRaises(AttestationError):
+                Attester(self.feeds)
+
+    def test_no_contract(self):
+        for contract in ['', 'positive', '0x1234']:
+            with self.subTest(contract=contract), patch.dict('os.environ', {c.ATTESTATION_CONTRACT_ENV: contract}):
+                with self.assertRaises(AttestationError):
+                    Attester(self.feeds, key=KEY)
+
+    def test_domain(self):
+        # the same data points signed for another contract or chain are another payload
+        now = time.time()
+        other = Attester(self.feeds, key=KEY, contract='0x' + '33' * 20)
+        elsewhere = Attester(self.feeds, key=KEY, contract=CONTRACT, chain_id=1)
+        for attester in [self.attester, other, elsewhere]:
+            attester.note('usdc', 3, DataPoint(1., now))
+        payloads = {attester.sign_round(now).payload for attester in [self.attester, other, elsewhere]}
+        self.assertEqual(len(payloads), 3)
+
+    def test_shared_feed_ids(self):
+        feeds = FeedRegistry({'usdc': FeedSpec(3, 'feeds.test_feed', 'Test'),
+                              'other': FeedSpec(3, 'feeds.test_feed', 'Test')})
+        feeds['usdc']
+        attester = Attester(feeds, key=KEY, contract=CONTRACT)
+        attester.poll()
+        feeds['other']
+        with self.assertRaises(AttestationError):
+            attester.poll()
+        attester.note('usdc', 3, DataPoint(1., 1000.))
+        attester.note('other', 3, DataPoint(2., 1000.))
+        with self.assertRaises(AttestationError):
+            attester.sign_round()
+        self.assertEqual(attester.round, 0)
+        attester.stop()
+
+
+class TestAttestationRoutes(unittest.TestCase):
+
+    def setUp(self):
+        self.client = endpoint.app.test_client()
+        self.feeds = FeedRegistry({'usdc': FeedSpec(3, 'feeds.test_feed', 'Test')})
+        self.feeds['usdc']
+
+    def tearDown(self):
+        attestation._running.clear()
+
+    def test_routes(self):
+        self.assertEqual(self.client.get('/attestation').status_code, 404)
+        attester = attestation._running['attester'] = Attester(self.feeds, key=KEY, contract=CONTRACT)
+        attester.poll()
+        self.assertEqual(self.client.get('/attestation').status_code, 404)     #no round yet
+        self.feeds['usdc'].publish(1.25, 1000.)
+        batch = attester.sign_round()
+        data = self.client.get('/attestation').get_json()
+        self.assertEqual((data['signer'], data['contract']), (attester.account.address, attester.contract))
+        self.assertEqual(data['payload'], '0x' + batch.payload.hex())
+        self.assertEqual(data['feeds']['usdc']['value'], 125 * 10**16)
+        self.assertEqual(self.client.get('/attestation?round=1').get_json(), data)
+        self.assertEqual(self.client.get('/attestation?round=2').status_code, 404)
+        self.assertEqual(self.client.get('/attestation?round=last').status_code, 400)
+        proof = self.client.get('/attestation/proof/usdc').get_json()
+        self.assertEqual((proof['merkle_root'], proof['proof']), (data['merkle_root'], []))
+        self.assertEqual(self.client.get('/attestation/proof/dai').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
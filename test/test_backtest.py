@@ -0,0 +1,64 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+import constants as c
+import dataset
+from backtest import Backtest, ReplaySeries
+from feeds import test_feed
+from feeds.gauss import gauss
+from feeds.crypto_indices import mcap1000
+
+ETH_USD = c.DATA_PATH / 'ETH-USD_2022-01-01-00-00_2022-03-01-00-00_300secs'
+
+
+class TestBacktest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_replay_series_as_of(self):
+        series = ReplaySeries([10, 20, 30], [1, 2, 3])
+        self.assertIsNone(series.at(5))
+        self.assertEqual(series.at(10), 1)
+        self.assertEqual(series.at(29.9), 2)
+        self.assertEqual(series.at(100), 3)
+
+    def test_gauss_replay_is_deterministic(self):
+        source = ReplaySeries.from_dataset(ETH_USD)
+        feed = gauss.Gauss()
+        day = source.start + 24 * 60 * 60
+        first = Backtest(feed, source, end=day, seed=1).run(output=self.dir / 'gauss')
+        second = Backtest(gauss.Gauss, source, end=day, seed=1).run()
+        self.assertEqual(len(first), 24 * 60 * 60 // gauss.Gauss.HEARTBEAT + 1)
+        np.testing.assert_array_equal(first.to_numpy(), second.to_numpy())
+        #gauss moves ~PERCENT around the on-chain (here: recorded) value
+        self.assertLess(abs(first.iloc[0] / source.at(source.start) - 1), .1)
+
+        saved = dataset.load(self.dir / 'gauss')
+        self.assertEqual(saved.meta['feed'], gauss.Gauss.NAME)
+        np.testing.assert_array_equal(saved[c.DATA_POINT], first.to_numpy())
+        #the feed's own state and source are left alone
+        self.assertEqual(len(feed.DATAPOINT_DEQUE), 0)
+        self.assertNotIn('get_latest_source_data', vars(feed))
+
+    def test_mcap1000_replay_from_api_payloads(self):
+        payload = lambda mcap: [{'name': 'Bitcoin', 'last_updated': '2023-06-01T10:10:10.000Z', 'market_cap': mcap}]
+        api_sources = {'coingecko': ReplaySeries([0, 360], [payload(100.), payload(200.)])}
+        series = Backtest(mcap1000.MCAP1000, api_sources=api_sources, end=540).run()
+        self.assertListEqual(series.tolist(), [100., 100., 200., 200.])
+
+    def test_feed_without_source(self):
+        series = Backtest(test_feed.Test, start=0, end=9, seed=0).run()
+        np.random.seed(0)
+        np.testing.assert_array_equal(series.to_numpy(), np.random.rand(10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+#stdlib
+import contextlib
+import unittest
+
+#our stuff
+from benchmarks import harness
+from benchmarks import bench_hotpaths
+
+
+class TestHarness(unittest.TestCase):
+
+    def test_compare(self):
+        baselines = {'machine': None, 'results': {'a': 1., 'b': 1.}}
+        results = {'a': 1.2, 'b': 1.5, 'new': 9.}
+        self.assertEqual(harness.compare(results, baselines, tolerance=.3), {'b': (1.5, 1.)})
+
+    def test_time_call(self):
+        seconds, number = harness.time_call(lambda: None, repeat=1)
+        self.assertGreater(number, 1)
+        self.assertLess(seconds, .01)
+
+    def test_baselines_cover_all_benchmarks(self):
+        self.assertEqual(set(harness.BENCHMARKS), set(harness.load_baselines()['results']))
+
+
+class TestHotPathBenchmarks(unittest.TestCase):
+
+    def test_benchmarks_run_offline(self):
+        ''' every benchmark sets up and runs once without network or api keys '''
+        for name, setup in harness.BENCHMARKS.items():
+            with self.subTest(name), contextlib.ExitStack() as stack:
+                setup(stack)()
+
+
+if __name__ == '__main__':
+    unittest.main()
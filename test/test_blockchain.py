@@ -1,7 +1,11 @@
 import unittest
+import threading
+from unittest.mock import patch
 import constants as c
 from datetime import datetime, timedelta
-from blockchain import Translucent
+import blockchain
+from blockchain import Translucent, ChainProvider, ChainReadError, RPCEndpoint
+from test.rpc_stub import RPCStub
 
 
 class TestTask(unittest.TestCase):
@@ -19,6 +23,82 @@ class TestTask(unittest.TestCase):
     def tearDownClass(cls):
         ...
 
+
+class TestChainProvider(unittest.TestCase):
+
+    GAUSS = c.TRANSLUCENT_GAUSS_ARBITRUM_GOERLI
+    OTHER = '0x0000000000000000000000000000000000000001'
+    DEAD_URL = 'http://127.0.0.1:9'
+
+    def test_concurrent_reads_share_one_batch_request(self):
+        with RPCStub({self.GAUSS: 4200, self.OTHER: -7}) as stub:
+            provider = ChainProvider(c.ARBITRUM_GOERLI, [stub.url], window=.2)
+            results = {}
+            def read(address):
+                results[address] = provider.latest_answer(address)
+            threads = [threading.Thread(target=read, args=(a,)) for a in [self.GAUSS, self.OTHER, self.GAUSS]]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(results, {self.GAUSS: 4200, self.OTHER: -7})
+        self.assertEqual(stub.http_requests, 1)
+        #the duplicate gauss read is merged into the same call
+        self.assertEqual(len(stub.rpc_calls), 2)
+
+    def test_errors_are_per_read(self):
+        with RPCStub({self.GAUSS: 1}) as stub:
+            reader = ChainProvider(c.ARBITRUM_GOERLI, [stub.url], window=None).reader
+            good = reader.submit('eth_call', [{'to': self.GAUSS, 'data': c.LATEST_ANSWER_SELECTOR}, 'latest'])
+            bad = reader.submit('eth_call', [{'to': self.OTHER, 'data': c.LATEST_ANSWER_SELECTOR}, 'latest'])
+            reader.flush()
+        self.assertEqual(int(good.result(), 16), 1)
+        self.assertRaises(ChainReadError, bad.result)
+
+    def test_latest_answer_reused_for_a_block_time(self):
+        with RPCStub({self.GAUSS: 5}) as stub:
+            provider = ChainProvider(c.ARBITRUM_GOERLI, [stub.url], block_time=60, window=0)
+            self.assertEqual(provider.latest_answer(self.GAUSS), 5)
+            self.assertEqual(provider.latest_answer(self.GAUSS), 5)
+            #one round trip, at the latest block
+            self.assertEqual([r['method'] for r in stub.rpc_calls], ['eth_call'])
+            self.assertEqual(stub.rpc_calls[0]['params'][1], 'latest')
+
+            provider.block_time = 0
+            provider.latest_answer(self.GAUSS)
+            self.assertEqual(len(stub.rpc_calls), 2)
+
+    def test_no_urls(self):
+        with self.assertRaises(ChainReadError):
+            ChainProvider(c.ARBITRUM_GOERLI, []).post([])
+
+    def test_failover_and_latency_ranking(self):
+        with RPCStub({self.GAUSS: 3}) as stub:
+            provider = ChainProvider(c.ARBITRUM_GOERLI, [self.DEAD_URL, stub.url], window=0)
+            self.assertEqual(provider.latest_answer(self.GAUSS), 3)
+            dead, alive = provider.endpoints
+            self.assertGreater(dead.down_until, 0)
+            self.assertIs(provider.ranked_endpoints()[0], alive)
+
+        fast, slow = RPCEndpoint('http://fast'), RPCEndpoint('http://slow')
+        fast.latency, slow.latency = .01, .5
+        provider.endpoints = [slow, fast]
+        self.assertEqual(provider.ranked_endpoints(), [fast, slow])
+
+    def test_providers_are_lazy(self):
+        with patch.dict(blockchain._providers, clear=True):
+            self.assertEqual(blockchain._providers, {})
+            provider = blockchain.get_provider(c.ARBITRUM_GOERLI)
+            self.assertIs(blockchain.get_provider(c.ARBITRUM_GOERLI), provider)
+            self.assertIsNone(provider._web3)
+
+    def test_gauss_reads_through_provider(self):
+        with RPCStub({self.GAUSS: 100}) as stub:
+            with patch.dict(c.RPC_URLS, {c.ARBITRUM_GOERLI: [stub.url]}), patch.dict(blockchain._providers, clear=True):
+                from feeds.gauss import gauss
+                self.assertEqual(gauss.Gauss().get_latest_source_data(), 100)
+
+
 if __name__ == '__main__':
     unittest.main()
 
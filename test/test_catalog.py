@@ -0,0 +1,215 @@
+import os
+import json
+import gzip
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import requests
+
+import constants as c
+from apis import replay
+from apis.catalog import CatalogCache
+from apis.coingecko import CoinGeckoAPI
+from feeds.crypto_indices.dogcoins import DogCoins
+
+COINS = [{"id": "btc-bitcoin", "name": "Bitcoin", "symbol": "BTC", "rank": 1, "is_active": True},
+         {"id": "eth-ethereum", "name": "Ethereum", "symbol": "ETH", "rank": 2, "is_active": True}]
+URL = "https://api.coinpaprika.com/v1/coins"
+
+
+def response(status_code, body=None, headers=None):
+    r = requests.Response()
+    r.status_code = status_code
+    r.headers.update(headers or {})
+    r._content = json.dumps(body).encode() if body is not None else b''
+    r._content_consumed = True
+    return r
+
+
+class FakeTransport:
+    """serves the coin list with an ETag, then 304 Not Modified while the request carries it"""
+
+    def __init__(self, coins=COINS, etag='"v1"'):
+        self.coins = coins
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        self.requests.append(dict(headers or {}))
+        if self.coins is None:
+            raise requests.exceptions.ConnectionError("offline")
+        if (headers or {}).get('If-None-Match') == self.etag:
+            return response(304)
+        return response(200, self.coins, {'ETag': self.etag, 'Last-Modified': 'Mon, 01 May 2023 12:00:00 GMT'})
+
+
+class TestCatalogCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.dir.name) / 'coinpaprika.json.gz'
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def catalog(self, **kwargs):
+        return CatalogCache('coinpaprika', URL, ("id", "rank"), path=self.path, refresh_interval=0, **kwargs)
+
+    def test_download_projects_fields(self):
+        with replay.installed(FakeTransport()):
+            rows = self.catalog().get()
+        self.assertEqual(rows, [{"id": "btc-bitcoin", "rank": 1}, {"id": "eth-ethereum", "rank": 2}])
+
+    def test_conditional_revalidation(self):
+        transport = FakeTransport()
+        catalog = self.catalog()
+        with replay.installed(transport):
+            catalog.get()
+            self.assertFalse(catalog.refresh())
+        self.assertEqual(transport.requests[0], {})
+        self.assertEqual(transport.requests[1], {'If-None-Match': '"v1"',
+                                                 'If-Modified-Since': 'Mon, 01 May 2023 12:00:00 GMT'})
+        self.assertEqual(len(catalog.get()), 2)
+
+    def test_not_modified_only_touches_file(self):
+        transport = FakeTransport()
+        catalog = self.catalog()
+        with replay.installed(transport):
+            catalog.get()
+            saved = self.path.read_bytes()
+            os.utime(self.path, (1000., 1000.))
+            with patch.object(CatalogCache, 'save') as save:
+                self.assertFalse(catalog.refresh())
+            save.assert_not_called()
+        self.assertEqual(self.path.read_bytes(), saved)
+        self.assertAlmostEqual(self.path.stat().st_mtime, catalog.fetched_at, places=3)
+        loaded = self.catalog()
+        self.assertTrue(loaded.load())
+        self.assertAlmostEqual(loaded.fetched_at, catalog.fetched_at, places=3)
+
+    def test_changed_list(self):
+        transport = FakeTransport()
+        catalog = self.catalog()
+        with replay.installed(transport):
+            catalog.get()
+            transport.coins, transport.etag = COINS[:1], '"v2"'
+            self.assertTrue(catalog.refresh())
+        self.assertEqual(catalog.get(), [{"id": "btc-bitcoin", "rank": 1}])
+        self.assertEqual(catalog.etag, '"v2"')
+
+    def test_loaded_from_disk(self):
+        with replay.installed(FakeTransport()):
+            self.catalog().get()
+        with gzip.open(self.path) as f:
+            self.assertEqual(json.loads(f.read())['etag'], '"v1"')
+        transport = FakeTransport(coins=None)
+        with replay.installed(transport):
+            self.assertEqual(len(self.catalog().get()), 2)
+        self.assertEqual(transport.requests, [])
+
+    def test_other_fields_not_loaded(self):
+        with replay.installed(FakeTransport()):
+            self.catalog().get()
+        catalog = CatalogCache('coinpaprika', URL, ("id",), path=self.path, refresh_interval=0)
+        self.assertFalse(catalog.load())
+
+    def test_keeps_list_when_offline(self):
+        catalog = self.catalog()
+        with replay.installed(FakeTransport()):
+            catalog.get()
+        with replay.installed(FakeTransport(coins=None)):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                catalog.refresh()
+            self.assertEqual(len(catalog.get()), 2)
+
+    def test_no_list_offline(self):
+        with replay.installed(FakeTransport(coins=None)):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                self.catalog().get()
+
+    def test_html_body(self):
+        page = response(200)
+        page._content = b'<html>rate limited</html>'
+        transport = FakeTransport()
+        transport.get = lambda url, **kwargs: page
+        for stream in [True, False]:
+            with self.subTest(stream=stream), replay.installed(transport):
+                with self.assertRaises(requests.exceptions.RequestException):
+                    self.catalog(stream=stream).get()
+
+    def test_stream_matches_full_decode(self):
+        rows = {}
+        for stream in [True, False]:
+            with replay.installed(FakeTransport()):
+                rows[stream] = CatalogCache('coinpaprika', URL, path=None, refresh_interval=0, stream=stream).get()
+        self.assertEqual(rows[True], rows[False])
+        self.assertEqual(rows[True], COINS)
+
+    def test_values(self):
+        with replay.installed(FakeTransport()):
+            catalog = self.catalog()
+            self.assertEqual(catalog.values("id"), {"btc-bitcoin", "eth-ethereum"})
+
+    def test_background_refresh(self):
+        transport = FakeTransport()
+        catalog = CatalogCache('coinpaprika', URL, path=None, refresh_interval=.01)
+        with replay.installed(transport):
+            catalog.get()
+            try:
+                for _ in range(500):
+                    if len(transport.requests) >= 3:
+                        break
+                    catalog._stop.wait(.01)
+            finally:
+                catalog.stop()
+        self.assertGreaterEqual(len(transport.requests), 3)
+        self.assertIn('If-None-Match', transport.requests[-1])
+
+
+QUOTES = [{"id": c.DOGE, "current_price": .07, "market_cap": 1e10},
+          {"id": c.SHIBA, "current_price": 1e-5, "market_cap": 5e9}]
+
+
+class QuotesTransport:
+    def __init__(self, ids):
+        self.ids = ids
+        self.params = []
+
+    def get(self, url, params=None, **kwargs):
+        if url == CoinGeckoAPI.COINS_LIST_URL:
+            return response(200, [{"id": coin_id, "symbol": "x", "name": "x"} for coin_id in self.ids])
+        self.params.append(params)
+        requested = params["ids"].split(",")
+        return response(200, [quote for quote in QUOTES if quote["id"] in requested])
+
+
+class TestCoinGeckoQuotes(unittest.TestCase):
+    def api(self):
+        return CoinGeckoAPI(CatalogCache('coingecko', CoinGeckoAPI.COINS_LIST_URL, ("id",),
+                                         path=None, refresh_interval=0))
+
+    def test_only_requested_coins(self):
+        transport = QuotesTransport([c.DOGE, c.SHIBA, c.BABYDOGE])
+        with replay.installed(transport):
+            quotes = self.api().get_quotes([c.DOGE, c.SHIBA])
+        self.assertEqual(set(quotes), {c.DOGE, c.SHIBA})
+        self.assertEqual(transport.params[0]["ids"], f"{c.DOGE},{c.SHIBA}")
+        self.assertEqual(transport.params[0]["per_page"], 2)
+
+    def test_unknown_ids_dropped(self):
+        transport = QuotesTransport([c.DOGE])
+        with replay.installed(transport):
+            quotes = self.api().get_quotes([c.DOGE, 'no-such-coin'])
+        self.assertEqual(transport.params[0]["ids"], c.DOGE)
+        self.assertEqual(set(quotes), {c.DOGE})
+
+    def test_dogcoins_sums_market_caps(self):
+        transport = QuotesTransport(DogCoins.CGECKO_IDS)
+        with replay.installed(transport), \
+                patch('apis.coingecko.CoinGeckoAPI', self.api):
+            self.assertEqual(DogCoins().create_new_data_point(), 1.5e10)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import unittest
+from unittest.mock import patch
+
+import requests
+
+from apis import circuit, utils
+from apis.utils import MissingDataException
+from feeds.crypto_indices.mcap1000 import MCAP1000
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self):
+        return self.now
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.breaker = circuit.CircuitBreaker('test', failure_threshold=3, reset_timeout=10,
+                                              max_reset_timeout=25, clock=self.clock)
+
+    def fail(self, times):
+        for _ in range(times):
+            self.assertTrue(self.breaker.allow())
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.fail(2)
+        self.breaker.record_success()
+        self.fail(2)
+        self.assertEqual(self.breaker.state, circuit.CLOSED)
+        self.fail(1)
+        self.assertEqual(self.breaker.state, circuit.OPEN)
+        self.assertFalse(self.breaker.allow())
+        self.assertFalse(self.breaker.available())
+
+    def test_half_open_trial(self):
+        self.fail(3)
+        self.clock.now = 10.
+        self.assertEqual(self.breaker.state, circuit.HALF_OPEN)
+        self.assertTrue(self.breaker.available())
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())     # only one trial
+        self.assertFalse(self.breaker.available())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, circuit.CLOSED)
+
+    def test_backoff_doubles_up_to_max(self):
+        self.fail(3)
+        for now, timeout in [(10., 20), (30., 25), (55., 25)]:
+            self.clock.now = now
+            self.fail(1)                            # the trial fails
+            self.assertEqual(self.breaker.reset_timeout, timeout)
+            self.assertEqual(self.breaker.state, circuit.OPEN)
+        self.clock.now = 80.
+        self.fail(0)
+        self.assertTrue(self.breaker.allow())
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.reset_timeout, 10)
+
+
+class API:
+    source = 'test_circuit_source'
+
+    def __init__(self, error=None):
+        self.error = error
+        self.calls = 0
+
+    @utils.handle_request_errors
+    def get_data(self, N):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return [N]
+
+
+class TestHandleRequestErrors(unittest.TestCase):
+
+    def tearDown(self):
+        circuit.reset()
+
+    def test_open_circuit_skips_requests(self):
+        api = API(requests.exceptions.ConnectionError('down'))
+        results = [api.get_data(1) for _ in range(10)]
+        self.assertEqual(results, [None] * 10)
+        self.assertEqual(api.calls, 3)
+        self.assertEqual(circuit.breaker(API.source).state, circuit.OPEN)
+
+    def test_missing_data_handled(self):
+        api = API(MissingDataException('no RAW data'))
+        self.assertIsNone(api.get_data(1))
+        self.assertEqual(circuit.breaker(API.source).failures, 1)
+
+    def test_other_errors_not_counted(self):
+        api = API(KeyError('price'))
+        for _ in range(5):
+            with self.assertRaises(KeyError):
+                api.get_data(1)
+        self.assertEqual(api.calls, 5)
+        self.assertEqual(circuit.breaker(API.source).failures, 0)
+        self.assertEqual(circuit.breaker(API.source).state, circuit.CLOSED)
+
+    def test_other_error_ends_trial(self):
+        api = API(requests.exceptions.ConnectionError('down'))
+        for _ in range(3):
+            api.get_data(1)
+        breaker = circuit.breaker(API.source)
+        breaker.opened_at -= breaker.reset_timeout     #half-open
+        api.error = KeyError('price')
+        with self.assertRaises(KeyError):
+            api.get_data(1)
+        api.error = None
+        self.assertEqual(api.get_data(1), [1])      #the next request is the trial
+        self.assertEqual(breaker.state, circuit.CLOSED)
+
+    def test_success_closes(self):
+        api = API(requests.exceptions.ConnectionError('down'))
+        api.get_data(1)
+        api.error = None
+        self.assertEqual(api.get_data(1), [1])
+        self.assertEqual(circuit.breaker(API.source).failures, 0)
+
+
+class TestMCAP1000(unittest.TestCase):
+
+    def tearDown(self):
+        circuit.reset()
+
+    @patch('apis.crypto_api.CryptoAPI.get_api_key', lambda self, name: 'test')
+    def test_open_sources_dropped(self):
+        called = []
+
+        def fetch_data_by_mcap(api, N):
+            called.append(api.source)
+            return {float(len(called)): {'name': 'Coin', 'last_updated': 0}}
+
+        for source in ['cryptocompare', 'coinmarketcap']:
+            breaker = circuit.breaker(source)
+            for _ in range(breaker.failure_threshold):
+                breaker.record_failure()
+        with patch('apis.crypto_api.CryptoAPI.fetch_data_by_mcap', fetch_data_by_mcap):
+            self.assertEqual(MCAP1000().create_new_data_point(), 1.)
+        self.assertEqual(called, ['coingecko'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,145 @@
+import unittest
+
+from feeds import composite, test_feed
+from feeds.composite import CompositeFeed, FeedGraph, GraphError
+
+
+class Sum(CompositeFeed):
+    NAME = 'sum'
+    ID = -1
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.recomputed = 0
+
+    def combine(self, values):
+        self.recomputed += 1
+        return sum(values.values())
+
+
+class TestFeedGraph(unittest.TestCase):
+
+    def setUp(self):
+        self.feeds = {name: test_feed.Test(name=name) for name in ['a', 'b', 'c']}
+        self.graph = FeedGraph(self.feeds)
+
+    def composite(self, name, inputs):
+        feed = self.feeds[name] = Sum(name=name, INPUTS=inputs)
+        feed.attach(self.graph)
+        return feed
+
+    def test_recomputed_when_inputs_publish(self):
+        ab = self.composite('ab', ['a', 'b'])
+        self.feeds['a'].publish(1.)
+        self.assertEqual(len(ab.DATAPOINT_DEQUE), 0)    #b has no value yet
+        self.feeds['b'].publish(2.)
+        self.assertEqual(ab.DATAPOINT_DEQUE[-1].value, 3.)
+        self.feeds['c'].publish(5.)                     #not an input
+        self.assertEqual(ab.recomputed, 1)
+
+    def test_topological_order_without_glitches(self):
+        #diamond: a -> ab, a -> ac, (ab, ac) -> top, and a -> top directly
+        ab = self.composite('ab', ['a', 'b'])
+        ac = self.composite('ac', ['a', 'c'])
+        top = self.composite('top', ['ab', 'ac', 'a'])
+        self.assertEqual([f.NAME for f in self.graph.order][-1], 'top')
+        self.feeds['b'].publish(1.)
+        self.feeds['c'].publish(1.)
+        self.assertEqual(self.graph.propagate('a'), [])  #a has no value: nothing computable
+        self.feeds['a'].publish(1.)
+        self.assertEqual(top.DATAPOINT_DEQUE[-1].value, 2. + 2. + 1.)
+        self.assertEqual(top.recomputed, 1)             #once, after both ab and ac
+        self.feeds['a'].publish(2.)
+        self.assertEqual(top.DATAPOINT_DEQUE[-1].value, 3. + 3. + 2.)
+        self.assertEqual((ab.recomputed, ac.recomputed, top.recomputed), (2, 2, 2))
+        self.feeds['b'].publish(2.)                     #ac is not downstream of b
+        self.assertEqual((ab.recomputed, ac.recomputed, top.recomputed), (3, 2, 3))
+
+    def test_order_independent_of_start_order(self):
+        for name, inputs in [('top', ['ab', 'a']), ('ab', ['a', 'b'])]:
+            self.feeds[name] = Sum(name=name, INPUTS=inputs)
+        self.feeds['top'].attach(self.graph)
+        self.feeds['ab'].attach(self.graph)
+        self.assertEqual([f.NAME for f in self.graph.order], ['ab', 'top'])
+        self.assertNotIn('ab', self.graph._subscriptions)
+        self.feeds['b'].publish(1.)
+        self.feeds['a'].publish(1.)
+        self.assertEqual(self.feeds['top'].DATAPOINT_DEQUE[-1].value, 3.)
+        self.assertEqual(self.feeds['top'].recomputed, 1)
+
+    def test_freshness_of_inputs(self):
+        ab = self.composite('ab', ['a', 'b'])
+        self.feeds['a'].publish(1., source_time=100.)
+        self.feeds['b'].publish(1., source_time=200.)
+        dp = ab.DATAPOINT_DEQUE[-1]
+        self.assertEqual((dp.source_time, dp.degraded), (100., False))
+        self.feeds['b'].last_good_value()
+        self.feeds['b'].publish(1.)
+        self.assertTrue(ab.DATAPOINT_DEQUE[-1].degraded)
+
+    def test_deviation(self):
+        ab = self.composite('ab', ['a', 'b'])
+        ab.set_params({'INPUTS': ['a', 'b'], 'DEVIATION': .1})
+        self.feeds['b'].publish(1., source_time=100.)
+        for value in [1., 1.05, 1.5]:
+            self.feeds['a'].publish(value, source_time=200.)
+        self.assertEqual([dp.value for dp in ab.DATAPOINT_DEQUE], [2., 2.5])
+        self.feeds['b'].publish(1.01, source_time=150.)
+        self.assertEqual(len(ab.DATAPOINT_DEQUE), 2)
+        self.assertEqual(ab.DATAPOINT_DEQUE[-1].source_time, 150.)     #confirmed, as fresh as its stalest input
+
+    def test_degraded_input_under_deviation(self):
+        ab = self.composite('ab', ['a', 'b'])
+        ab.set_params({'INPUTS': ['a', 'b'], 'DEVIATION': .1})
+        self.feeds['a'].publish(1.)
+        self.feeds['b'].publish(1.)
+        self.feeds['a'].last_good_value()
+        self.feeds['a'].publish(1.)         #the same value, but its sources failed
+        dp = ab.DATAPOINT_DEQUE[-1]
+        self.assertEqual((dp.value, dp.degraded), (2., True))
+        self.feeds['a'].publish(1.)         #and recovered
+        self.assertFalse(ab.DATAPOINT_DEQUE[-1].degraded)
+
+    def test_cycle_rejected(self):
+        self.feeds['y'] = Sum(name='y', INPUTS=['x'])   #configured, not started yet
+        x = self.composite('x', ['a', 'y'])
+        with self.assertRaises(GraphError):
+            self.feeds['y'].attach(self.graph)
+        self.assertEqual(list(self.graph.composites), ['x'])
+        with self.assertRaises(GraphError):
+            self.composite('z', ['nope'])
+        with self.assertRaises(KeyError):
+            x.set_params({'INPUTS': ['x']})
+        self.assertEqual(x.inputs(), ('a', 'y'))
+
+    def test_detach(self):
+        ab = self.composite('ab', ['a', 'b'])
+        ab.detach()
+        self.assertEqual(self.feeds['a'].SUBSCRIBERS, ())
+        self.feeds['a'].publish(1.)
+        self.feeds['b'].publish(1.)
+        self.assertEqual(ab.recomputed, 0)
+
+    def test_retune_inputs(self):
+        ab = self.composite('ab', ['a', 'b'])
+        ab.set_params({'INPUTS': ['a', 'c']})
+        self.assertEqual(self.feeds['b'].SUBSCRIBERS, ())
+        self.feeds['a'].publish(1.)
+        self.feeds['c'].publish(2.)
+        self.assertEqual(ab.DATAPOINT_DEQUE[-1].value, 3.)
+
+
+class TestComposites(unittest.TestCase):
+
+    def test_stablecoin_depeg(self):
+        feed = composite.StablecoinDepeg()
+        self.assertAlmostEqual(feed.combine({'usdc': 1.001, 'busd': .99, 'tether': 1., 'dai': 1.002}), .01)
+
+    def test_mcap_dog_ratio(self):
+        feed = composite.McapDogRatio()
+        self.assertEqual(feed.combine({'mcap1000': 1e12, 'dogcoins': 2e10}), 50.)
+        self.assertIsNone(feed.combine({'mcap1000': 1e12, 'dogcoins': 0}))
+
+
+if __name__ == '__main__':
+    unittest.main()
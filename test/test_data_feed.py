@@ -1,56 +1,155 @@
-import os
+import time
+import unittest
+from werkzeug.exceptions import PreconditionFailed
 from feeds import data_feed
 from feeds import test_feed
-from datetime import datetime
 import constants as c
-import unittest
+import endpoint
 
-Test =  test_feed.Test
 
 class TestData(unittest.TestCase):
 
-    @classmethod
-    def setUpClass(cls):
-        # if os.path.exists(Test.get_data_dir()):
-        ...
-        #     os.remove(Test.get_data_dir()) 
+    def setUp(self):
+        self.feed = test_feed.Test()
+
+    def test_create_new_data_point_not_implemented(self):
+        class Bare(data_feed.DataFeed):
+            NAME = 'bare'
+            ID = -1
+            HEARTBEAT = 1
+        self.assertRaises(NotImplementedError, Bare().create_new_data_point)
+
+    def test_get_data_dir(self):
+        self.assertEqual(self.feed.get_data_dir(), c.DATA_PATH / (self.feed.NAME + c.DATA_EXT))
+
+    def test_publish(self):
+        dp = self.feed.publish(3, timestamp=100.)
+        self.assertEqual((dp.value, dp.timestamp), (3, 100.))
+        self.assertIs(self.feed.DATAPOINT_DEQUE[-1], dp)
+        self.assertEqual(self.feed.COUNT, 1)
+
+    def test_get_most_recently_stored_data_point(self):
+        data = self.feed.get_most_recently_stored_data_point()
+        self.assertIsNone(data[c.DATA_POINT])
+
+        self.feed.publish(2)
+        self.feed.publish(3)
+        data = self.feed.get_most_recently_stored_data_point()
+        self.assertEqual(self.feed.NAME, data[c.FEED_NAME])
+        self.assertAlmostEqual(time.time(), data[c.TIME_STAMP], delta=5)
+        self.assertEqual(3, data[c.DATA_POINT])
+
+    def test_source_time_and_degraded(self):
+        dp = self.feed.publish(1, timestamp=100.)
+        self.assertEqual((dp.source_time, dp.degraded), (100., False))
+
+        self.feed.source_updated(90., None, 95.)
+        dp = self.feed.publish(2, timestamp=200.)
+        self.assertEqual((dp.source_time, dp.degraded), (95., False))
+
+        value = self.feed.last_good_value()
+        dp = self.feed.publish(value, timestamp=300.)
+        self.assertEqual((dp.value, dp.source_time, dp.degraded), (2, 95., True))
+        self.assertEqual(dp.age(now=395.), 300.)
+
+        dp = self.feed.publish(3, timestamp=400.)
+        self.assertEqual((dp.source_time, dp.degraded), (400., False))
+
+        data = self.feed.get_most_recently_stored_data_point()
+        self.assertEqual((data[c.TIME_STAMP], data[c.SOURCE_TIME], data[c.DEGRADED]), (400., 400., False))
 
-    @classmethod
-    def tearDownClass(cls):
-        os.remove(Test.get_data_dir())#c.TEST_PATH / (Test.NAME + c.DATA_EXT))
+    def test_last_good_value_empty(self):
+        with self.assertRaises(IndexError):
+            self.feed.last_good_value()
 
     def test_run(self):
-        self.assertRaises(NotImplementedError, Test.get_data_point)
+        feed = test_feed.Test(HEARTBEAT=0)
+        original = feed.create_new_data_point
+        def create_new_data_point():
+            if feed.COUNT == 4:
+                feed.stop()
+            return original()
+        feed.create_new_data_point = create_new_data_point
+        feed.start()
+        feed.run()
+        self.assertEqual(feed.COUNT, 5)
+        self.assertEqual(len(feed.DATAPOINT_DEQUE), 5)
 
-    def test_get_data_dir(self):
-        self.assertEqual(Test.get_data_dir(), c.DATA_PATH / (Test.NAME + c.DATA_EXT))
+    def test_deviation_policy(self):
+        feed = test_feed.Test(DEVIATION=.01, SAMPLE_INTERVAL=10, HEARTBEAT=3600)
+        self.assertEqual(feed.sample_interval(), 10)
+        self.assertTrue(feed.should_publish(100., now=0.))      #nothing published yet
+        feed.publish(100., timestamp=0.)
+        self.assertFalse(feed.should_publish(100.5, now=60.))
+        self.assertFalse(feed.should_publish(99.01, now=60.))
+        self.assertTrue(feed.should_publish(101.5, now=60.))
+        self.assertTrue(feed.should_publish(98., now=60.))
+        self.assertTrue(feed.should_publish(100., now=3600.))   #heartbeat expired
+        self.assertTrue(feed.should_publish(100., now=3596., interval=10))
+        feed.last_good_value()
+        self.assertTrue(feed.should_publish(100., now=60.))     #sources just failed
 
-    def test_get_last_csv_line(self):
-        Test.NAME = 'new_funky_name'
-        self.assertIsNone(Test.get_last_csv_line())
+    def test_no_deviation_policy(self):
+        self.feed.publish(1., timestamp=0.)
+        self.assertEqual(self.feed.sample_interval(), self.feed.HEARTBEAT)
+        self.assertTrue(self.feed.should_publish(1., now=0.))
 
-        Test.save_data_point(0)
-        line = Test.parse_csv_line(Test.get_last_csv_line())
-        self.assertEqual(datetime, type(line[0]))
-        self.assertEqual(0, line[1])
+    def test_deviation(self):
+        self.assertAlmostEqual(data_feed.deviation(100., 99.), .01)
+        self.assertEqual(data_feed.deviation(0., 0.), 0.)
+        self.assertEqual(data_feed.deviation(0., 1.), float('inf'))
+        self.assertEqual(data_feed.deviation(None, 1.), float('inf'))
 
-        Test.save_data_point(1)
-        line1 = Test.parse_csv_line(Test.get_last_csv_line())
-        self.assertEqual(datetime, type(line[0]))
-        self.assertEqual(1, line1[1])
+    def test_run_suppresses_small_moves(self):
+        feed = test_feed.Test(DEVIATION=.05, SAMPLE_INTERVAL=.001, HEARTBEAT=3600)
+        values = iter([1., 1.01, 0.99, 1.02, 1.5, 1.51, 1.])
+        samples = []
+        def create_new_data_point():
+            value = next(values)
+            samples.append(value)
+            if len(samples) == 7:
+                feed.stop()
+            return value
+        feed.create_new_data_point = create_new_data_point
+        feed.start()
+        feed.run()
+        self.assertEqual([dp.value for dp in feed.DATAPOINT_DEQUE], [1., 1.5, 1.])
 
-        Test.save_data_point(2)
-        line2 = Test.parse_csv_line(Test.get_last_csv_line())
-        self.assertEqual(datetime, type(line[0]))
-        self.assertEqual(2, line2[1])
+    def test_suppressed_samples_refresh_age(self):
+        # a stablecoin: unchanged samples every 10s are not published for an hour,
+        # yet they confirm the value, so it stays fresh enough for max_age=60
+        feed = test_feed.Test(DEVIATION=.01, SAMPLE_INTERVAL=10, HEARTBEAT=3600)
+        feeds = {'test': feed}
+        now = time.time()
+        feed.publish(1., timestamp=now - 600, source_time=now - 600)
+        with self.assertRaises(PreconditionFailed):
+            endpoint.latest_data_point(feeds, 'test', max_age=60)
+        for source_time in [now - 30, None]:
+            feed.source_updated(source_time)
+            self.assertFalse(feed.should_publish(1.001, now))
+            feed.confirm(now)
+            self.assertEqual(len(feed.DATAPOINT_DEQUE), 1)
+        data_point = endpoint.latest_data_point(feeds, 'test', max_age=60)
+        self.assertEqual((data_point[c.DATA_POINT], data_point[c.TIME_STAMP]), (1., now - 600))
+        self.assertEqual(data_point[c.SOURCE_TIME], now)    #sampled now, no source time reported
+        feed.source_updated(now - 900)
+        feed.confirm(now)       #an older source time doesn't make it older
+        self.assertEqual(feed.DATAPOINT_DEQUE[-1].source_time, now)
+        feed.last_good_value()
+        feed.confirm(now + 120)     #nor does a degraded sample make it fresher
+        self.assertEqual(feed.DATAPOINT_DEQUE[-1].source_time, now)
 
-    def test_get_most_recently_stored_data_point(self):
-        Test.save_data_point(3)
-        data = Test.get_most_recently_stored_data_point()
-        self.assertEqual(Test.NAME, data[c.FEED_NAME])
-        self.assertEqual(datetime, type(data[c.TIME_STAMP]))
-        self.assertEqual(3, data[c.DATA_POINT])
+    def test_params_per_instance(self):
+        feed = test_feed.Test(name='slow_test', HEARTBEAT=60)
+        self.assertEqual((feed.NAME, feed.HEARTBEAT), ('slow_test', 60))
+        self.assertEqual((self.feed.NAME, self.feed.HEARTBEAT), ('test', test_feed.Test.HEARTBEAT))
+
+        feed.set_params({})
+        self.assertEqual(feed.HEARTBEAT, test_feed.Test.HEARTBEAT)
+        with self.assertRaises(KeyError):
+            feed.set_params({'COUNT': 5})
+        with self.assertRaises(KeyError):
+            feed.set_params({'NOT_A_PARAM': 5})
 
 if __name__ == '__main__':
     unittest.main()
-
@@ -0,0 +1,87 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+import constants as c
+import dataset
+
+
+class TestDataset(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.csv = self.dir / 'prices'
+        pd.DataFrame({
+            'time': pd.date_range('2022-01-01', periods=5, freq='300s'),
+            'close': [1., 2., 3., 4., 5.],
+        }).to_csv(self.csv)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_load_converts_csv_once(self):
+        data = dataset.load(self.csv)
+        self.assertTrue((self.dir / ('prices' + c.COLUMNAR_EXT) / c.COLUMNAR_META_FILE).exists())
+        self.assertEqual(len(data), 5)
+        self.assertIsInstance(data['close'], np.memmap)
+        np.testing.assert_array_equal(data['close'], [1., 2., 3., 4., 5.])
+        self.assertEqual(data['time'].dtype, np.dtype('datetime64[ns]'))
+        self.assertEqual(data.meta['columns']['time']['kind'], dataset.DATETIME)
+
+        #second load must not reparse the csv
+        mtime = os.stat(dataset.columnar_path(self.csv) / 'close.npy').st_mtime_ns
+        dataset.load(self.csv)
+        self.assertEqual(mtime, os.stat(dataset.columnar_path(self.csv) / 'close.npy').st_mtime_ns)
+
+    def test_load_reconverts_stale_copy(self):
+        dataset.load(self.csv)
+        pd.DataFrame({'time': ['2022-01-01'], 'close': [9.]}).to_csv(self.csv)
+        os.utime(self.csv, (0, 0))
+        data = dataset.load(self.csv)
+        np.testing.assert_array_equal(data['close'], [9.])
+
+    def test_save_frame_roundtrip(self):
+        series = pd.Series([1., 2.], index=pd.date_range('2021-01-01', periods=2, name='time'), name='close')
+        path = dataset.save_frame(self.dir / 'out', series)
+        pd.testing.assert_frame_equal(dataset.load(path).to_frame(), series.to_frame(), check_freq=False)
+
+    def test_save_replaces_dataset(self):
+        path = dataset.save(self.dir / 'out', {'a': [1., 2.]})
+        mapped = dataset.load(path)['a']
+        dataset.save(path, {'a': [3.]})
+        np.testing.assert_array_equal(dataset.load(path)['a'], [3.])
+        np.testing.assert_array_equal(mapped, [1., 2.])     #a reader of the old one keeps it
+        self.assertEqual(sorted(p.name for p in self.dir.iterdir()), ['out.cols', 'prices'])
+
+    def test_failed_save_keeps_old_dataset(self):
+        path = dataset.save(self.dir / 'out', {'a': [1., 2.]})
+        replace, calls = os.replace, []
+
+        def failing_replace(src, dst):      #moving the new one in fails
+            calls.append(dst)
+            if len(calls) == 2:
+                raise OSError('disk full')
+            replace(src, dst)
+
+        with patch('os.replace', failing_replace):
+            self.assertRaises(OSError, dataset.save, path, {'a': [3.]})
+        np.testing.assert_array_equal(dataset.load(path)['a'], [1., 2.])
+        self.assertEqual(sorted(p.name for p in self.dir.iterdir()), ['out.cols', 'prices'])
+
+    def test_save_rejects_ragged_columns(self):
+        self.assertRaises(ValueError, dataset.save, self.dir / 'bad', {'a': [1, 2], 'b': [1]})
+
+    def test_eth_dataset(self):
+        data = dataset.load(c.DATA_PATH / 'ETH-USD_2022-01-01-00-00_2022-03-01-00-00_300secs')
+        self.assertEqual(len(data), 8497)
+        self.assertEqual(data['close'][0], 3696.76)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import time
+import unittest
+
+import constants as c
+import endpoint
+from feeds.registry import FeedRegistry, FeedSpec
+
+
+class TestDatafeedRoute(unittest.TestCase):
+
+    def setUp(self):
+        self.feeds = FeedRegistry({'test': FeedSpec(0, 'feeds.test_feed', 'Test')})
+        endpoint.app.all_feeds = self.feeds
+        self.client = endpoint.app.test_client()
+
+    def tearDown(self):
+        del endpoint.app.all_feeds
+
+    def test_unknown_and_empty_feed(self):
+        self.assertEqual(self.client.get('/datafeed/nope').status_code, 404)
+        self.assertEqual(self.client.get('/datafeed/test').status_code, 404)
+
+    def test_freshness_fields(self):
+        now = time.time()
+        self.feeds['test'].publish(.5, timestamp=now - 5, source_time=now - 60)
+        data = self.client.get('/datafeed/test').get_json()
+        self.assertEqual(data[c.DATA_POINT], .5)
+        self.assertEqual(data[c.TIME_STAMP], now - 5)
+        self.assertEqual(data[c.SOURCE_TIME], now - 60)
+        self.assertAlmostEqual(data[c.AGE], 60, delta=5)
+        self.assertFalse(data[c.DEGRADED])
+
+    def test_max_age(self):
+        feed = self.feeds['test']
+        feed.publish(.5, source_time=time.time() - 60)
+        self.assertEqual(self.client.get('/datafeed/test?max_age=120').status_code, 200)
+        response = self.client.get('/datafeed/test?max_age=30')
+        self.assertEqual(response.status_code, 412)
+        self.assertIn('stale', response.get_json()['description'])
+
+        feed.publish(feed.last_good_value())
+        response = self.client.get('/datafeed/test?max_age=30')
+        self.assertEqual(response.status_code, 412)
+        self.assertIn('degraded', response.get_json()['description'])
+
+    def test_bad_max_age(self):
+        self.feeds['test'].publish(.5)
+        self.assertEqual(self.client.get('/datafeed/test?max_age=soon').status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
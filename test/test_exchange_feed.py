@@ -0,0 +1,100 @@
+import time
+import unittest
+import threading
+
+from feeds.exchange import exchange_feed
+from feeds.exchange.exchange_feed import ExchangeFeed, Quote
+from test.exchange_stub import ExchangeStub, ticker, order_book, factory
+
+
+def quote(venue, price, weight=1., age=0.):
+    return Quote(venue, price, price, price, weight, time.time() - age)
+
+
+class TestAggregation(unittest.TestCase):
+
+    def test_median(self):
+        quotes = [quote('a', 100.), quote('b', 101.), quote('c', 150.)]
+        self.assertEqual(exchange_feed.median_price(quotes), 101.)
+
+    def test_vwap(self):
+        quotes = [quote('a', 100., 3.), quote('b', 104., 1.)]
+        self.assertEqual(exchange_feed.vwap(quotes), 101.)
+        self.assertEqual(exchange_feed.vwap([quote('a', 100., 0.), quote('b', 102., 0.)]), 101.)
+
+    def test_quote_from_ticker(self):
+        q = exchange_feed.quote_from_ticker('a', ticker(99., 101., volume=5., timestamp=1000.))
+        self.assertEqual((q.price, q.weight, q.timestamp), (100., 5., 1000.))
+        q = exchange_feed.quote_from_ticker('a', {'bid': None, 'ask': None, 'last': 98.})
+        self.assertEqual(q.price, 98.)
+
+    def test_quote_from_order_book(self):
+        q = exchange_feed.quote_from_order_book('a', order_book(99., 101., size=2.))
+        self.assertEqual((q.bid, q.ask, q.price, q.weight), (99., 101., 100., 4.))
+        self.assertIsNone(exchange_feed.quote_from_order_book('a', {'bids': [], 'asks': []}))
+
+    def test_stale_venues_left_out(self):
+        feed = ExchangeFeed(name='test_exchange', feed_id=-1)
+        feed.QUOTES = {'a': quote('a', 100.), 'b': quote('b', 200., age=60.)}
+        self.assertEqual(feed.create_new_data_point(), 100.)
+
+
+class TestExchangeFeed(unittest.TestCase):
+
+    def run_feed(self, stubs, until, timeout=5., **params):
+        feed = ExchangeFeed(name='test_exchange', feed_id=-1, EXCHANGES=tuple(stubs),
+                            EXCHANGE_FACTORY=factory(stubs), MIN_PUBLISH_INTERVAL=.005,
+                            RECONNECT_DELAY=.01, **params)
+        feed.start()
+        thread = threading.Thread(target=feed.run)
+        thread.start()
+        try:
+            deadline = time.time() + timeout
+            while not until(feed) and time.time() < deadline:
+                time.sleep(.005)
+        finally:
+            feed.stop()
+            thread.join(timeout)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(all(stub.closed for stub in stubs.values()))
+        return feed
+
+    def test_median_of_venues(self):
+        stubs = {'a': ExchangeStub('a', [ticker(99., 101.)]),
+                 'b': ExchangeStub('b', [ticker(101., 103.)]),
+                 'c': ExchangeStub('c', [ticker(149., 151.)])}
+        feed = self.run_feed(stubs, lambda feed: len(feed.QUOTES) == 3 and feed.DATAPOINT_DEQUE
+                             and feed.DATAPOINT_DEQUE[-1].value == 102.)
+        self.assertEqual(feed.DATAPOINT_DEQUE[-1].value, 102.)
+        self.assertFalse(feed.DATAPOINT_DEQUE[-1].degraded)
+
+    def test_vwap_of_order_books(self):
+        stubs = {'a': ExchangeStub('a', [order_book(99., 101., size=3.)]),
+                 'b': ExchangeStub('b', [order_book(103., 105., size=1.)])}
+        feed = self.run_feed(stubs, lambda feed: len(feed.QUOTES) == 2 and feed.DATAPOINT_DEQUE
+                             and feed.DATAPOINT_DEQUE[-1].value == 101.,
+                             WATCH=exchange_feed.ORDER_BOOK, AGGREGATION='vwap')
+        self.assertEqual(feed.DATAPOINT_DEQUE[-1].value, 101.)
+
+    def test_reconnects_after_error(self):
+        stubs = {'a': ExchangeStub('a', [ConnectionError('dropped'), ticker(99., 101.)])}
+        feed = self.run_feed(stubs, lambda feed: feed.DATAPOINT_DEQUE)
+        self.assertGreaterEqual(stubs['a'].served, 2)
+        self.assertEqual(feed.DATAPOINT_DEQUE[-1].value, 100.)
+
+    def test_sub_second_publishing(self):
+        stubs = {'a': ExchangeStub('a', [ticker(99., 101.), ticker(109., 111.)], interval=.05)}
+        start = time.time()
+        feed = self.run_feed(stubs, lambda feed: feed.DATAPOINT_DEQUE and feed.DATAPOINT_DEQUE[-1].value == 110.)
+        self.assertEqual(feed.DATAPOINT_DEQUE[-1].value, 110.)
+        self.assertLess(time.time() - start, 1.)
+
+    def test_deviation_policy(self):
+        stubs = {'a': ExchangeStub('a', [ticker(99., 101.), ticker(99.5, 101.), ticker(119., 121.)])}
+        feed = self.run_feed(stubs, lambda feed: stubs['a'].served > 10 and feed.DATAPOINT_DEQUE
+                             and feed.DATAPOINT_DEQUE[-1].value == 120., DEVIATION=.01, HEARTBEAT=60)
+        self.assertEqual([dp.value for dp in feed.DATAPOINT_DEQUE], [100., 120.])
+
+
+if __name__ == '__main__':
+    unittest.main()
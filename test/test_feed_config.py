@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import feed_config
+from feeds import test_feed
+from feeds.registry import FeedRegistry, FeedSpec
+
+
+class TestFeedConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.path = self.dir / 'feeds.toml'
+        self.available = FeedRegistry({'test': FeedSpec(0, 'feeds.test_feed', 'Test')})
+        self.registry = self.available.subset([])
+        self.changes = []
+        self.watcher = feed_config.ConfigWatcher(self.path, self.registry, self.available,
+                                                 on_change=self.changes.append)
+        self.heartbeat = test_feed.Test.HEARTBEAT
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def write(self, text, mtime):
+        self.path.write_text(text)
+        os.utime(self.path, (mtime, mtime))
+
+    def test_load_and_apply(self):
+        self.write('[feeds.test]\nheartbeat = 5\n\n[feeds.fast]\nfeed = "test"\nid = 42\nheartbeat = 2\nstart = true\n', 1)
+        changes = self.watcher.reload()
+        self.assertEqual(list(self.registry), ['test', 'fast'])
+        test = self.registry['test']
+        self.assertIsInstance(test, test_feed.Test)
+        self.assertEqual(test.HEARTBEAT, 5)
+        fast = self.registry['fast']
+        self.assertIsInstance(fast, test_feed.Test)
+        self.assertEqual((fast.NAME, fast.ID, fast.HEARTBEAT), ('fast', 42, 2))
+        self.assertIsNot(fast.DATAPOINT_DEQUE, test.DATAPOINT_DEQUE)
+        self.assertEqual(test_feed.Test.HEARTBEAT, self.heartbeat)
+        self.assertEqual(changes.to_start, [fast])
+
+    def test_hot_reload(self):
+        self.write('[feeds.test]\nheartbeat = 5\n\n[feeds.fast]\nfeed = "test"\n', 1)
+        self.watcher.check()
+        test = self.registry['test']
+        fast = self.registry['fast']
+        fast.DATAPOINT_DEQUE.append(1.)
+
+        #unchanged file: nothing happens
+        self.assertIsNone(self.watcher.check())
+
+        #retune, drop an instance, disable nothing else
+        self.write('[feeds.fast]\nfeed = "test"\nheartbeat = 3\n', 2)
+        changes = self.watcher.check()
+        self.assertEqual(changes.removed, [test])
+        self.assertNotIn('test', self.registry)
+        self.assertIs(self.registry['fast'], fast)
+        self.assertEqual(fast.HEARTBEAT, 3)
+        self.assertEqual(list(fast.DATAPOINT_DEQUE), [1.])
+        #parameters no longer configured go back to their defaults
+        self.write('[feeds.fast]\nfeed = "test"\n', 3)
+        self.watcher.check()
+        self.assertEqual(fast.HEARTBEAT, self.heartbeat)
+        self.assertEqual(len(self.changes), 3)
+
+    def test_disabled_and_invalid_configs(self):
+        self.write('[feeds.test]\nenabled = false\n', 1)
+        self.watcher.reload()
+        self.assertEqual(list(self.registry), [])
+
+        self.write('[feeds.nope]\nfeed = "missing"\n', 2)
+        self.assertIsNone(self.watcher.check())
+        self.write('[feeds.test\n', 3)
+        self.assertIsNone(self.watcher.check())
+
+    def test_invalid_config_changes_nothing(self):
+        self.write('[feeds.test]\nheartbeat = 5\n\n[feeds.fast]\nfeed = "test"\n', 1)
+        self.watcher.reload()
+        fast = self.registry['fast']
+        #an invalid param (of a feed not created yet) after a removal: nothing is applied
+        self.write('[feeds.test]\nnot_a_param = 1\n', 2)
+        self.assertIsNone(self.watcher.check())
+        self.assertEqual(list(self.registry), ['test', 'fast'])
+        self.assertIs(self.registry['fast'], fast)
+        self.assertEqual(self.registry['test'].HEARTBEAT, 5)
+        self.assertEqual(len(self.changes), 1)
+        self.assertRaises(feed_config.ConfigError, feed_config.apply,
+                          feed_config.load(self.path, self.available), self.registry)
+
+    def test_only_changed_or_started_feeds_checked(self):
+        self.available.specs['broken'] = FeedSpec(1, 'feeds.not_a_module', 'Broken')
+        self.write('[feeds.test]\nheartbeat = 5\n\n[feeds.broken]\nheartbeat = 2\n', 1)
+        configs = feed_config.load(self.path, self.available)
+        feed_config.apply(configs, self.registry, check=False)      #as all_feeds.py does
+        self.assertIsNotNone(self.watcher.reload())     #unchanged: not imported, so not checked
+        self.assertFalse(self.registry.is_loaded('broken'))
+        for text in ['[feeds.broken]\nheartbeat = 3\n', '[feeds.broken]\nheartbeat = 2\nstart = true\n']:
+            self.write(text, 2)
+            with self.subTest(text=text):
+                with self.assertRaisesRegex(feed_config.ConfigError, 'not_a_module'):
+                    feed_config.apply(feed_config.load(self.path, self.available), self.registry)
+
+
+if __name__ == '__main__':
+    unittest.main()
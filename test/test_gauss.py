@@ -2,7 +2,8 @@ import unittest
 import numpy as np
 import pandas as pd
 import constants as c
-from feeds.gauss import gauss
+import dataset
+from feeds.gauss import gauss, ohlc
 from feeds.gauss import random_feed as rf
 import matplotlib.pyplot as plt
 
@@ -18,7 +19,7 @@ class TestGauss(unittest.TestCase):
         px = .0001
         cls.feed = rf.RandomFeed(vol, px)
 
-        cls.gauss = gauss.Gauss
+        cls.gauss = gauss.Gauss()
 
     @unittest.skip('exploration')
     def test_random_feed(self):
@@ -32,16 +33,37 @@ class TestGauss(unittest.TestCase):
         self.assertTrue(self.gauss.get_data_dir() == c.DATA_PATH / (self.gauss.NAME + c.DATA_EXT))
 
     def test__generate_data_point(self):
-        data = gauss.TestClass._generate_data_points(10, 100)
+        data = gauss.TestClass()._generate_data_points(10, 100)
         self.assertListEqual(data, [101.76405234596767, 102.17126853695666, 103.17125755097054, 105.48321524496086, 107.45317545953522, 106.40305934454439, 107.41398248726978, 107.25140368205567, 107.14070001464258, 107.58061812386899])
 
     def test__prep_data(self):
-        data = gauss.TestClass._generate_data_points(1000, 100)
-        data = gauss.TestClass._prep_data(data)
+        data = gauss.TestClass()._generate_data_points(1000, 100)
+        data = gauss.TestClass()._prep_data(data)
+
+    def test_ohlc_matches_pandas_resample(self):
+        data = gauss.TestClass()._generate_data_points(1234, 100)
+        dates = pd.date_range(start='2021-01-01', periods=len(data), freq='s')
+        expected = pd.Series(data, index=dates).resample('300s').ohlc()
+        bars = ohlc.ohlc(data, 300)
+        np.testing.assert_array_equal(bars, expected[list(ohlc.OHLC_COLUMNS)].to_numpy())
+        pd.testing.assert_series_equal(gauss.TestClass()._prep_data(data), expected['close'].rename_axis('time'))
+
+    def test_ohlc_resampler_chunks(self):
+        data = np.random.rand(1000)
+        resampler = ohlc.OHLCResampler(300)
+        for chunk in np.array_split(data, 7):
+            resampler.update(chunk)
+        np.testing.assert_array_equal(resampler.finish(), ohlc.ohlc(data, 300))
+
+    def test__generate_prepped_data(self):
+        np.random.seed(1)
+        expected = gauss.TestClass()._prep_data(gauss.TestClass()._generate_data_points(1000, 100))
+        np.random.seed(1)
+        pd.testing.assert_series_equal(gauss.TestClass()._generate_prepped_data(1000, 100), expected)
 
     # @unittest.skip('for saving test data')
     def test_make_data(self):
-        data = pd.read_csv(c.DATA_PATH / 'ETH-USD_2022-01-01-00-00_2022-03-01-00-00_300secs')
+        data = dataset.load(c.DATA_PATH / 'ETH-USD_2022-01-01-00-00_2022-03-01-00-00_300secs')
         l = len(data) #in 300 sec intervals
         n = int(l * 300)
         for p in [.01, .02, .03]:
@@ -49,9 +71,8 @@ class TestGauss(unittest.TestCase):
                 for h in [10, 30, 60]:
                     print(f'doing {p} {v} {h}')
                     g = gauss.TestClass(heartbeat=h, percent=p, volatility=v)
-                    gdata =  g._generate_data_points(n, 100)
-                    gdata = g._prep_data(gdata)
-                    gdata.to_csv(c.DATA_PATH / f'GAUSS_{g.HEARTBEAT}_{g.VOLATILITY}_{g.PERCENT}_.1.csv')
+                    gdata = g._generate_prepped_data(n, 100)
+                    dataset.save_frame(c.DATA_PATH / f'GAUSS_{g.HEARTBEAT}_{g.VOLATILITY}_{g.PERCENT}_.1', gdata)
 
 
 if __name__ == '__main__':
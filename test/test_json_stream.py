@@ -0,0 +1,90 @@
+import json
+import unittest
+from pathlib import Path
+
+from apis import utils, replay
+from apis.catalog import CatalogCache
+from apis.coinpaprika import CoinPaprikaAPI
+
+FIXTURES = Path(__file__).parent / 'fixtures'
+
+
+def chunked(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestIterJsonArray(unittest.TestCase):
+    ARRAYS = [
+        [],
+        [{"id": "btc-bitcoin", "rank": 1}, {"id": "eth-ethereum", "rank": 2}],
+        [{"nested": {"a": [1, {"b": "}"}]}, "s": "},{\"x\": 1}"}, {"unicode": "é€\U0001f600"}],
+        [1, 2.5, "three", None, True, [4, 5]],
+        [{"rank": i, "name": f"Coin {i}"} for i in range(500)],
+    ]
+
+    def test_matches_json_loads(self):
+        for array in self.ARRAYS:
+            raw = json.dumps(array, ensure_ascii=False, indent=1).encode()
+            for size in [1, 3, 7, 64, len(raw) or 1]:
+                with self.subTest(array=str(array)[:40], size=size):
+                    self.assertEqual(list(utils.iter_json_array(chunked(raw, size))), array)
+
+    def test_standard_library_decoder(self):
+        raw = json.dumps(self.ARRAYS[2]).encode()
+        self.assertEqual(list(utils.iter_json_array(chunked(raw, 5), loads=json.loads)), self.ARRAYS[2])
+
+    def test_yields_before_the_end(self):
+        raw = json.dumps([{"i": i} for i in range(100)]).encode()
+        chunks = iter(chunked(raw, 50))
+        first = next(utils.iter_json_array(chunks))
+        self.assertEqual(first, {"i": 0})
+        self.assertTrue(next(chunks, None) is not None)
+
+    def test_nested_elements_decoded_in_few_calls(self):
+        # nested elements: a few decodes per chunk, not one per '}'
+        calls = []
+        loads = lambda text: calls.append(text) or json.loads(text)
+        array = [{"a": {"b": {"c": [{"d": "}"}] * 50}}} for _ in range(20)]
+        raw = json.dumps(array).encode()
+        self.assertEqual(list(utils.iter_json_array([raw[:len(raw) // 2], raw[len(raw) // 2:]], loads=loads)), array)
+        self.assertLessEqual(len(calls), 3)
+
+    def test_escapes_across_chunks(self):
+        array = [{"s": 'a\\"}]'}, {"s": "\\"}, {"t": 1}]
+        raw = json.dumps(array).encode()
+        for size in range(1, 8):
+            with self.subTest(size=size):
+                self.assertEqual(list(utils.iter_json_array(chunked(raw, size))), array)
+
+    def test_invalid(self):
+        for raw in [b'{"a": 1}', b'', b'[{"a": 1}, {"b": ']:
+            with self.subTest(raw=raw):
+                with self.assertRaises(ValueError):
+                    list(utils.iter_json_array(chunked(raw, 4)))
+
+
+class TestTopN(unittest.TestCase):
+
+    def test_top_n(self):
+        rows = [{"id": i, "rank": r, "extra": "x"} for i, r in enumerate([5, 3, 9, 1, 3])]
+        top = utils.top_n(rows, 3, key=lambda row: row["rank"], fields=("id", "rank"))
+        self.assertEqual(top, [{"id": 3, "rank": 1}, {"id": 1, "rank": 3}, {"id": 4, "rank": 3}])
+
+
+class TestCoinPaprikaStreaming(unittest.TestCase):
+
+    def test_stream_matches_full_decode(self):
+        results = {}
+        for stream in [True, False]:
+            catalog = CatalogCache('coinpaprika', "https://api.coinpaprika.com/v1/coins",
+                                   CoinPaprikaAPI.COIN_FIELDS, path=None, refresh_interval=0, stream=stream)
+            api = CoinPaprikaAPI(catalog)
+            with replay.installed(replay.ReplayTransport(FIXTURES / 'coinpaprika.synthetic.json.gz')):
+                results[stream] = api.get_data(50)
+        self.assertEqual(results[True], results[False])
+        self.assertEqual(len(results[True]), 50)
+        self.assertEqual(set(results[True][0]), set(CoinPaprikaAPI.COIN_FIELDS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,12 @@
 import unittest
+import requests
 from unittest.mock import patch, MagicMock
+from pathlib import Path
 from apis import crypto_api, coingecko, coinpaprika, coinmarketcap, cryptocompare
-from apis import utils
+from apis import utils, replay, circuit
+from apis.catalog import CatalogCache
+
+FIXTURES = Path(__file__).parent / 'fixtures'
 
 
 class TestCryptoAPI(unittest.TestCase):
@@ -27,6 +32,19 @@ class TestCoinGeckoAPI(unittest.TestCase):
         self.coin_gecko_api.get_data(10)
         self.assertTrue(mock_get.called)
 
+    def test_get_data_html_body(self):
+        # a 200 that is not json (e.g. a proxy's error page) fails the request, not the feed
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'<html><body>502 Bad Gateway</body></html>'
+        transport = MagicMock()
+        transport.get.return_value = response
+        with replay.installed(transport):
+            self.assertIsNone(self.coin_gecko_api.get_data(10))
+        with self.assertRaises(requests.exceptions.JSONDecodeError):
+            utils.decode_json(response)
+        circuit.reset()
+
     def test_extract_market_cap(self):
         data = [{"name": "Bitcoin", "last_updated": "2023-06-01T10:10:10.000Z", "market_cap": 100000}]
         result = self.coin_gecko_api.extract_market_cap(data)
@@ -34,25 +52,41 @@ class TestCoinGeckoAPI(unittest.TestCase):
         self.assertEqual(list(result.keys())[0], 100000)
 
 
-# class TestCoinPaprikaAPI(unittest.TestCase):
-#     def setUp(self):
-#         self.coin_paprika_api = coinpaprika.CoinPaprikaAPI()
+class TestCoinPaprikaAPI(unittest.TestCase):
+    def setUp(self):
+        # an in-memory coin list, so the test neither reads nor writes data/catalogs
+        catalog = CatalogCache('coinpaprika', "https://api.coinpaprika.com/v1/coins",
+                               coinpaprika.CoinPaprikaAPI.COIN_FIELDS, path=None, refresh_interval=0)
+        self.coin_paprika_api = coinpaprika.CoinPaprikaAPI(catalog)
+        self.transport = replay.ReplayTransport(FIXTURES / 'coinpaprika.synthetic.json.gz')
+
+    def tearDown(self):
+        circuit.reset()
+
+    def test_get_data(self):
+        with replay.installed(self.transport):
+            data = self.coin_paprika_api.get_data(10)
+        ranks = [coin['rank'] for coin in data]
+        self.assertEqual(len(ranks), 10)
+        self.assertEqual(ranks, sorted(ranks))
+        self.assertNotIn(0, ranks)
 
-#     @patch("requests.get")
-#     def test_get_data(self, mock_get):
-#         mock_get.return_value.json.return_value = MagicMock()
-#         self.coin_paprika_api.get_data(10)
-#         self.assertTrue(mock_get.called)
+    def test_extract_market_cap(self):
+        with replay.installed(self.transport):
+            data = self.coin_paprika_api.get_data(10)
+            result = self.coin_paprika_api.extract_market_cap(data)
+        self.assertIsInstance(result, dict)
+        self.assertEqual(len(result), 10)
+        self.assertEqual(sorted(md['name'] for md in result.values()), sorted(coin['name'] for coin in data))
+        # the coin list plus one ohlcv request per coin
+        self.assertEqual(len(self.transport.calls), 11)
 
-#     @patch("requests.get")
-#     def test_extract_market_cap(self, mock_get):
-#         mock_json_return = mock_get.return_value.json
-#         mock_json_return.return_value = [{'market_cap': 100000}]
-#         mock_get.return_value.status_code = 200
-#         data = [{"id": "btc-bitcoin", "name": "Bitcoin", "rank": 1}]
-#         result = self.coin_paprika_api.extract_market_cap(data)
-#         self.assertIsInstance(result, dict)
-#         self.assertEqual([i for i in result][0], 100000)
+    def test_extract_market_cap_request_error(self):
+        with replay.installed(self.transport):
+            data = self.coin_paprika_api.get_data(10)
+        transport = replay.ReplayTransport(FIXTURES / 'coinpaprika.synthetic.json.gz', error_rate=1.)
+        with replay.installed(transport):
+            self.assertIsNone(self.coin_paprika_api.extract_market_cap(data))
 
 
 class TestCoinMarketCapAPI(unittest.TestCase):
@@ -113,12 +147,46 @@ class TestCryptoCompareAPI(unittest.TestCase):
                          '2023-06-01T10:10:10.000Z')
 
 
+class TestSyntheticCassettes(unittest.TestCase):
+    """get_data + extract_market_cap replayed from the synthetic cassettes in test/fixtures
+    (written by benchmarks/payloads.py, not recorded from the real apis: this checks
+    the replay round trip, not the parsers against the providers' real schemas)"""
+
+    def fetch(self, api, N=50):
+        with replay.installed(replay.ReplayTransport(FIXTURES / f'{api.source}.synthetic.json.gz')):
+            return api.extract_market_cap(api.get_data(N))
+
+    def test_coingecko(self):
+        self.assertEqual(len(self.fetch(coingecko.CoinGeckoAPI())), 50)
+
+    def test_cryptocompare(self):
+        self.assertEqual(len(self.fetch(cryptocompare.CryptoCompareAPI())), 50)
+
+    @patch.object(crypto_api.CryptoAPI, 'get_api_key', lambda self, name: 'replay')
+    def test_coinmarketcap(self):
+        self.assertEqual(len(self.fetch(coinmarketcap.CoinMarketCapAPI())), 50)
+
+
 class TestUtils(unittest.TestCase):
     @patch("datetime.datetime")
     def test_convert_timestamp_to_unixtime(self, mock_datetime):
         utils.convert_timestamp_to_unixtime('2023-06-01T10:10:10.000Z')
         self.assertTrue(mock_datetime.strptime.called)
 
+    def test_to_unixtime(self):
+        self.assertEqual(utils.to_unixtime('2022-08-11T09:10:12.364Z'), 1660209012.364)
+        self.assertEqual(utils.to_unixtime(1660209012), 1660209012.)
+        self.assertEqual(utils.to_unixtime(1660209012364), 1660209012.364)
+        for unknown in [0, None, '', 'not a time']:
+            self.assertIsNone(utils.to_unixtime(unknown))
+
+    def test_latest_update(self):
+        market_data = {1e9: {'last_updated': '2022-08-11T09:10:12.364Z'},
+                       2e9: {'last_updated': 1660209000},
+                       3e9: {'last_updated': 0}}
+        self.assertEqual(utils.latest_update(market_data), 1660209012.364)
+        self.assertIsNone(utils.latest_update({1e9: {'last_updated': 0}}))
+
 
 if __name__ == '__main__':
     unittest.main()
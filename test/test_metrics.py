@@ -0,0 +1,99 @@
+#stdlib
+import unittest
+import threading
+
+#third party
+import requests
+
+#our stuff
+import metrics
+import endpoint
+from apis import utils
+from feeds.registry import FeedRegistry, FeedSpec
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_counter_across_threads(self):
+        counter = metrics.Counter('test_counter_total', 'help', ['kind'])
+        child = counter.labels('a')
+
+        def work():
+            for _ in range(10_000):
+                child.inc()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        [t.start() for t in threads]
+        [t.join() for t in threads]
+        self.assertEqual(child.value(), 80_000)
+        self.assertIn('test_counter_total{kind="a"} 80000', counter.render())
+
+    def test_ended_threads_shards_are_folded(self):
+        histogram = metrics.Histogram('test_folded_seconds', 'help')
+        child = histogram.labels()
+        for _ in range(50):
+            thread = threading.Thread(target=child.observe, args=(.5,))
+            thread.start()
+            thread.join()
+        child.observe(.5)
+        self.assertLessEqual(len(child._shards), 2)
+        self.assertEqual(child.totals()[-1], 25.5)
+        self.assertIn('test_folded_seconds_count 51', histogram.render())
+
+    def test_histogram_render(self):
+        histogram = metrics.Histogram('test_seconds', 'help', ['feed'], buckets=[.1, 1])
+        child = histogram.labels('x')
+        for value in [.05, .1, .5, 2]:
+            child.observe(value)
+        lines = histogram.render()
+        self.assertEqual(lines[:2], ['# HELP test_seconds help', '# TYPE test_seconds histogram'])
+        self.assertEqual(lines[2:], [
+            'test_seconds_bucket{feed="x",le="0.1"} 2',
+            'test_seconds_bucket{feed="x",le="1"} 3',
+            'test_seconds_bucket{feed="x",le="+Inf"} 4',
+            'test_seconds_sum{feed="x"} 2.65',
+            'test_seconds_count{feed="x"} 4',
+        ])
+
+    def test_register_returns_existing(self):
+        a = metrics.histogram('test_registered_seconds', 'help')
+        self.assertIs(metrics.histogram('test_registered_seconds', 'help'), a)
+        with self.assertRaises(ValueError):
+            metrics.counter('test_registered_seconds', 'help')
+
+    def test_upstream_errors_counted(self):
+        class API:
+            source = 'test_source'
+
+            @utils.handle_request_errors
+            def get_data(self):
+                raise requests.exceptions.ConnectionError('down')
+
+        errors = utils.UPSTREAM_ERRORS.labels('test_source', 'ConnectionError')
+        before = errors.value()
+        self.assertIsNone(API().get_data())
+        self.assertEqual(errors.value(), before + 1)
+
+
+class TestMetricsRoute(unittest.TestCase):
+
+    def setUp(self):
+        self.feeds = FeedRegistry({'test': FeedSpec(0, 'feeds.test_feed', 'Test')})
+        endpoint.app.all_feeds = self.feeds
+        self.client = endpoint.app.test_client()
+
+    def tearDown(self):
+        del endpoint.app.all_feeds
+
+    def test_metrics_route(self):
+        self.feeds['test'].publish(1.5)
+        self.client.get('/datafeed/test')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        text = response.get_data(as_text=True)
+        self.assertIn('siwa_datapoint_age_seconds{feed="test"}', text)
+        self.assertIn('siwa_http_request_seconds_count{route="/datafeed/<feedname>",status="200"}', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
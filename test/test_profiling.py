@@ -0,0 +1,82 @@
+#stdlib
+import pstats
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+#our stuff
+import profiling
+from feeds import test_feed
+
+
+def busy_work(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler(unittest.TestCase):
+
+    def test_samples_only_target_thread(self):
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_work, args=(stop,))
+        worker.start()
+        try:
+            profiler = profiling.SamplingProfiler(lambda: [worker.ident], interval=.001)
+            for _ in range(20):
+                profiler.sample()
+        finally:
+            stop.set()
+            worker.join()
+
+        self.assertEqual(sum(profiler.samples.values()), 20)
+        for stack in profiler.samples:
+            self.assertIn('busy_work (test_profiling.py:', stack)
+            self.assertNotIn('test_samples_only_target_thread', stack)
+
+    def test_dump_folded(self):
+        profiler = profiling.SamplingProfiler(lambda: [threading.get_ident()])
+        profiler.sample()
+        with tempfile.TemporaryDirectory() as tmp:
+            path = profiler.dump(Path(tmp) / 'out.folded')
+            stack, count = path.read_text().strip().rsplit(' ', 1)
+        self.assertEqual(count, '1')
+        self.assertTrue(stack.endswith(f'sample (profiling.py:{profiling.SamplingProfiler.sample.__code__.co_firstlineno})'))
+
+    def test_start_stop(self):
+        profiler = profiling.SamplingProfiler(lambda: [threading.get_ident()], interval=.001)
+        profiler.start()
+        self.assertTrue(profiler.running)
+        profiler.stop()
+        self.assertFalse(profiler.running)
+
+
+class TestFeedProfiler(unittest.TestCase):
+
+    def test_profiles_feed_loop(self):
+        feed = test_feed.Test(HEARTBEAT=0)
+        profiler = profiling.FeedProfiler(feed)
+        profiler.start()
+        self.assertIs(feed.PROFILER, profiler.profile)
+
+        calls = []
+        def create_new_data_point():
+            calls.append(1)
+            if len(calls) == 3:
+                feed.stop()
+            return 1.
+        feed.create_new_data_point = create_new_data_point
+        feed.start()
+        feed.run()
+        profiler.stop()
+        self.assertIsNone(feed.PROFILER)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            stats = pstats.Stats(str(profiler.dump(Path(tmp) / 'out.prof')))
+        profiled = {name for (_, _, name) in stats.stats}
+        self.assertIn('create_new_data_point', profiled)
+        self.assertEqual(feed.COUNT, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import sys
+import subprocess
+import unittest
+
+import constants as c
+from feeds.registry import FeedRegistry, FeedSpec
+
+
+class TestFeedRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = FeedRegistry({
+            'test': FeedSpec(0, 'feeds.test_feed', 'Test'),
+            'usdc': FeedSpec(3, 'feeds.stablecoins.stablecoins', 'USDC'),
+        })
+
+    def test_names_without_import(self):
+        self.assertIn('test', self.registry)
+        self.assertEqual(list(self.registry), ['test', 'usdc'])
+        self.assertEqual(self.registry.get_id('usdc'), 3)
+        self.assertFalse(self.registry.is_loaded('test'))
+        self.assertEqual(self.registry.loaded(), {})
+
+    def test_import_on_access(self):
+        from feeds import test_feed
+        feed = self.registry['test']
+        self.assertIsInstance(feed, test_feed.Test)
+        self.assertIs(self.registry['test'], feed)
+        self.assertTrue(self.registry.is_loaded('test'))
+        self.assertIs(self.registry.by_id(0), feed)
+
+    def test_instances_have_own_state_and_params(self):
+        self.registry.add('slow', FeedSpec(9, 'feeds.test_feed', 'Test', {'HEARTBEAT': 60}))
+        test, slow = self.registry['test'], self.registry['slow']
+        self.assertIs(type(test), type(slow))
+        self.assertEqual((slow.NAME, slow.ID, slow.HEARTBEAT), ('slow', 9, 60))
+        self.assertEqual(test.HEARTBEAT, type(test).HEARTBEAT)
+        slow.publish(1.)
+        self.assertEqual((len(test.DATAPOINT_DEQUE), slow.COUNT), (0, 1))
+        self.assertRaises(KeyError, self.registry.add, 'slow', FeedSpec(9, 'feeds.test_feed', 'Test', {'COUNT': 1}))
+
+    def test_subset_shares_loaded_feeds(self):
+        subset = self.registry.subset(['test'])
+        subset['test']
+        self.assertTrue(self.registry.is_loaded('test'))
+        self.assertNotIn('usdc', subset)
+
+    def test_feed_ids_unique(self):
+        import all_feeds
+        ids = [spec.ID for spec in all_feeds.available_feeds.specs.values()]
+        self.assertEqual(len(ids), len(set(ids)))
+
+    def test_cli_startup_skips_heavy_imports(self):
+        #as siwa.py starts: parse the arguments, then check (and apply) the feed config
+        code = ("import sys; sys.argv = ['siwa.py', '--datafeeds', 'test']; import siwa; siwa.get_params(); "
+                "siwa.config_watcher.on_change = None; assert siwa.config_watcher.reload() is not None; "
+                "print([m for m in ('web3', 'pandas', 'requests', 'nltk', 'tweepy', 'apis', 'feeds.rolling') "
+                "if m in sys.modules])")
+        out = subprocess.run([sys.executable, '-c', code], cwd=c.PROJECT_PATH,
+                             capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.strip().splitlines()[-1], '[]')
+
+
+if __name__ == '__main__':
+    unittest.main()
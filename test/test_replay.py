@@ -0,0 +1,91 @@
+import time
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+import requests
+
+import constants as c
+from apis import replay, circuit
+from apis.coingecko import CoinGeckoAPI
+from apis.crypto_api import CryptoAPI
+
+
+class CountingTransport:
+    """stands in for the network: answers every request with a json counter"""
+
+    def __init__(self):
+        self.count = 0
+
+    def get(self, url, params=None, **kwargs):
+        self.count += 1
+        response = requests.Response()
+        response.status_code = 200
+        response._content = f'[{{"name": "Coin", "last_updated": "", "market_cap": {self.count}}}]'.encode()
+        return response
+
+
+class TestReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / 'cassette.json.gz'
+
+    def tearDown(self):
+        self.tmp.cleanup()
+        circuit.reset()
+
+    def record(self, times=1):
+        api = CoinGeckoAPI()
+        with replay.RecordingTransport(self.path, inner=CountingTransport()) as recorder, \
+                replay.installed(recorder):
+            return [api.get_data(1) for _ in range(times)]
+
+    def test_round_trip(self):
+        recorded = self.record()
+        self.assertIs(CryptoAPI.transport, requests)
+        with replay.installed(replay.ReplayTransport(self.path)):
+            self.assertEqual(CoinGeckoAPI().get_data(1), recorded[0])
+
+    def test_repeated_requests_replay_in_order(self):
+        self.record(times=2)
+        with replay.installed(replay.ReplayTransport(self.path)):
+            values = [CoinGeckoAPI().get_data(1)[0]['market_cap'] for _ in range(3)]
+        self.assertEqual(values, [1, 2, 2])
+
+    def test_miss(self):
+        self.record()
+        with replay.installed(replay.ReplayTransport(self.path)):
+            with self.assertRaises(replay.CassetteMissError):
+                CoinGeckoAPI().get_data(2)
+
+    def test_latency(self):
+        self.record()
+        with replay.installed(replay.ReplayTransport(self.path, latency=.05)):
+            start = time.perf_counter()
+            CoinGeckoAPI().get_data(1)
+        self.assertGreaterEqual(time.perf_counter() - start, .05)
+
+    def test_error_injection(self):
+        self.record()
+        transport = replay.ReplayTransport(self.path, error_rate=.5, seed=1)
+        circuit.reset()
+        # a circuit that never opens, so every request reaches the transport
+        with replay.installed(transport), patch.object(c, 'CIRCUIT_FAILURE_THRESHOLD', float('inf')):
+            # handle_request_errors turns the injected ConnectionError into None
+            results = [CoinGeckoAPI().get_data(1) for _ in range(100)]
+        failures = results.count(None)
+        self.assertTrue(20 < failures < 80)
+        self.assertEqual(len(transport.calls), 100)
+
+    def test_no_headers_recorded(self):
+        self.record()
+        interactions = replay.Cassette.load(self.path).interactions
+        [key] = interactions
+        self.assertTrue(key.startswith('https://api.coingecko.com/api/v3/coins/markets?'))
+        self.assertEqual(interactions[key][0]['headers'], {'Content-Type': 'application/json'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,206 @@
+import sys
+import time
+import socket
+import tempfile
+import unittest
+import subprocess
+from pathlib import Path
+from unittest.mock import patch
+
+import constants as c
+import endpoint
+import replication
+from feeds.registry import FeedRegistry, FeedSpec
+
+SPECS = {'test': FeedSpec(0, 'feeds.test_feed', 'Test'),
+         'other': FeedSpec(1, 'feeds.test_feed', 'Test')}
+
+#a leader in its own process: publishes each value written to its stdin
+LEADER = '''
+import sys, time
+from feeds.registry import FeedRegistry, FeedSpec
+import replication
+feeds = FeedRegistry({'test': FeedSpec(0, 'feeds.test_feed', 'Test')})
+for i in range(3):
+    feeds['test'].publish(float(i), 1000. + i)
+replication.ReplicationLeader(feeds, sys.argv[1]).start()
+print('ready', flush=True)
+for line in sys.stdin:
+    feeds['test'].publish(float(line), source_time=time.time() - 60)
+'''
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(.01)
+
+
+def values(feed):
+    return [dp.value for dp in feed.DATAPOINT_DEQUE]
+
+
+class TestReplication(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.address = str(Path(self.dir.name) / 'leader.sock')
+        self.leader_feeds = FeedRegistry(SPECS)
+        self.follower_feeds = FeedRegistry(SPECS)
+        self.leaders = []
+        patcher = patch.multiple(c, REPLICATION_PING_INTERVAL=.05, REPLICATION_RECONNECT_DELAY=.05)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.follower.stop()
+        for leader in self.leaders:
+            leader.stop()
+        self.dir.cleanup()
+
+    def lead(self, address=None):
+        leader = replication.ReplicationLeader(self.leader_feeds, address or self.address).start()
+        self.leaders.append(leader)
+        return leader
+
+    def follow(self, address=None, **kwargs):
+        self.follower = replication.ReplicationFollower(self.follower_feeds, address or self.address, **kwargs).start()
+        self.assertTrue(self.follower.connected.wait(5))
+        return self.follower
+
+    def test_snapshot_then_stream(self):
+        feed = self.leader_feeds['test']
+        feed.publish(1., 1000.)
+        feed.publish(2., 1001., source_time=990., degraded=True)
+        self.lead()
+        self.follow()
+        replica = self.follower_feeds['test']
+        self.assertEqual(values(replica), [1., 2.])
+        self.assertEqual(replica.DATAPOINT_DEQUE[-1].source_time, 990.)
+        self.assertTrue(replica.DATAPOINT_DEQUE[-1].degraded)
+        feed.publish(3., 1002.)
+        wait_for(lambda: len(replica.DATAPOINT_DEQUE) == 3)
+        self.assertEqual(values(replica), [1., 2., 3.])
+        self.assertFalse(replica.DATAPOINT_DEQUE[-1].degraded)
+
+    def test_tcp(self):
+        leader = self.lead(('127.0.0.1', 0))
+        self.leader_feeds['test'].publish(1., 1000.)
+        self.follow(leader.address)
+        wait_for(lambda: values(self.follower_feeds['test']) == [1.])
+
+    def test_feed_loaded_later(self):
+        self.leader_feeds['test'].publish(1., 1000.)
+        self.lead()
+        self.follow()
+        self.leader_feeds['other'].publish(5., 1000.)
+        wait_for(lambda: values(self.follower_feeds['other']) == [5.])
+        self.leader_feeds['other'].publish(6., 1001.)
+        wait_for(lambda: values(self.follower_feeds['other']) == [5., 6.])
+
+    def test_confirm_streamed(self):
+        feed = self.leader_feeds['test']
+        feed.publish(1., 1000., source_time=990.)
+        self.lead()
+        self.follow()
+        replica = self.follower_feeds['test']
+        feed.confirm(1030.)         #a suppressed sample, reporting no source time
+        wait_for(lambda: replica.DATAPOINT_DEQUE[-1].source_time == 1030.)
+        self.assertEqual(values(replica), [1.])
+        self.follower.apply({'op': 'confirm', 'feed': 'test', 'timestamp': 999., 'source_time': 1060.})
+        self.follower.apply({'op': 'confirm', 'feed': 'test', 'timestamp': 1000., 'source_time': 1020.})
+        self.assertEqual(replica.DATAPOINT_DEQUE[-1].source_time, 1030.)     #not its point, or older
+
+    def test_repeats_skipped(self):
+        self.follower = replication.ReplicationFollower(self.follower_feeds, self.address)
+        point = [1., 1000., 1000., False]
+        self.follower.apply({'op': 'snapshot', 'feeds': {'test': [point], 'unknown': [point]}})
+        self.follower.apply({'op': 'publish', 'feed': 'test', 'point': point})
+        self.follower.apply({'op': 'publish', 'feed': 'unknown', 'point': point})
+        self.assertEqual(values(self.follower_feeds['test']), [1.])
+
+    def test_reconnects_and_resnapshots(self):
+        feed = self.leader_feeds['test']
+        feed.publish(1., 1000.)
+        self.lead()
+        self.follow()
+        replica = self.follower_feeds['test']
+        self.leaders.pop().stop()
+        feed.publish(2., 1001.)
+        wait_for(lambda: not self.follower.connected.is_set())
+        self.assertEqual(values(replica), [1.])
+        self.lead()
+        wait_for(lambda: values(replica) == [1., 2.])
+        self.assertEqual(self.follower.snapshots, 2)
+
+    def test_dead_leader_detected(self):
+        #a leader that accepts but never sends anything
+        server = socket.socket(socket.AF_UNIX)
+        server.bind(self.address)
+        server.listen()
+        self.follower = replication.ReplicationFollower(self.follower_feeds, self.address, timeout=.1).start()
+        connection, _ = server.accept()
+        try:
+            connection2, _ = server.accept()    #timed out, and reconnected
+            connection2.close()
+        finally:
+            connection.close()
+            server.close()
+
+
+class TestFollowerProcess(unittest.TestCase):
+    ''' a leader and a follower in separate processes '''
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.address = str(Path(self.dir.name) / 'leader.sock')
+        self.leader = subprocess.Popen([sys.executable, '-c', LEADER, self.address], cwd=c.PROJECT_PATH,
+                                       stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        self.assertEqual(self.leader.stdout.readline().strip(), 'ready')
+        self.feeds = FeedRegistry({'test': SPECS['test']})
+        self.follower = replication.ReplicationFollower(self.feeds, self.address).start()
+        endpoint.app.all_feeds = self.feeds
+        self.client = endpoint.app.test_client()
+
+    def tearDown(self):
+        del endpoint.app.all_feeds
+        self.follower.stop()
+        self.leader.kill()
+        self.leader.wait()
+        self.leader.stdin.close()
+        self.leader.stdout.close()
+        self.dir.cleanup()
+
+    def datapoint(self):
+        return self.client.get('/datafeed/test').get_json()[c.DATA_POINT]
+
+    def test_follower_serves_leader_data(self):
+        self.assertTrue(self.follower.connected.wait(10))
+        self.assertEqual(values(self.feeds['test']), [0., 1., 2.])
+        self.assertEqual(self.datapoint(), 2.)
+        self.leader.stdin.write('42\n')
+        self.leader.stdin.flush()
+        wait_for(lambda: self.datapoint() == 42.)
+        self.assertEqual(self.client.get('/datafeed/test?max_age=30').status_code, 412)
+
+        #the leader dies: the follower keeps serving what it has
+        self.leader.kill()
+        self.leader.wait()
+        wait_for(lambda: not self.follower.connected.is_set())
+        self.assertEqual(self.datapoint(), 42.)
+
+        #until a new leader (on the socket the dead one left behind) takes over
+        feeds = FeedRegistry({'test': SPECS['test']})
+        feeds['test'].publish(43.)
+        with patch.object(c, 'REPLICATION_RECONNECT_DELAY', .05):
+            leader = replication.ReplicationLeader(feeds, self.address).start()
+            try:
+                wait_for(lambda: self.datapoint() == 43., timeout=40)
+            finally:
+                leader.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+import math
+import random
+import statistics
+import unittest
+
+from feeds import rolling
+from feeds import test_feed
+
+
+def series(n=400, seed=0):
+    rng = random.Random(seed)
+    t, value = 1000., 100.
+    for _ in range(n):
+        t += rng.uniform(.1, 5.)
+        value *= math.exp(rng.gauss(0, .01))
+        yield value, t
+
+
+def window_points(points, t, window):
+    return [(v, s) for v, s in points if s > t - window]
+
+
+class TestStatistics(unittest.TestCase):
+    WINDOW = 60.
+
+    def check(self, statistic, expected):
+        ''' compare the incremental statistic with expected(points so far) after every update '''
+        points = []
+        for value, t in series():
+            points.append((value, t))
+            statistic.update(value, t)
+            want = expected(points, t)
+            if want is None:
+                self.assertIsNone(statistic.value)
+            else:
+                self.assertAlmostEqual(statistic.value, want, places=6)
+
+    def test_min_max(self):
+        self.check(rolling.RollingMax(self.WINDOW), lambda p, t: max(v for v, _ in window_points(p, t, self.WINDOW)))
+        self.check(rolling.RollingMin(self.WINDOW), lambda p, t: min(v for v, _ in window_points(p, t, self.WINDOW)))
+
+    def test_variance(self):
+        def expected(points, t):
+            values = [v for v, _ in window_points(points, t, self.WINDOW)]
+            return statistics.variance(values) if len(values) > 1 else 0.
+        self.check(rolling.RollingVariance(self.WINDOW), expected)
+
+    def test_volatility(self):
+        def expected(points, t):
+            returns = [(math.log(b[0] / a[0]), b[1]) for a, b in zip(points, points[1:])]
+            returns = [r for r, s in returns if s > t - self.WINDOW]
+            if not returns:
+                return None
+            return statistics.stdev(returns) if len(returns) > 1 else 0.
+        self.check(rolling.Volatility(self.WINDOW), expected)
+
+    def test_twa(self):
+        def expected(points, t):
+            cutoff = t - self.WINDOW
+            area = duration = 0.
+            for (v, start), (_, end) in zip(points, points[1:]):
+                start = max(start, cutoff)
+                if end > start:
+                    area += v * (end - start)
+                    duration += end - start
+            return area / duration if duration else points[-1][0]
+        self.check(rolling.TWA(self.WINDOW), expected)
+
+    def test_twa_weights_by_time(self):
+        twa = rolling.TWA(100)
+        twa.update(1., 0.)
+        twa.update(3., 90.)     #1. held for 90s
+        twa.update(3., 100.)    #3. held for 10s
+        self.assertAlmostEqual(twa.value, 1.2)
+        twa.update(3., 150.)    #window now 50..150: 1. for 40s, 3. for 60s
+        self.assertAlmostEqual(twa.value, 2.2)
+
+    def test_ewma(self):
+        ewma = rolling.EWMA(10)
+        ewma.update(0., 0.)
+        ewma.update(1., 10.)    #one half-life later: halfway
+        self.assertAlmostEqual(ewma.value, .5)
+        ewma.update(1., 10.)    #no time passed: no weight
+        self.assertAlmostEqual(ewma.value, .5)
+
+
+class TestRollingFeed(unittest.TestCase):
+
+    def test_follows_source(self):
+        source = test_feed.Test()
+        source.publish(1., timestamp=0.)
+        source.publish(3., timestamp=10.)
+        feed = rolling.RollingFeed(name='test_max', feed_id=-1, STATISTIC='max', WINDOW=60)
+        feed.attach(source)
+        self.assertEqual(feed.create_new_data_point(), 3.)      #seeded from the history
+
+        source.publish(2., timestamp=20., source_time=15.)
+        dp = feed.DATAPOINT_DEQUE[-1]
+        self.assertEqual((dp.value, dp.timestamp, dp.source_time), (3., 20., 15.))
+        source.publish(2., timestamp=75.)
+        self.assertEqual(feed.DATAPOINT_DEQUE[-1].value, 2.)
+
+        feed.detach()
+        source.publish(10., timestamp=80.)
+        self.assertEqual(feed.DATAPOINT_DEQUE[-1].value, 2.)
+        self.assertEqual(source.SUBSCRIBERS, ())
+
+    def test_deviation(self):
+        source = test_feed.Test()
+        feed = rolling.RollingFeed(name='test_max', feed_id=-1, STATISTIC='max', WINDOW=3600, DEVIATION=.05)
+        feed.attach(source)
+        for t, value in enumerate([1., 1.01, 1.03, 1.2, 1.21]):
+            source.publish(value, timestamp=float(t))
+        self.assertEqual([dp.value for dp in feed.DATAPOINT_DEQUE], [1., 1.2])
+        self.assertEqual(feed.DATAPOINT_DEQUE[-1].source_time, 4.)      #confirmed by the last, suppressed one
+        feed.set_params({'DEVIATION': .05, 'HEARTBEAT': 60})
+        source.publish(1.21, timestamp=70.)
+        self.assertEqual(feed.DATAPOINT_DEQUE[-1].timestamp, 70.)       #heartbeat expired
+
+    def test_retune(self):
+        source = test_feed.Test()
+        for t, value in enumerate([1., 2., 3.]):
+            source.publish(value, timestamp=float(t))
+        feed = rolling.RollingFeed(name='test_stat', feed_id=-1, STATISTIC='max', WINDOW=60)
+        feed.attach(source)
+        stat = feed.STAT
+        feed.set_params({'STATISTIC': 'max', 'WINDOW': 60})
+        self.assertIs(feed.STAT, stat)                          #unchanged config keeps the state
+        feed.set_params({'STATISTIC': 'min', 'WINDOW': 60})
+        self.assertEqual(feed.create_new_data_point(), 1.)
+        self.assertEqual(len(source.SUBSCRIBERS), 1)
+        with self.assertRaises(KeyError):
+            feed.set_params({'STATISTIC': 'median'})
+        self.assertEqual((feed.STATISTIC, len(source.SUBSCRIBERS)), ('min', 1))
+
+    def test_failing_subscriber_does_not_stop_source(self):
+        source = test_feed.Test()
+        source.subscribe(lambda dp: 1 / 0)
+        source.publish(1.)
+        self.assertEqual(source.COUNT, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import sys
+import math
+import tempfile
+import unittest
+import subprocess
+from pathlib import Path
+
+import constants as c
+import shm_board
+from shm_board import Board, BoardReader, BoardError
+from feeds.data_feed import DataPoint
+from feeds.registry import FeedRegistry, FeedSpec
+
+#a writer in its own process, updating one feed as fast as it can
+WRITER = '''
+import sys
+import shm_board
+from feeds.data_feed import DataPoint
+board = shm_board.Board(sys.argv[1])
+board.write('test', 0, DataPoint(0., 0., 0.))
+print('ready', flush=True)
+i = 0
+while True:
+    i += 1
+    board.write('test', 0, DataPoint(float(i), float(i), float(i), i % 2 == 1))
+'''
+
+
+class TestBoard(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.dir.name) / 'board'
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_read_write(self):
+        board = Board(self.path)
+        board.write('usdc', 3, DataPoint(1.001, 1000., 990., True))
+        board.write('twitter', 7, DataPoint('positive', 1001.))
+        with BoardReader(self.path) as reader:
+            record = reader.read('usdc')
+            self.assertEqual(record, ('usdc', 3, 1, 1000., 1.001, 990., True))
+            self.assertTrue(math.isnan(reader.read('twitter').value))
+            board.write('usdc', 3, DataPoint(1.002, 1002.))
+            self.assertEqual(reader.read('usdc').seq, 2)
+            self.assertEqual(reader.read('usdc').value, 1.002)
+            self.assertEqual(reader.names(), ['usdc', 'twitter'])
+        board.close()
+
+    def test_feed_added_after_reader_opened(self):
+        board = Board(self.path)
+        reader = BoardReader(self.path)
+        with self.assertRaises(KeyError):
+            reader.read('dai')
+        board.write('dai', 6, DataPoint(1., 1000.))
+        self.assertEqual(reader.read('dai').value, 1.)
+
+    def test_full(self):
+        board = Board(self.path, slots=1)
+        board.write('dai', 6, DataPoint(1., 1000.))
+        with self.assertRaises(BoardError):
+            board.write('usdc', 3, DataPoint(1., 1000.))
+        with self.assertRaises(BoardError):
+            Board(self.path).write('x' * 49, 3, DataPoint(1., 1000.))
+
+    def test_not_a_board(self):
+        with self.assertRaises(BoardError):
+            BoardReader(self.path)
+        self.path.write_bytes(b'x' * 100)
+        with self.assertRaises(BoardError):
+            BoardReader(self.path)
+
+    def test_restart_replaces_file(self):
+        Board(self.path).write('dai', 6, DataPoint(1., 1000.))
+        reader = BoardReader(self.path)
+        self.assertFalse(reader.stale())
+        Board(self.path)
+        self.assertTrue(reader.stale())
+        self.assertEqual(reader.read('dai').value, 1.)
+
+    def test_attach_to_registry(self):
+        feeds = FeedRegistry({'test': FeedSpec(0, 'feeds.test_feed', 'Test'),
+                              'other': FeedSpec(1, 'feeds.test_feed', 'Test')})
+        feeds['test'].publish(.5, 1000.)
+        board = shm_board.serve(feeds, self.path)
+        try:
+            reader = BoardReader(self.path)
+            self.assertEqual(reader.read('test').value, .5)
+            feeds['test'].publish(.6, 1001.)
+            self.assertEqual(reader.read('test').value, .6)
+            feeds['other'].publish(.7, 1001.)
+            board.poll()
+            feeds['other'].publish(.8, 1002.)
+            self.assertEqual(reader.read('other')[1:5], (1, 2, 1002., .8))
+            feeds['other'].confirm(1030.)      #a suppressed sample refreshed its source time
+            board.poll()
+            self.assertEqual(reader.read('other')[3:6], (1002., .8, 1030.))
+        finally:
+            board.close()
+        feeds['test'].publish(.9, 1003.)
+        self.assertEqual(feeds['test'].SUBSCRIBERS, ())
+
+
+class TestConcurrentWriter(unittest.TestCase):
+    ''' reads never see a half-written data point of another process '''
+
+    def test_no_torn_reads(self):
+        with tempfile.TemporaryDirectory() as dir:
+            path = str(Path(dir) / 'board')
+            writer = subprocess.Popen([sys.executable, '-c', WRITER, path], cwd=c.PROJECT_PATH,
+                                      stdout=subprocess.PIPE, text=True)
+            try:
+                self.assertEqual(writer.stdout.readline().strip(), 'ready')
+                reader = BoardReader(path)
+                last = 0
+                for _ in range(50000):
+                    record = reader.read('test')
+                    self.assertEqual(record.value, record.timestamp)
+                    self.assertEqual(record.value, record.source_time)
+                    self.assertEqual(record.degraded, record.value % 2 == 1)
+                    self.assertGreaterEqual(record.seq, last)
+                    last = record.seq
+                self.assertGreater(last, 1)
+            finally:
+                writer.kill()
+                writer.wait()
+                writer.stdout.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import os
+import time
+import signal
+import unittest
+from unittest.mock import patch
+
+import constants as c
+import supervisor
+from feeds.registry import FeedRegistry, FeedSpec
+
+
+def spec(**params):
+    return FeedSpec(0, 'feeds.test_feed', 'Test', {'HEARTBEAT': .02, **params})
+
+
+def wait_for(condition, timeout=30):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError('timed out')
+        time.sleep(.02)
+
+
+class TestAssignment(unittest.TestCase):
+
+    def setUp(self):
+        self.feeds = FeedRegistry({
+            'a': spec(),
+            'b': spec(),
+            'c': spec(WORKER=5),
+            'twap': FeedSpec(10, 'feeds.rolling', 'RollingFeed', {'SOURCE': 'a'}),
+            'ewma': FeedSpec(10, 'feeds.rolling', 'RollingFeed', {'SOURCE': 'twap', 'STATISTIC': 'ewma'}),
+        })
+
+    def test_feeds_run_with_their_inputs(self):
+        self.assertEqual(sorted(map(sorted, supervisor.groups(self.feeds, ['ewma', 'b']))),
+                         [['a', 'ewma', 'twap'], ['b']])
+
+    def test_assign(self):
+        assignment = supervisor.assign(self.feeds, ['ewma', 'b', 'c'], 3)
+        self.assertEqual(sorted(name for names in assignment.values() for name in names),
+                         ['a', 'b', 'c', 'ewma', 'twap'])
+        self.assertEqual(assignment[5 % 3] & {'c'}, {'c'})
+        worker = supervisor.worker_of({'a', 'twap', 'ewma'}, 3)
+        self.assertTrue({'a', 'twap', 'ewma'} <= assignment[worker])
+
+    def test_one_worker(self):
+        self.assertEqual(supervisor.assign(self.feeds, ['a', 'b', 'c'], 1), {0: {'a', 'b', 'c'}})
+
+
+class TestSupervisor(unittest.TestCase):
+
+    def setUp(self):
+        self.feeds = FeedRegistry({'a': spec(WORKER=0), 'b': spec(WORKER=1), 'c': spec(WORKER=1)})
+        patcher = patch.multiple(c, SUPERVISOR_CHECK_INTERVAL=.05, SUPERVISOR_RESTART_DELAY=.05)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.supervisor = supervisor.Supervisor(self.feeds, workers=2).start()
+
+    def tearDown(self):
+        self.supervisor.stop()
+
+    def published(self, name, n):
+        return len(self.feeds[name].DATAPOINT_DEQUE) >= n
+
+    def test_workers_publish_to_supervisor(self):
+        self.supervisor.run(['a', 'b', 'c'])
+        self.assertEqual({i: sorted(names) for i, names in self.supervisor.assignment().items()},
+                         {0: ['a'], 1: ['b', 'c']})
+        wait_for(lambda: all(self.published(name, 3) for name in 'abc'))
+        pids = {w.process.pid for w in self.supervisor.workers.values()}
+        self.assertEqual(len(pids), 2)
+        self.assertNotIn(os.getpid(), pids)
+
+    def test_confirmations_forwarded(self):
+        #every sample but the first is suppressed, each confirming the value published
+        self.feeds.add('a', spec(WORKER=0, DEVIATION=1e9, HEARTBEAT=60, SAMPLE_INTERVAL=.02))
+        self.supervisor.run(['a'])
+        wait_for(lambda: self.published('a', 1))
+        first = self.feeds['a'].DATAPOINT_DEQUE[-1].source_time
+        wait_for(lambda: self.feeds['a'].DATAPOINT_DEQUE[-1].source_time > first)
+        self.assertEqual(len(self.feeds['a'].DATAPOINT_DEQUE), 1)
+
+    def test_dead_worker_restarted(self):
+        self.supervisor.run(['a'])
+        wait_for(lambda: self.published('a', 3))
+        worker = self.supervisor.workers[0]
+        pid = worker.process.pid
+        os.kill(pid, signal.SIGKILL)
+        wait_for(lambda: worker.is_alive() and worker.process.pid != pid)
+        before = list(self.feeds['a'].DATAPOINT_DEQUE)
+        wait_for(lambda: self.feeds['a'].DATAPOINT_DEQUE[-1].timestamp > before[-1].timestamp)
+        timestamps = [dp.timestamp for dp in self.feeds['a'].DATAPOINT_DEQUE]
+        self.assertEqual(timestamps, sorted(timestamps))
+        self.assertEqual(worker.crashes, 1)
+
+    def test_rebalance(self):
+        self.supervisor.run(['a', 'b'])
+        first = self.supervisor.workers[0].process.pid
+        self.assertEqual(self.supervisor.rebalance(), [])
+        self.feeds.add('b', spec(WORKER=0))
+        self.assertEqual(self.supervisor.rebalance(), [0])
+        self.assertEqual(self.supervisor.assignment(), {0: ['a', 'b']})
+        self.assertNotEqual(self.supervisor.workers[0].process.pid, first)
+        wait_for(lambda: self.published('b', 3))
+
+    def test_halt(self):
+        self.supervisor.run(['a', 'b'])
+        self.supervisor.halt(['b'])
+        self.assertEqual(self.supervisor.assignment(), {0: ['a']})
+
+
+if __name__ == '__main__':
+    unittest.main()